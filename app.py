@@ -1,15 +1,31 @@
-from flask import Flask, request, jsonify
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import logging
 from pythonjsonlogger import jsonlogger
 from config import Config
+from models import (
+    Conversation, Database, claim_call_draft, claim_conversation,
+    complete_conversation, count_conversations, get_call_draft_content,
+    get_checkpoint, get_conversation, get_conversation_transcript,
+    release_conversation, save_call_draft, save_checkpoint, spill_conversation,
+    update_call_draft_transcript,
+    update_conversation_status
+)
 
 # Import services
 from services.vapi_service import VAPIService
 from services.sop_generator import SOPGenerator
 from services.google_docs_service import GoogleDocsService
 from services.ghl_service import GHLService
-from services.lindy_service import LindyService
+from services.lindy_service import LindyOutbox, LindyService
+from services.sop_cache import SOPCache
+from services.admission import AdmissionController
+from services.artifact_store import create_artifact_store, create_blob_store
+from services.http_client import prewarm_connections
+from pipeline import Pipeline
+from utils import Deadline, format_conversation_messages, format_sse
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -25,7 +41,14 @@ app.logger.setLevel(logging.INFO)
 
 # Initialize services
 vapi_service = VAPIService(app.config['VAPI_API_KEY'])
-sop_generator = SOPGenerator(app.config['OPENAI_API_KEY'])
+sop_cache = SOPCache.from_config(Config)
+sop_generator = SOPGenerator(
+    app.config['OPENAI_API_KEY'],
+    cache=sop_cache,
+    max_transcript_tokens=app.config['SOP_MAX_TRANSCRIPT_TOKENS'],
+    chunk_workers=app.config['SOP_CHUNK_WORKERS'],
+    compaction_level=app.config['SOP_COMPACTION_LEVEL']
+)
 
 # Google Docs service is optional (only needed if not using Lindy)
 google_docs_service = None
@@ -34,7 +57,10 @@ try:
     if os.path.exists(app.config['GOOGLE_CREDENTIALS_PATH']):
         google_docs_service = GoogleDocsService(
             app.config['GOOGLE_CREDENTIALS_PATH'],
-            app.config['GOOGLE_FOLDER_ID']
+            app.config['GOOGLE_FOLDER_ID'],
+            app.config['GOOGLE_TEMPLATE_ID'],
+            document_cache_size=app.config['GOOGLE_DOC_CACHE_SIZE'],
+            document_cache_ttl=app.config['GOOGLE_DOC_CACHE_TTL']
         )
         app.logger.info('Google Docs service initialized')
     else:
@@ -42,17 +68,82 @@ try:
 except Exception as e:
     app.logger.warning(f'Google Docs service initialization failed: {str(e)}')
 
-ghl_service = GHLService(app.config['GHL_API_KEY'])
+ghl_service = GHLService(
+    app.config['GHL_API_KEY'],
+    max_workers=app.config['GHL_MAX_WORKERS'],
+    send_timeout=app.config['GHL_SEND_TIMEOUT'],
+    send_concurrency=app.config['GHL_SEND_CONCURRENCY'],
+    contact_cache_ttl=app.config['GHL_CONTACT_CACHE_TTL'],
+    contact_cache_size=app.config['GHL_CONTACT_CACHE_SIZE'],
+    redis_url=app.config['REDIS_URL'] if app.config['GHL_CONTACT_CACHE_REDIS'] else None,
+    contact_cache_local_ttl=app.config['GHL_CONTACT_CACHE_LOCAL_TTL']
+)
+
+# Database is used to persist calls before handing them off to Celery.
+# Tables are created by migrate.py before the server starts, not here:
+# gunicorn imports this module in every worker at once
+db = Database(app.config['DATABASE_URL'])
+
+# Each call's generated SOP is kept here by hash, as Celery workers keep it,
+# so duplicate webhooks and SOP streams can replay it
+blob_store = create_blob_store(Config, db)
+
+# Generated SOPs are stored here and linked to Lindy by signed URL
+artifact_store = create_artifact_store(Config, db)
+if artifact_store and not app.config['PUBLIC_BASE_URL']:
+    app.logger.warning('PUBLIC_BASE_URL not set - SOP content will be sent to Lindy inline')
+if (app.config['ARTIFACT_STORE'] or '').lower() == 'local' and app.config['ASYNC_WEBHOOKS']:
+    # Workers write the artifacts this app serves
+    app.logger.warning('ARTIFACT_STORE=local with ASYNC_WEBHOOKS - ARTIFACT_DIR must be a volume '
+                       'shared with the Celery workers, or use ARTIFACT_STORE=database')
 
 # Initialize Lindy service if webhook URL is configured
 lindy_service = None
 if app.config.get('LINDY_WEBHOOK_URL'):
+    lindy_outbox = None
+    if app.config['LINDY_OUTBOX']:
+        # Events are stored here and delivered by the dispatch_lindy_outbox task
+        lindy_outbox = LindyOutbox(
+            db,
+            batch_size=app.config['LINDY_OUTBOX_BATCH_SIZE'],
+            max_attempts=app.config['LINDY_OUTBOX_MAX_ATTEMPTS']
+        )
     lindy_service = LindyService(
         app.config['LINDY_WEBHOOK_URL'],
-        app.config.get('LINDY_WEBHOOK_SECRET')
+        app.config.get('LINDY_WEBHOOK_SECRET'),
+        outbox=lindy_outbox,
+        artifact_store=artifact_store if app.config['PUBLIC_BASE_URL'] else None,
+        inline_max_bytes=app.config['LINDY_INLINE_MAX_BYTES']
     )
     app.logger.info('Lindy service initialized with webhook URL')
 
+# Open keep-alive connections to outbound services without delaying startup
+threading.Thread(target=prewarm_connections, daemon=True).start()
+
+# Sheds webhooks when the Celery queues or this process are overloaded
+admission = AdmissionController.from_config(Config)
+
+# Outbox events and spilled calls are only delivered by beat-scheduled tasks
+scheduled_features = [
+    name for name, enabled in (
+        ('LINDY_OUTBOX', app.config['LINDY_OUTBOX']),
+        ('ADMISSION_CONTROL', app.config['ADMISSION_CONTROL'] and app.config['ASYNC_WEBHOOKS']),
+    ) if enabled
+]
+if scheduled_features:
+    app.logger.warning(
+        f"{' and '.join(scheduled_features)} enabled - a Celery worker and exactly one "
+        'celery beat (make celery-beat, or the celery-beat compose service) must be running, '
+        'or Lindy events and spilled calls are never processed'
+    )
+
+# Background threads for speculative SOP drafts built during calls
+draft_executor = ThreadPoolExecutor(max_workers=Config.DRAFT_WORKERS)
+
+# Lindy progress events for streamed SOPs are posted off the response thread;
+# one worker keeps each call's events in order
+progress_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lindy-progress')
+
 
 @app.route('/', methods=['GET'])
 def index():
@@ -66,6 +157,50 @@ def health_check():
     return jsonify({'status': 'healthy', 'service': 'voice-sop'}), 200
 
 
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """SOP cache hit, miss and eviction counters for this worker"""
+    stats = sop_cache.stats()
+    if google_docs_service:
+        stats['google_docs'] = google_docs_service.document_cache_stats()
+    return jsonify(stats), 200
+
+
+@app.route('/api/admission/stats', methods=['GET'])
+def admission_stats():
+    """Celery queue depths, in-flight webhooks and shed counters for this worker"""
+    stats = admission.stats()
+
+    session = db.get_session()
+    try:
+        stats['spilled_pending'] = count_conversations(session, 'queued')
+    finally:
+        session.close()
+
+    return jsonify(stats), 200
+
+
+@app.route('/artifacts/<digest>', methods=['GET'])
+def get_artifact(digest):
+    """Serve a stored artifact through a signed, expiring URL"""
+    if artifact_store is None:
+        return jsonify({'error': 'Artifact store not configured'}), 404
+
+    if not artifact_store.verify(digest, request.args.get('expires'), request.args.get('signature')):
+        return jsonify({'error': 'Invalid or expired signature'}), 403
+
+    data = artifact_store.get(digest)
+    if data is None:
+        return jsonify({'error': 'Artifact not found'}), 404
+
+    response = Response(data, mimetype='text/markdown')
+    response.charset = 'utf-8'
+    # Content never changes for a digest, so the hash is a strong ETag
+    response.set_etag(digest)
+    response.headers['Cache-Control'] = 'private, max-age=3600'
+    return response.make_conditional(request)
+
+
 @app.route('/test/vapi-webhook', methods=['GET', 'POST'])
 def test_vapi_webhook():
     """
@@ -144,12 +279,19 @@ def vapi_webhook():
     Webhook endpoint for VAPI to send conversation data
     VAPI sends multiple webhook types - we only process end-of-call-report
     """
+    # Every call made for this webhook shares one time budget
+    deadline = Deadline(app.config['WEBHOOK_DEADLINE'])
+
     try:
         data = request.json
 
         # Check if this is an end-of-call-report
         message_type = data.get('message', {}).get('type')
 
+        if message_type in ('transcript', 'conversation-update') and app.config['SPECULATIVE_DRAFTS']:
+            # In-call events feed the rolling transcript used for drafts
+            return jsonify(handle_in_call_event(data.get('message', {}))), 200
+
         if message_type != 'end-of-call-report':
             # Ignore other webhook types (status-update, speech-update, etc.)
             app.logger.info(f'Ignoring VAPI webhook type: {message_type}')
@@ -161,24 +303,72 @@ def vapi_webhook():
         call = data.get('message', {}).get('call', {})
         call_id = call.get('id')
         transcript = data.get('message', {}).get('transcript', '')
-        customer = call.get('customer', {})
-
-        # Build customer info
-        customer_info = {
-            'name': customer.get('name', ''),
-            'email': customer.get('email', ''),
-            'phone': customer.get('number', ''),
-            'contact_id': customer.get('id', '')
-        }
+        customer_info = build_customer_info(call.get('customer', {}))
 
         # Validate webhook
+        if not call_id:
+            return jsonify({'error': 'No call ID in end-of-call-report'}), 400
         if not transcript:
             return jsonify({'error': 'No transcript in end-of-call-report'}), 400
 
-        # Process the conversation and generate SOP
-        result = process_voice_to_sop(call_id, transcript, customer_info)
+        # Only spill calls a Celery worker will pick up; otherwise answer 429
+        can_spill = app.config['ASYNC_WEBHOOKS'] and app.config['ADMISSION_OVERLOAD_MODE'] == 'spill'
 
-        return jsonify(result), 200
+        with admission.slot('vapi') as decision:
+            if not decision['admitted'] and not can_spill:
+                return overloaded_response(decision)
+
+            # Stored once by hash; retried deliveries find it already there
+            transcript_ref = blob_store.put(transcript)
+
+            # VAPI retries slow webhooks - only the first delivery of a call runs
+            session = db.get_session()
+            try:
+                conversation, claimed = claim_conversation(
+                    session, call_id, None, customer_info,
+                    stale_after=app.config['CALL_LOCK_TIMEOUT'],
+                    transcript_ref=transcript_ref
+                )
+                if not claimed:
+                    result, status_code = duplicate_call_response(conversation)
+                    return jsonify(result), status_code
+
+                if not decision['admitted']:
+                    # Started by the drain_spilled_calls task once the queues have room
+                    spill_conversation(session, call_id)
+                    admission.record_spill()
+                    return jsonify(spilled_call_response(call_id)), 202
+            finally:
+                session.close()
+
+            if app.config['ASYNC_WEBHOOKS']:
+                # Let a Celery worker generate the SOP
+                try:
+                    result = enqueue_voice_to_sop(call_id, transcript, customer_info)
+                except Exception:
+                    # Release the claim so VAPI's retry can take the call over
+                    session = db.get_session()
+                    try:
+                        update_conversation_status(session, call_id, 'failed')
+                    finally:
+                        session.close()
+                    raise
+                return jsonify(result), 202
+
+            # Process the conversation and generate SOP
+            session = db.get_session()
+            try:
+                try:
+                    result = process_voice_to_sop(call_id, transcript, customer_info, deadline=deadline)
+                except Exception:
+                    update_conversation_status(session, call_id, 'failed')
+                    raise
+
+                complete_conversation(session, call_id, result)
+            finally:
+                session.close()
+
+            return jsonify(result), 200
 
     except Exception as e:
         app.logger.error(f'Error processing VAPI webhook: {str(e)}')
@@ -191,6 +381,8 @@ def lindy_webhook():
     Webhook endpoint for Lindy automation
     This can be used for additional automation triggers
     """
+    deadline = Deadline(app.config['WEBHOOK_DEADLINE'])
+
     try:
         # Verify webhook secret (optional - Lindy can use URL-based auth)
         secret = request.headers.get('X-Webhook-Secret')
@@ -203,13 +395,19 @@ def lindy_webhook():
         # Process based on action type
         action = data.get('action')
 
-        if action == 'create_assistant':
-            result = create_vapi_assistant(data)
-        elif action == 'generate_sop':
-            result = generate_sop_manual(data)
-        else:
+        if action not in ('create_assistant', 'generate_sop'):
             return jsonify({'error': f'Unknown action: {action}'}), 400
 
+        # Lindy waits for the result, so there is nothing to spill
+        with admission.slot('lindy') as decision:
+            if not decision['admitted']:
+                return overloaded_response(decision)
+
+            if action == 'create_assistant':
+                result = create_vapi_assistant(data)
+            else:
+                result = generate_sop_manual(data, deadline=deadline)
+
         return jsonify(result), 200
 
     except Exception as e:
@@ -217,6 +415,203 @@ def lindy_webhook():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/sop/<call_id>/stream', methods=['GET'])
+def stream_sop(call_id):
+    """
+    Stream a saved call's SOP as server-sent events
+    Emits 'chunk' events with the content, then 'done' or 'error'
+
+    A call whose SOP was already generated (by the webhook, a worker or an
+    earlier stream) replays the stored SOP, so viewers see what was sent to
+    Lindy and GHL. Otherwise a failed or stale call is claimed and its SOP
+    generated once, with the call's draft and a WEBHOOK_DEADLINE budget,
+    and stored for the pipeline to deliver when the call is retried. Only
+    this generation is reported to Lindy as sop_progress events.
+    """
+    session = db.get_session()
+    try:
+        conversation = get_conversation(session, call_id)
+        if not conversation:
+            return jsonify({'error': f'Unknown call: {call_id}'}), 404
+
+        sop_ref = stored_sop_ref(conversation)
+        if sop_ref is None and conversation.status == 'completed':
+            return jsonify({'error': f'No stored SOP for call: {call_id}'}), 404
+
+        release_to = None
+        if sop_ref is None:
+            previous = (conversation.status, conversation.updated_at)
+
+            # claim_conversation tries an insert first, which mustn't clash
+            # with the row already loaded into this session
+            session.expunge(conversation)
+            conversation, claimed = claim_conversation(
+                session, call_id, conversation.transcript, conversation.customer_info,
+                stale_after=app.config['CALL_LOCK_TIMEOUT'],
+                transcript_ref=conversation.transcript_ref
+            )
+            if not claimed:
+                # Generated meanwhile, or still being generated elsewhere
+                sop_ref = stored_sop_ref(conversation) if conversation else None
+                if sop_ref is None:
+                    return jsonify({
+                        'error': 'SOP generation already in progress for this call',
+                        'call_id': call_id,
+                        'job_id': conversation.job_id if conversation else None,
+                        'status': conversation.status if conversation else None
+                    }), 409
+            else:
+                # Released to its previous state once the stream ends
+                release_to = (conversation.updated_at,) + previous
+
+        transcript = None
+        if sop_ref is None:
+            transcript = get_conversation_transcript(conversation, blob_store)
+        customer_info = conversation.customer_info or {}
+
+        draft = None
+        if sop_ref is None and app.config['SPECULATIVE_DRAFTS']:
+            draft = get_call_draft_content(session, call_id)
+    finally:
+        session.close()
+
+    if sop_ref is not None:
+        events = replay_sop_events(call_id, sop_ref)
+    else:
+        events = generate_sop_events(call_id, transcript, customer_info, draft, release_to)
+
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def stored_sop_ref(conversation):
+    """Blob hash of a call's generated SOP, or None if it wasn't stored"""
+    checkpoint = (conversation.checkpoints or {}).get('generate')
+    if checkpoint:
+        return checkpoint['sop_ref']
+    if conversation.status == 'completed':
+        return (conversation.result or {}).get('sop_ref')
+    return None
+
+
+def replay_sop_events(call_id, sop_ref):
+    """SSE events for an SOP that was already generated"""
+    data = blob_store.get(sop_ref)
+    if data is None:
+        yield format_sse({'error': f'Stored SOP {sop_ref} not found'}, event='error')
+        return
+
+    sop_content = data.decode('utf-8')
+    yield format_sse({'content': sop_content}, event='chunk')
+    yield format_sse({'call_id': call_id, 'sop_length': len(sop_content), 'stored': True}, event='done')
+
+
+def generate_sop_events(call_id, transcript, customer_info, draft=None, release_to=None):
+    """
+    SSE events for generating a claimed call's SOP
+
+    The finished SOP is stored as the call's generate checkpoint. Nothing is
+    delivered here, so the claim is then released - back to the status and
+    updated_at in release_to's (claimed_at, status, updated_at) - and VAPI's
+    retry still delivers the call, reusing this SOP instead of generating
+    another. A client disconnecting mid-stream releases it the same way.
+    """
+    deadline = Deadline(app.config['WEBHOOK_DEADLINE'])
+    progress_chars = app.config['SOP_STREAM_PROGRESS_CHARS']
+    report_stream_progress(call_id, 'streaming', 0)
+
+    parts = []
+    length = 0
+    reported = 0
+    try:
+        for chunk in sop_generator.generate_sop_stream(
+            transcript, customer_info, draft=draft, deadline=deadline
+        ):
+            parts.append(chunk)
+            length += len(chunk)
+            yield format_sse({'content': chunk}, event='chunk')
+
+            if length - reported >= progress_chars:
+                reported = length
+                report_stream_progress(call_id, 'streaming', length)
+
+        sop_content = ''.join(parts)
+        _, checkpointed_at = store_generated_sop(call_id, sop_content)
+        if release_to:
+            # Saving the checkpoint renewed the claim
+            release_to = (checkpointed_at,) + release_to[1:]
+
+        yield format_sse({'call_id': call_id, 'sop_length': length}, event='done')
+        report_stream_progress(call_id, 'completed', length)
+
+    except Exception as e:
+        app.logger.error(f'Error streaming SOP for call {call_id}: {str(e)}')
+        yield format_sse({'error': str(e)}, event='error')
+
+    finally:
+        # Also runs if the client disconnects mid-stream
+        if release_to:
+            session = db.get_session()
+            try:
+                release_conversation(session, call_id, *release_to)
+            finally:
+                session.close()
+
+
+def store_generated_sop(call_id, sop_content):
+    """
+    Store a call's generated SOP and checkpoint its hash
+
+    Returns:
+        tuple: (sop_ref, checkpointed_at) - the SOP's blob hash and the
+            call's updated_at after the checkpoint
+    """
+    sop_ref = blob_store.put(sop_content)
+
+    session = db.get_session()
+    try:
+        conversation = save_checkpoint(session, call_id, 'generate', {
+            'sop_ref': sop_ref,
+            'sop_length': len(sop_content)
+        })
+        checkpointed_at = conversation.updated_at if conversation else None
+    finally:
+        session.close()
+    return sop_ref, checkpointed_at
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Get the status of an async SOP generation job"""
+    from celery_tasks import celery_app
+
+    task = celery_app.AsyncResult(job_id)
+    response = {'job_id': job_id, 'status': task.status}
+
+    if task.successful():
+        response['result'] = task.result
+    elif task.failed():
+        response['error'] = str(task.result)
+
+    # The job ID is the pipeline's last stage, which stays pending if an
+    # earlier stage fails, so report progress from the stored checkpoints
+    session = db.get_session()
+    try:
+        conversation = session.query(Conversation).filter(Conversation.job_id == job_id).first()
+        if conversation is not None:
+            response['call_id'] = conversation.call_id
+            response['stages_completed'] = list(conversation.checkpoints or {})
+            if conversation.status == 'failed' and not task.ready():
+                response['status'] = 'FAILURE'
+    finally:
+        session.close()
+
+    return jsonify(response), 200
+
+
 @app.route('/api/assistant/create', methods=['POST'])
 def create_assistant():
     """Create a new VAPI assistant"""
@@ -254,68 +649,279 @@ def create_assistant():
         return jsonify({'error': str(e)}), 500
 
 
-def process_voice_to_sop(call_id, transcript, customer_info):
+def process_voice_to_sop(call_id, transcript, customer_info, deadline=None):
     """
     Main processing function: Voice → SOP → Lindy (creates Google Doc) → GHL
-    This orchestrates the entire flow
+    This orchestrates the entire flow as a stage graph:
+
+        notify_started           (independent)
+        generate ─┬─ notify_completed
+                  └─ ghl_note
+
+    An optional deadline caps every stage and outbound call at the time
+    remaining in the request's budget.
     """
     app.logger.info(f'Processing voice to SOP for call {call_id}')
 
-    try:
-        # Notify Lindy that processing has started
-        if lindy_service:
-            lindy_service.notify_sop_started(call_id, customer_info)
+    document_title = f"SOP - {customer_info.get('name', 'Customer')} - {call_id}"
+    notify_timeout = app.config['PIPELINE_NOTIFY_TIMEOUT']
 
-        # Step 1: Generate SOP from transcript using GPT-4
-        app.logger.info('Generating SOP from transcript')
-        sop_content = sop_generator.generate_sop(transcript, customer_info)
+    stored = {}
 
-        # Step 2: Send SOP content to Lindy (Lindy will create Google Doc)
-        document_title = f"SOP - {customer_info.get('name', 'Customer')} - {call_id}"
-        lindy_result = None
+    def generate(inputs):
+        session = db.get_session()
+        try:
+            # An SOP already generated for this call (by an earlier attempt
+            # or an SOP stream) is the one delivered
+            checkpoint = get_checkpoint(session, call_id, 'generate')
 
-        if lindy_service:
-            app.logger.info('Sending SOP to Lindy for Google Doc creation')
-            lindy_result = lindy_service.notify_sop_completed(
-                call_id,
-                None,  # No document URL yet - Lindy will create it
-                document_title,
-                customer_info,
-                sop_content  # Full SOP content for Lindy to create doc
-            )
+            # Sections drafted while the call was running, if any
+            draft = None
+            if checkpoint is None and app.config['SPECULATIVE_DRAFTS']:
+                draft = get_call_draft_content(session, call_id)
+        finally:
+            session.close()
 
-        # Step 3: Optionally send notification to GHL (Lindy will handle document delivery)
-        ghl_result = None
-        if customer_info.get('contact_id'):
-            try:
-                app.logger.info('Notifying GHL')
-                # Just add a note that SOP is being generated
-                ghl_result = ghl_service.add_note(
-                    customer_info.get('contact_id'),
-                    f"SOP '{document_title}' has been generated and is being processed by automation."
-                )
-            except Exception as e:
-                app.logger.warning(f'GHL notification failed: {str(e)}')
+        if checkpoint is not None:
+            data = blob_store.get(checkpoint['sop_ref'])
+            if data is not None:
+                app.logger.info('Using the SOP already generated for this call')
+                stored['sop_ref'] = checkpoint['sop_ref']
+                return data.decode('utf-8')
 
-        return {
-            'success': True,
-            'call_id': call_id,
-            'sop_generated': True,
-            'sop_length': len(sop_content),
-            'document_title': document_title,
-            'lindy_notified': lindy_result.get('success') if lindy_result else False,
-            'message': 'SOP sent to Lindy for Google Doc creation'
-        }
+        app.logger.info('Generating SOP from transcript')
+        sop_content = sop_generator.generate_sop(
+            transcript, customer_info, draft=draft, deadline=deadline
+        )
+        stored['sop_ref'], _ = store_generated_sop(call_id, sop_content)
+        return sop_content
+
+    def notify_completed(inputs):
+        # Send SOP content to Lindy (Lindy will create Google Doc)
+        app.logger.info('Sending SOP to Lindy for Google Doc creation')
+        return lindy_service.notify_sop_completed(
+            call_id,
+            None,  # No document URL yet - Lindy will create it
+            document_title,
+            customer_info,
+            inputs['generate'],  # Full SOP content
+            deadline=deadline
+        )
+
+    def ghl_note(inputs):
+        # Lindy handles document delivery, GHL just gets a note
+        app.logger.info('Notifying GHL')
+        return ghl_service._add_note(
+            customer_info.get('contact_id'),
+            f"SOP '{document_title}' has been generated and is being processed by automation.",
+            deadline=deadline
+        )
+
+    pipeline = Pipeline(f'voice_to_sop:{call_id}')
+    if lindy_service:
+        pipeline.add_stage(
+            'notify_started',
+            lambda inputs: lindy_service.notify_sop_started(call_id, customer_info, deadline=deadline),
+            timeout=notify_timeout,
+            required=False
+        )
+    pipeline.add_stage('generate', generate, timeout=app.config['PIPELINE_GENERATE_TIMEOUT'])
+    if lindy_service:
+        pipeline.add_stage(
+            'notify_completed', notify_completed,
+            depends_on=['generate'], timeout=notify_timeout, required=False
+        )
+    if customer_info.get('contact_id'):
+        pipeline.add_stage(
+            'ghl_note', ghl_note,
+            depends_on=['generate'], timeout=app.config['PIPELINE_GHL_TIMEOUT'], required=False
+        )
+
+    try:
+        run = pipeline.run(deadline=deadline)
 
     except Exception as e:
         app.logger.error(f'Error in voice to SOP processing: {str(e)}')
 
-        # Notify Lindy about the error
+        # Notify Lindy about the error, with its own budget since the
+        # request's may be what ran out
         if lindy_service:
-            lindy_service.notify_error(call_id, str(e), customer_info)
+            lindy_service.notify_error(
+                call_id, str(e), customer_info,
+                deadline=Deadline(app.config['LINDY_ERROR_TIMEOUT'])
+            )
 
         raise
 
+    sop_content = run['results']['generate']
+    lindy_result = run['results'].get('notify_completed')
+
+    result = {
+        'success': True,
+        'call_id': call_id,
+        'sop_generated': True,
+        'sop_length': len(sop_content),
+        'sop_ref': stored['sop_ref'],
+        'document_title': document_title,
+        'lindy_notified': lindy_result.get('success') if lindy_result else False,
+        'timings': run['timings'],
+        'message': 'SOP sent to Lindy for Google Doc creation'
+    }
+    return result
+
+
+def build_customer_info(customer):
+    """Build customer info from a VAPI call's customer object"""
+    return {
+        'name': customer.get('name', ''),
+        'email': customer.get('email', ''),
+        'phone': customer.get('number', ''),
+        'contact_id': customer.get('id', '')
+    }
+
+
+def handle_in_call_event(message):
+    """
+    Record an in-call VAPI event and start a speculative draft if due
+    'transcript' events append final utterances; 'conversation-update'
+    events replace the rolling transcript with the full conversation
+    """
+    message_type = message.get('type')
+    call = message.get('call', {})
+    call_id = call.get('id')
+
+    if not call_id:
+        return {'status': 'ignored', 'type': message_type}
+
+    if message_type == 'transcript':
+        if message.get('transcriptType') != 'final' or not message.get('transcript'):
+            return {'status': 'ignored', 'type': message_type}
+
+        speaker = 'User' if message.get('role') == 'user' else 'Assistant'
+        text = f"{speaker}: {message['transcript'].strip()}"
+        append = True
+    else:
+        messages = message.get('conversation') or message.get('messages', [])
+        text = format_conversation_messages(messages)
+        append = False
+
+    session = db.get_session()
+    try:
+        update_call_draft_transcript(session, call_id, text, append=append)
+        transcript, claimed_at = claim_call_draft(session, call_id, app.config['DRAFT_MIN_NEW_CHARS'])
+    finally:
+        session.close()
+
+    if transcript:
+        customer_info = build_customer_info(call.get('customer', {}))
+        draft_executor.submit(draft_sop_sections, call_id, transcript, customer_info, claimed_at)
+
+    return {'status': 'received', 'call_id': call_id, 'drafting': bool(transcript)}
+
+
+def draft_sop_sections(call_id, transcript, customer_info, claimed_at=None):
+    """Generate and store a speculative draft for an in-progress call"""
+    draft = None
+    try:
+        draft = sop_generator.generate_draft(transcript, customer_info)
+        app.logger.info(f'Drafted SOP sections for call {call_id}')
+    except Exception as e:
+        app.logger.warning(f'Speculative draft failed for call {call_id}: {str(e)}')
+    finally:
+        session = db.get_session()
+        try:
+            save_call_draft(session, call_id, draft, len(transcript), claimed_at)
+        finally:
+            session.close()
+
+
+def enqueue_voice_to_sop(call_id, transcript, customer_info):
+    """
+    Enqueue SOP generation for a claimed conversation on Celery
+    Returns as soon as the job is queued so the webhook doesn't wait on GPT-4
+    """
+    from celery_tasks import start_sop_pipeline
+
+    # The claimed conversation references the stored transcript; tasks get the call ID
+    task = start_sop_pipeline(call_id, customer_info)
+
+    session = db.get_session()
+    try:
+        conversation = get_conversation(session, call_id)
+        if conversation:
+            conversation.job_id = task.id
+            session.commit()
+    finally:
+        session.close()
+
+    app.logger.info(f'Enqueued SOP generation for call {call_id} as job {task.id}')
+
+    return {
+        'success': True,
+        'call_id': call_id,
+        'job_id': task.id,
+        'status': 'queued',
+        'message': 'SOP generation queued'
+    }
+
+
+def report_stream_progress(call_id, status, sop_length):
+    """Queue a Lindy sop_progress event without blocking the SSE stream"""
+    if lindy_service:
+        progress_executor.submit(send_stream_progress, call_id, status, sop_length)
+
+
+def send_stream_progress(call_id, status, sop_length):
+    """Post a Lindy sop_progress event (runs on the progress executor)"""
+    try:
+        lindy_service.send_custom_event('sop_progress', {
+            'call_id': call_id,
+            'status': status,
+            'sop_length': sop_length
+        })
+    except Exception as e:
+        app.logger.warning(f'Failed to send SOP progress for call {call_id}: {str(e)}')
+
+
+def spilled_call_response(call_id):
+    """Build the webhook response for a call parked by admission control"""
+    return {
+        'success': True,
+        'call_id': call_id,
+        'status': 'queued',
+        'spilled': True,
+        'message': 'Server busy - SOP generation will start when capacity frees up'
+    }
+
+
+def overloaded_response(decision):
+    """Build a 429 response for a request shed by admission control"""
+    response = jsonify({
+        'error': 'Server busy, retry later',
+        'reason': decision['reason'],
+        'retry_after': decision['retry_after']
+    })
+    response.headers['Retry-After'] = str(decision['retry_after'])
+    return response, 429
+
+
+def duplicate_call_response(conversation):
+    """Build the webhook response for a call that is already claimed"""
+    if conversation is None:
+        return {'error': 'Call could not be claimed'}, 409
+
+    if conversation.status == 'completed' and conversation.result:
+        return dict(conversation.result, duplicate=True), 200
+
+    return {
+        'success': True,
+        'call_id': conversation.call_id,
+        'job_id': conversation.job_id,
+        'status': conversation.status,
+        'duplicate': True,
+        'message': 'SOP generation already in progress for this call'
+    }, 202
+
 
 def create_vapi_assistant(data):
     """Helper to create VAPI assistant from Lindy"""
@@ -329,12 +935,12 @@ def create_vapi_assistant(data):
     return vapi_service.create_assistant(assistant_config)
 
 
-def generate_sop_manual(data):
+def generate_sop_manual(data, deadline=None):
     """Manual SOP generation trigger"""
     transcript = data.get('transcript')
     customer_info = data.get('customer_info', {})
 
-    sop_content = sop_generator.generate_sop(transcript, customer_info)
+    sop_content = sop_generator.generate_sop(transcript, customer_info, deadline=deadline)
 
     return {
         'success': True,
@@ -369,6 +975,9 @@ if __name__ == '__main__':
         app.logger.error(f'Configuration error: {str(e)}')
         exit(1)
 
+    # Single development process, so migrate in place
+    db.create_tables()
+
     app.run(
         host=app.config['HOST'],
         port=app.config['PORT'],
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+Benchmark the markdown to Google Docs renderer on large SOPs
+Usage: python bench_markdown_renderer.py [sections] [runs]
+"""
+
+import sys
+import os
+import time
+sys.path.insert(0, os.path.dirname(__file__))
+
+from services.markdown_renderer import markdown_to_requests, utf16_len
+
+SECTION = '''## {n}. Client Onboarding – Step {n}
+
+**Purpose:** Make sure every new client is set up *before* the kickoff call.
+
+1. Send the welcome email from `onboarding@company.com`
+2. Create the client folder in the [shared drive](https://drive.google.com/drive)
+   - Name it `Client – {n}` and share it with the account manager
+   - Add the **intake form** and *contract* templates
+3. Schedule the kickoff call ✅
+
+> Tip: confirm the client's time zone before booking.
+
+'''
+
+
+def build_document(sections):
+    """Build a formatted SOP with the given number of sections"""
+    body = ''.join(SECTION.format(n=n) for n in range(1, sections + 1))
+    return f'# Standard Operating Procedure\n\n{body}'
+
+
+def main():
+    sections = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    document = build_document(sections)
+    requests = markdown_to_requests(document)
+
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        markdown_to_requests(document)
+        timings.append(time.perf_counter() - started)
+
+    text = requests[0]['insertText']['text']
+    counts = {}
+    for request in requests:
+        kind = next(iter(request))
+        counts[kind] = counts.get(kind, 0) + 1
+
+    print(f'Markdown: {len(document):,} chars, {sections} sections')
+    print(f'Document text: {utf16_len(text):,} UTF-16 units')
+    print(f'Requests: {len(requests):,} in 1 batchUpdate {counts}')
+    print(f'Render time: best {min(timings) * 1000:.1f} ms, '
+          f'mean {sum(timings) / len(timings) * 1000:.1f} ms over {runs} runs')
+
+
+if __name__ == '__main__':
+    main()
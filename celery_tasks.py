@@ -1,6 +1,12 @@
 from celery import Celery
+from celery.signals import (
+    worker_init, worker_process_init, worker_process_shutdown, worker_shutdown
+)
+from kombu import Queue
 from config import Config
 import logging
+import os
+import threading
 
 # Initialize Celery
 celery_app = Celery(
@@ -15,82 +21,504 @@ celery_app.conf.update(
     result_serializer='json',
     timezone='UTC',
     enable_utc=True,
+    # Stage tasks pass only call IDs and content hashes; results are small
+    # and needn't outlive the job polling window
+    result_expires=Config.CELERY_RESULT_EXPIRES,
+    # A worker started without -Q consumes all of these
+    task_queues=(
+        Queue('celery'),         # Quick bookkeeping tasks
+        Queue('llm'),            # OpenAI-bound SOP generation
+        Queue('documents'),      # Google Docs calls
+        Queue('notifications'),  # GHL and Lindy calls
+    ),
+    task_default_queue='celery',
+    task_routes={
+        'tasks.sop.generate': {'queue': 'llm'},
+        'tasks.sop.render_doc': {'queue': 'documents'},
+        'tasks.sop.notify_started': {'queue': 'notifications'},
+        'tasks.sop.notify': {'queue': 'notifications'},
+        'tasks.send_reminder': {'queue': 'notifications'},
+        'tasks.dispatch_lindy_outbox': {'queue': 'notifications'},
+    },
 )
 
+# Per-worker rate limits, e.g. '60/m'
+rate_limits = {
+    'tasks.sop.generate': Config.CELERY_LLM_RATE_LIMIT,
+    'tasks.sop.notify_started': Config.CELERY_NOTIFY_RATE_LIMIT,
+    'tasks.sop.notify': Config.CELERY_NOTIFY_RATE_LIMIT,
+    'tasks.send_reminder': Config.CELERY_NOTIFY_RATE_LIMIT,
+}
+celery_app.conf.task_annotations = {
+    name: {'rate_limit': limit} for name, limit in rate_limits.items() if limit
+}
+
 logger = logging.getLogger(__name__)
 
 
-@celery_app.task(name='tasks.process_transcript')
-def process_transcript_async(call_id, transcript, customer_info):
+# Services used by the tasks routed to each queue, built when a worker starts
+QUEUE_SERVICES = {
+    'celery': [],
+    'llm': ['sop_generator'],
+    'documents': [],
+    'notifications': ['ghl_service', 'lindy_service'],
+}
+
+
+class WorkerServices:
     """
-    Async task to process transcript and generate SOP
-    This allows long-running SOP generation without blocking the webhook response
+    Services shared by every task in a worker process
+
+    Each service is built on first use and then reused, so tasks don't pay
+    for a new OpenAI client, Google API discovery or database connection
+    pool every time. Instances belong to the process that built them;
+    get_worker_services() starts over after a fork. Google API clients
+    aren't thread-safe, so the Docs service is kept per thread.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._services = {}
+        self._local = threading.local()
+
+    def _get(self, name, factory):
+        service = self._services.get(name)
+        if service is None:
+            with self._lock:
+                service = self._services.get(name)
+                if service is None:
+                    service = factory()
+                    self._services[name] = service
+        return service
+
+    @property
+    def db(self):
+        from models import Database
+        return self._get('db', lambda: Database(Config.DATABASE_URL))
+
+    @property
+    def sop_generator(self):
+        def build():
+            from services.sop_generator import SOPGenerator
+            from services.sop_cache import SOPCache
+
+            return SOPGenerator(
+                Config.OPENAI_API_KEY,
+                cache=SOPCache.from_config(Config),
+                max_transcript_tokens=Config.SOP_MAX_TRANSCRIPT_TOKENS,
+                chunk_workers=Config.SOP_CHUNK_WORKERS,
+                compaction_level=Config.SOP_COMPACTION_LEVEL
+            )
+        return self._get('sop_generator', build)
+
+    @property
+    def ghl_service(self):
+        def build():
+            from services.ghl_service import GHLService
+
+            return GHLService(
+                Config.GHL_API_KEY,
+                max_workers=Config.GHL_MAX_WORKERS,
+                send_timeout=Config.GHL_SEND_TIMEOUT,
+                send_concurrency=Config.GHL_SEND_CONCURRENCY,
+                contact_cache_ttl=Config.GHL_CONTACT_CACHE_TTL,
+                contact_cache_size=Config.GHL_CONTACT_CACHE_SIZE,
+                redis_url=Config.REDIS_URL if Config.GHL_CONTACT_CACHE_REDIS else None,
+                contact_cache_local_ttl=Config.GHL_CONTACT_CACHE_LOCAL_TTL
+            )
+        return self._get('ghl_service', build)
+
+    @property
+    def lindy_service(self):
+        """Lindy service configured like the web app's, or None without a webhook URL"""
+        if not Config.LINDY_WEBHOOK_URL:
+            return None
+
+        def build():
+            from services.artifact_store import create_artifact_store
+            from services.lindy_service import LindyOutbox, LindyService
+
+            outbox = None
+            if Config.LINDY_OUTBOX:
+                outbox = LindyOutbox(
+                    self.db,
+                    batch_size=Config.LINDY_OUTBOX_BATCH_SIZE,
+                    max_attempts=Config.LINDY_OUTBOX_MAX_ATTEMPTS
+                )
+            return LindyService(
+                Config.LINDY_WEBHOOK_URL,
+                Config.LINDY_WEBHOOK_SECRET,
+                outbox=outbox,
+                artifact_store=create_artifact_store(Config, self.db) if Config.PUBLIC_BASE_URL else None,
+                inline_max_bytes=Config.LINDY_INLINE_MAX_BYTES
+            )
+        return self._get('lindy_service', build)
+
+    @property
+    def blob_store(self):
+        def build():
+            from services.artifact_store import create_blob_store
+            return create_blob_store(Config, self.db)
+        return self._get('blob_store', build)
+
+    @property
+    def admission(self):
+        def build():
+            from services.admission import AdmissionController
+            return AdmissionController.from_config(Config)
+        return self._get('admission', build)
+
+    def warm(self, queues=None):
+        """
+        Build the services tasks need ahead of the first task
+
+        Args:
+            queues (iterable): Queues this worker consumes (default: all);
+                only the services their tasks use are built
+        """
+        queues = set(queues or QUEUE_SERVICES)
+        names = ['db']
+        for queue, services in QUEUE_SERVICES.items():
+            if queue in queues:
+                names.extend(name for name in services if name not in names)
+
+        for name in names:
+            try:
+                getattr(self, name)
+            except Exception as e:
+                # Left for the first task to build, and fail, as before
+                logger.warning(f'Worker service {name} not prebuilt: {str(e)}')
+
+    def close(self):
+        """Release pooled database connections"""
+        db = self._services.get('db')
+        if db is not None:
+            db.engine.dispose()
+
+
+_worker_services = None
+_worker_services_lock = threading.Lock()
+
+
+def get_worker_services():
+    """Get this process's shared services, rebuilding them after a fork"""
+    global _worker_services
+    services = _worker_services
+    if services is None or services.pid != os.getpid():
+        with _worker_services_lock:
+            if _worker_services is None or _worker_services.pid != os.getpid():
+                _worker_services = WorkerServices()
+            services = _worker_services
+    return services
+
+
+def warm_worker():
+    """Build shared services and open keep-alive connections for this process"""
+    from services.http_client import prewarm_connections
+
+    get_worker_services().warm(celery_app.amqp.queues.consume_from)
+    prewarm_connections()
+
+
+def close_worker():
+    """Close this process's database connections"""
+    if _worker_services is not None and _worker_services.pid == os.getpid():
+        _worker_services.close()
+
+
+def is_prefork_worker(worker):
+    """Whether a worker runs tasks in forked child processes"""
+    from celery.concurrency import get_implementation
+    from celery.concurrency.prefork import TaskPool
+
+    return issubclass(get_implementation(worker.pool_cls), TaskPool)
+
+
+@worker_init.connect
+def init_worker(sender=None, **kwargs):
+    """
+    Warm a threads, solo, gevent or eventlet worker once at startup
+
+    Their tasks run in this process, where worker_process_init never fires.
+    Prefork workers are left to warm each child after the fork.
+    """
+    if sender is not None and not is_prefork_worker(sender):
+        warm_worker()
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """Build shared services and open keep-alive connections in each worker process"""
+    warm_worker()
+
+
+@worker_shutdown.connect
+def shutdown_worker(sender=None, **kwargs):
+    """Close the database connections of a non-prefork worker"""
+    close_worker()
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    """Close the worker process's database connections"""
+    close_worker()
+
+
+class SOPPipelineStage(celery_app.Task):
     """
+    Base task for the stages of the async SOP pipeline
+
+    Stages are retried with exponential backoff and checkpoint their output,
+    so a retry resumes at the failed stage instead of regenerating the SOP
+    or notifying twice. Once a stage runs out of retries the call is marked
+    failed, letting a redelivered webhook reclaim it, and Lindy gets the
+    same sop_error event as in synchronous mode.
+    """
+    autoretry_for = (Exception,)
+    retry_backoff = True
+    retry_backoff_max = 300
+    max_retries = 3
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        from models import update_conversation_status
+
+        call_id = args[0] if args else kwargs.get('call_id')
+        logger.error(f'SOP pipeline stage {self.name} failed for call {call_id}: {str(exc)}')
+
+        services = get_worker_services()
+        session = services.db.get_session()
+        try:
+            conversation = update_conversation_status(session, call_id, 'failed')
+            customer_info = (conversation.customer_info if conversation else None) or {}
+        finally:
+            session.close()
+
+        if services.lindy_service:
+            services.lindy_service.notify_error(call_id, str(exc), customer_info)
+
+
+def sop_document_title(call_id, customer_info):
+    """Title of a call's SOP, as used by the synchronous flow"""
+    return f"SOP - {customer_info.get('name', 'Customer')} - {call_id}"
+
+
+def load_blob(digest):
+    """Read an SOP body passed between tasks by its SHA-256"""
+    data = get_worker_services().blob_store.get(digest)
+    if data is None:
+        raise LookupError(f'Blob {digest} not found')
+    return data.decode('utf-8')
+
+
+def checkpointed_sop(conversation):
+    """The SOP content recorded by the generate stage"""
+    return load_blob(conversation.checkpoints['generate']['sop_ref'])
+
+
+def run_stage(call_id, stage, func):
+    """
+    Run a pipeline stage once per call
+
+    Args:
+        call_id (str): VAPI call ID
+        stage (str): Checkpoint name
+        func (callable): Called with (session, conversation); returns the
+            JSON-serializable output to checkpoint
+
+    Returns:
+        The stage's output, from its checkpoint if it already ran
+    """
+    from models import get_checkpoint, get_conversation, save_checkpoint
+
+    session = get_worker_services().db.get_session()
     try:
-        logger.info(f'Processing transcript async for call: {call_id}')
-
-        # Import here to avoid circular imports
-        from services.sop_generator import SOPGenerator
-        from services.google_docs_service import GoogleDocsService
-        from services.ghl_service import GHLService
-        from models import Database, save_conversation, save_sop_document
-
-        # Initialize services
-        sop_generator = SOPGenerator(Config.OPENAI_API_KEY)
-        google_docs_service = GoogleDocsService(
-            Config.GOOGLE_CREDENTIALS_PATH,
-            Config.GOOGLE_FOLDER_ID
+        output = get_checkpoint(session, call_id, stage)
+        if output is not None:
+            logger.info(f'Call {call_id}: {stage} already done, skipping')
+            return output
+
+        output = func(session, get_conversation(session, call_id))
+        save_checkpoint(session, call_id, stage, output)
+        logger.info(f'Call {call_id}: {stage} done')
+        return output
+
+    finally:
+        session.close()
+
+
+@celery_app.task(base=SOPPipelineStage, name='tasks.sop.generate', ignore_result=True)
+def generate_stage(call_id):
+    """Generate the SOP, finishing any draft built while the call was running"""
+    from models import get_call_draft_content, get_conversation_transcript
+
+    def generate(session, conversation):
+        draft = None
+        if Config.SPECULATIVE_DRAFTS:
+            draft = get_call_draft_content(session, call_id)
+
+        services = get_worker_services()
+        sop_content = services.sop_generator.generate_sop(
+            get_conversation_transcript(conversation, services.blob_store),
+            conversation.customer_info or {},
+            draft=draft
         )
-        ghl_service = GHLService(Config.GHL_API_KEY)
+        # The body goes to the blob store; the checkpoint keeps its hash
+        return {
+            'sop_ref': services.blob_store.put(sop_content),
+            'sop_length': len(sop_content)
+        }
 
-        # Save conversation to database
-        db = Database(Config.DATABASE_URL)
-        session = db.get_session()
+    run_stage(call_id, 'generate', generate)
+    return call_id
 
-        try:
-            save_conversation(session, call_id, transcript, customer_info)
 
-            # Generate SOP
-            sop_content = sop_generator.generate_sop(transcript, customer_info)
+@celery_app.task(name='tasks.sop.notify_started', ignore_result=True)
+def notify_started_stage(call_id, customer_info):
+    """Tell Lindy generation has started (runs alongside the pipeline)"""
+    lindy_service = get_worker_services().lindy_service
+    if lindy_service:
+        lindy_service.notify_sop_started(call_id, customer_info)
+
+
+@celery_app.task(name='tasks.sop.render_doc', ignore_result=True)
+def render_doc_stage(call_id):
+    """Pass-through kept so chains queued with a render_doc stage still reach notify"""
+    return call_id
+
+
+@celery_app.task(name='tasks.sop.save', ignore_result=True)
+def save_stage(call_id):
+    """Pass-through kept so chains queued with a save stage still reach notify"""
+    return call_id
 
-            # Create Google Doc
-            doc_info = google_docs_service.create_document(
-                title=f"SOP - {customer_info.get('name', 'Customer')} - {call_id}",
-                content=sop_content
-            )
 
-            # Save document
-            save_sop_document(
-                session,
-                doc_info['id'],
-                doc_info['url'],
-                doc_info['title'],
-                sop_content,
+@celery_app.task(base=SOPPipelineStage, name='tasks.sop.notify')
+def notify_stage(call_id):
+    """
+    Send the SOP to Lindy, add the GHL note and complete the call
+
+    As in process_voice_to_sop, Lindy gets the SOP content and creates the
+    Google Doc, and the GHL contact just gets a note. Neither is required
+    for the call to complete, and each is checkpointed separately so a
+    retry doesn't repeat one that went through.
+    """
+    from models import complete_conversation, get_conversation
+
+    services = get_worker_services()
+    session = services.db.get_session()
+    try:
+        conversation = get_conversation(session, call_id)
+        customer_info = conversation.customer_info or {}
+        sop_ref = conversation.checkpoints['generate']['sop_ref']
+        sop_content = checkpointed_sop(conversation)
+    finally:
+        session.close()
+
+    document_title = sop_document_title(call_id, customer_info)
+    lindy_result = None
+
+    if services.lindy_service:
+        def notify_completed(session, conversation):
+            logger.info('Sending SOP to Lindy for Google Doc creation')
+            result = services.lindy_service.notify_sop_completed(
                 call_id,
-                customer_info.get('contact_id')
+                None,  # No document URL yet - Lindy will create it
+                document_title,
+                customer_info,
+                sop_content
             )
+            return {'success': result.get('success', False)}
+
+        lindy_result = run_stage(call_id, 'notify_completed', notify_completed)
+
+    if customer_info.get('contact_id'):
+        def ghl_note(session, conversation):
+            # Lindy handles document delivery, GHL just gets a note
+            try:
+                services.ghl_service._add_note(
+                    customer_info.get('contact_id'),
+                    f"SOP '{document_title}' has been generated and is being processed by automation."
+                )
+                return {'success': True}
+            except Exception as e:
+                logger.warning(f'GHL note failed for call {call_id}: {str(e)}')
+                return {'success': False, 'error': str(e)}
+
+        run_stage(call_id, 'ghl_note', ghl_note)
+
+    result = {
+        'success': True,
+        'call_id': call_id,
+        'sop_generated': True,
+        'sop_length': len(sop_content),
+        'sop_ref': sop_ref,
+        'document_title': document_title,
+        'lindy_notified': lindy_result.get('success') if lindy_result else False,
+        'message': 'SOP sent to Lindy for Google Doc creation'
+    }
+
+    # Stored so retried webhooks for this call get the same result
+    session = services.db.get_session()
+    try:
+        complete_conversation(session, call_id, result)
+    finally:
+        session.close()
 
-            # Send to GHL
-            ghl_result = ghl_service.send_document(
-                customer_info.get('contact_id'),
-                doc_info['url'],
-                doc_info['title']
-            )
+    logger.info(f'Successfully processed transcript for call: {call_id}')
+    return result
 
-            logger.info(f'Successfully processed transcript for call: {call_id}')
 
-            return {
-                'success': True,
-                'call_id': call_id,
-                'document_url': doc_info['url']
-            }
+def start_sop_pipeline(call_id, customer_info):
+    """
+    Queue the staged SOP pipeline for a saved call
 
-        finally:
-            session.close()
+    Stages load the transcript the call's conversation row references, so
+    task messages carry only the call ID.
 
-    except Exception as e:
-        logger.error(f'Error processing transcript async: {str(e)}')
-        raise
+    Args:
+        call_id (str): VAPI call ID of a saved conversation
+        customer_info (dict): Customer information
+
+    Returns:
+        AsyncResult: Result of the final stage, whose ID is the job ID
+    """
+    from celery import chain
+
+    if Config.LINDY_WEBHOOK_URL:
+        # Independent of the pipeline, as in process_voice_to_sop
+        notify_started_stage.delay(call_id, customer_info)
+
+    return chain(
+        generate_stage.s(call_id),
+        notify_stage.s()
+    ).apply_async()
+
+
+@celery_app.task(name='tasks.process_transcript')
+def process_transcript_async(call_id, transcript, customer_info):
+    """
+    Async task to process transcript and generate SOP
+    Starts the staged pipeline; kept so jobs queued before the pipeline was
+    split into stages still run. Nothing queues it any more, so these old
+    messages are the only ones that carry a transcript
+    """
+    from models import get_conversation, save_conversation
+
+    logger.info(f'Processing transcript async for call: {call_id}')
+
+    services = get_worker_services()
+    session = services.db.get_session()
+    try:
+        if get_conversation(session, call_id) is None:
+            save_conversation(
+                session, call_id, None, customer_info,
+                transcript_ref=services.blob_store.put(transcript)
+            )
+    finally:
+        session.close()
+
+    return {'job_id': start_sop_pipeline(call_id, customer_info).id}
 
 
 @celery_app.task(name='tasks.send_reminder')
@@ -100,9 +528,7 @@ def send_reminder_async(contact_id, document_url, document_title):
     Can be scheduled to run after X days
     """
     try:
-        from services.ghl_service import GHLService
-
-        ghl_service = GHLService(Config.GHL_API_KEY)
+        ghl_service = get_worker_services().ghl_service
 
         ghl_service._send_sms(
             contact_id,
@@ -117,18 +543,17 @@ def send_reminder_async(contact_id, document_url, document_title):
         raise
 
 
-@celery_app.task(name='tasks.cleanup_old_logs')
+@celery_app.task(name='tasks.cleanup_old_logs', ignore_result=True)
 def cleanup_old_logs():
     """
-    Periodic task to cleanup old webhook logs
+    Periodic task to cleanup old webhook logs, task blobs and call drafts
     Run this daily or weekly
     """
     try:
-        from models import Database, WebhookLog
+        from models import Blob, CallDraft, Conversation, WebhookLog
         from datetime import datetime, timedelta
 
-        db = Database(Config.DATABASE_URL)
-        session = db.get_session()
+        session = get_worker_services().db.get_session()
 
         try:
             # Delete logs older than 30 days
@@ -138,10 +563,42 @@ def cleanup_old_logs():
                 WebhookLog.created_at < cutoff_date
             ).delete()
 
+            # SOPs not stored again in 30 days: Lindy keeps the document of
+            # a completed call. Transcripts are the only copy, so they stay
+            # while a conversation references them, as do the SOPs of calls
+            # that haven't completed, which a retry still delivers
+            transcript_refs = session.query(Conversation.transcript_ref).filter(
+                Conversation.transcript_ref.isnot(None)
+            )
+            pending_sop_refs = {
+                checkpoints['generate']['sop_ref']
+                for (checkpoints,) in session.query(Conversation.checkpoints).filter(
+                    Conversation.status != 'completed'
+                )
+                if checkpoints and 'generate' in checkpoints
+            }
+            deleted_blobs = session.query(Blob).filter(
+                Blob.created_at < cutoff_date,
+                Blob.sha256.notin_(transcript_refs),
+                Blob.sha256.notin_(pending_sop_refs)
+            ).delete(synchronize_session=False)
+
+            # Completed calls delete their draft; these are calls that
+            # failed or never ended, whose transcript is no longer needed
+            deleted_drafts = session.query(CallDraft).filter(
+                CallDraft.updated_at < datetime.utcnow() - timedelta(days=1)
+            ).delete()
+
             session.commit()
 
-            logger.info(f'Cleaned up {deleted} old webhook logs')
-            return {'success': True, 'deleted': deleted}
+            logger.info(f'Cleaned up {deleted} old webhook logs, {deleted_blobs} task blobs '
+                        f'and {deleted_drafts} call drafts')
+            return {
+                'success': True,
+                'deleted': deleted,
+                'deleted_blobs': deleted_blobs,
+                'deleted_drafts': deleted_drafts
+            }
 
         finally:
             session.close()
@@ -151,6 +608,81 @@ def cleanup_old_logs():
         raise
 
 
+@celery_app.task(name='tasks.dispatch_lindy_outbox', ignore_result=True)
+def dispatch_lindy_outbox():
+    """
+    Periodic task to deliver queued Lindy events
+    Scheduled every LINDY_OUTBOX_INTERVAL seconds when LINDY_OUTBOX is enabled
+    """
+    try:
+        from services.lindy_service import LindyOutbox
+
+        if not Config.LINDY_WEBHOOK_URL:
+            return {'success': True, 'sent': 0, 'retried': 0, 'failed': 0}
+
+        services = get_worker_services()
+        outbox = LindyOutbox(
+            services.db,
+            batch_size=Config.LINDY_OUTBOX_BATCH_SIZE,
+            max_attempts=Config.LINDY_OUTBOX_MAX_ATTEMPTS
+        )
+
+        counts = outbox.dispatch(services.lindy_service)
+        return {'success': True, **counts}
+
+    except Exception as e:
+        logger.error(f'Error dispatching Lindy outbox: {str(e)}')
+        raise
+
+
+@celery_app.task(name='tasks.drain_spilled_calls', ignore_result=True)
+def drain_spilled_calls():
+    """
+    Periodic task to start calls parked by webhook admission control
+    Scheduled every ADMISSION_DRAIN_INTERVAL seconds when ADMISSION_CONTROL is enabled
+    """
+    try:
+        from models import claim_spilled_conversations, spill_conversation
+
+        services = get_worker_services()
+
+        # Only fill the room left below the admission limit
+        capacity = services.admission.capacity()
+        limit = Config.ADMISSION_DRAIN_BATCH_SIZE
+        if capacity is not None:
+            limit = min(limit, capacity)
+        if not limit:
+            return {'success': True, 'started': 0}
+
+        started = 0
+        session = services.db.get_session()
+
+        try:
+            for conversation in claim_spilled_conversations(session, limit):
+                try:
+                    task = start_sop_pipeline(conversation.call_id, conversation.customer_info or {})
+                except Exception as e:
+                    # Park it again for the next run rather than leave it claimed
+                    logger.error(f'Failed to start spilled call {conversation.call_id}: {str(e)}')
+                    spill_conversation(session, conversation.call_id)
+                    continue
+
+                conversation.job_id = task.id
+                session.commit()
+                started += 1
+
+        finally:
+            session.close()
+
+        if started:
+            logger.info(f'Started {started} spilled calls')
+        return {'success': True, 'started': started}
+
+    except Exception as e:
+        logger.error(f'Error draining spilled calls: {str(e)}')
+        raise
+
+
 # Periodic task schedule
 celery_app.conf.beat_schedule = {
     'cleanup-logs-daily': {
@@ -158,3 +690,17 @@ celery_app.conf.beat_schedule = {
         'schedule': 86400.0,  # Run every 24 hours
     },
 }
+
+if Config.LINDY_OUTBOX:
+    celery_app.conf.beat_schedule['dispatch-lindy-outbox'] = {
+        'task': 'tasks.dispatch_lindy_outbox',
+        'schedule': Config.LINDY_OUTBOX_INTERVAL,
+        'options': {'expires': Config.LINDY_OUTBOX_INTERVAL},
+    }
+
+if Config.ADMISSION_CONTROL:
+    celery_app.conf.beat_schedule['drain-spilled-calls'] = {
+        'task': 'tasks.drain_spilled_calls',
+        'schedule': Config.ADMISSION_DRAIN_INTERVAL,
+        'options': {'expires': Config.ADMISSION_DRAIN_INTERVAL},
+    }
@@ -19,6 +19,11 @@ class Config:
     # Google
     GOOGLE_CREDENTIALS_PATH = os.getenv('GOOGLE_CREDENTIALS_PATH', './credentials/google_credentials.json')
     GOOGLE_FOLDER_ID = os.getenv('GOOGLE_FOLDER_ID')
+    # Optional pre-styled document that new SOPs are copied from
+    GOOGLE_TEMPLATE_ID = os.getenv('GOOGLE_TEMPLATE_ID')
+    # Cache of document text, revalidated by revision (TTL in seconds, 0 disables)
+    GOOGLE_DOC_CACHE_TTL = int(os.getenv('GOOGLE_DOC_CACHE_TTL', 3600))
+    GOOGLE_DOC_CACHE_SIZE = int(os.getenv('GOOGLE_DOC_CACHE_SIZE', 64))
 
     # Lindy
     LINDY_WEBHOOK_SECRET = os.getenv('LINDY_WEBHOOK_SECRET')
@@ -30,10 +35,115 @@ class Config:
     # Redis
     REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 
+    # Webhook processing
+    # When enabled, end-of-call reports are saved and handed off to Celery
+    # and the webhook returns 202 immediately instead of waiting on GPT-4
+    ASYNC_WEBHOOKS = os.getenv('ASYNC_WEBHOOKS', 'False') == 'True'
+    # Seconds before an unfinished call can be reclaimed by a retried webhook
+    CALL_LOCK_TIMEOUT = int(os.getenv('CALL_LOCK_TIMEOUT', 300))
+
+    # Admission control - shed webhooks when the Celery queues or this
+    # process are over their limits (0 disables a limit)
+    ADMISSION_CONTROL = os.getenv('ADMISSION_CONTROL', 'False') == 'True'
+    ADMISSION_QUEUES = os.getenv('ADMISSION_QUEUES', 'celery,llm')
+    ADMISSION_MAX_QUEUE_DEPTH = int(os.getenv('ADMISSION_MAX_QUEUE_DEPTH', 200))
+    ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', 16))
+    ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', 30))
+    # 'spill' stores shed end-of-call reports for later, 'reject' answers 429
+    ADMISSION_OVERLOAD_MODE = os.getenv('ADMISSION_OVERLOAD_MODE', 'spill')
+    ADMISSION_DRAIN_INTERVAL = float(os.getenv('ADMISSION_DRAIN_INTERVAL', 10))
+    ADMISSION_DRAIN_BATCH_SIZE = int(os.getenv('ADMISSION_DRAIN_BATCH_SIZE', 20))
+
+    # SOP cache
+    SOP_CACHE_SIZE = int(os.getenv('SOP_CACHE_SIZE', 128))
+    SOP_CACHE_TTL = int(os.getenv('SOP_CACHE_TTL', 86400))
+    SOP_CACHE_REDIS = os.getenv('SOP_CACHE_REDIS', 'False') == 'True'
+
+    # Speculative drafts - pre-generate SOP sections from in-call VAPI events
+    SPECULATIVE_DRAFTS = os.getenv('SPECULATIVE_DRAFTS', 'False') == 'True'
+    # New transcript characters required before the draft is regenerated
+    DRAFT_MIN_NEW_CHARS = int(os.getenv('DRAFT_MIN_NEW_CHARS', 1500))
+    DRAFT_WORKERS = int(os.getenv('DRAFT_WORKERS', 2))
+
+    # Transcripts above this many tokens are condensed chunk by chunk
+    SOP_MAX_TRANSCRIPT_TOKENS = int(os.getenv('SOP_MAX_TRANSCRIPT_TOKENS', 12000))
+    SOP_CHUNK_WORKERS = int(os.getenv('SOP_CHUNK_WORKERS', 4))
+    # Transcript compaction before prompting (0 = off, 3 = most aggressive)
+    SOP_COMPACTION_LEVEL = int(os.getenv('SOP_COMPACTION_LEVEL', 1))
+
+    # Time budget (seconds) for synchronous webhook processing, kept below
+    # gunicorn's --timeout so work stops before the worker is killed
+    WEBHOOK_DEADLINE = float(os.getenv('WEBHOOK_DEADLINE', 110))
+    # Timeout (seconds) for the sop_error event sent after a webhook fails,
+    # which may be because WEBHOOK_DEADLINE ran out
+    LINDY_ERROR_TIMEOUT = float(os.getenv('LINDY_ERROR_TIMEOUT', 5))
+
+    # Per-stage timeouts (seconds) for the voice-to-SOP pipeline
+    PIPELINE_GENERATE_TIMEOUT = float(os.getenv('PIPELINE_GENERATE_TIMEOUT', 110))
+    PIPELINE_NOTIFY_TIMEOUT = float(os.getenv('PIPELINE_NOTIFY_TIMEOUT', 30))
+    # GHL calls get GHL_SEND_TIMEOUT each, so the GHL stage defaults to no less
+    PIPELINE_GHL_TIMEOUT = float(os.getenv('PIPELINE_GHL_TIMEOUT', os.getenv('GHL_SEND_TIMEOUT', 60)))
+
+    # Characters of streamed SOP between progress events sent to Lindy
+    SOP_STREAM_PROGRESS_CHARS = int(os.getenv('SOP_STREAM_PROGRESS_CHARS', 1000))
+
+    # Durable outbox for Lindy events, drained by a Celery beat task
+    LINDY_OUTBOX = os.getenv('LINDY_OUTBOX', 'False') == 'True'
+    LINDY_OUTBOX_INTERVAL = float(os.getenv('LINDY_OUTBOX_INTERVAL', 5))
+    LINDY_OUTBOX_BATCH_SIZE = int(os.getenv('LINDY_OUTBOX_BATCH_SIZE', 50))
+    LINDY_OUTBOX_MAX_ATTEMPTS = int(os.getenv('LINDY_OUTBOX_MAX_ATTEMPTS', 8))
+
+    # Artifact store for generated SOPs ('' disables, 'database', 'local' or 's3');
+    # shared by the web app, which serves artifacts, and the Celery workers
+    ARTIFACT_STORE = os.getenv('ARTIFACT_STORE', '')
+    ARTIFACT_DIR = os.getenv('ARTIFACT_DIR', './artifacts')
+    ARTIFACT_S3_BUCKET = os.getenv('ARTIFACT_S3_BUCKET')
+    ARTIFACT_S3_PREFIX = os.getenv('ARTIFACT_S3_PREFIX', 'artifacts/')
+    ARTIFACT_S3_ENDPOINT_URL = os.getenv('ARTIFACT_S3_ENDPOINT_URL')
+    ARTIFACT_S3_REGION = os.getenv('ARTIFACT_S3_REGION')
+    # Signed artifact URLs (key defaults to SECRET_KEY)
+    ARTIFACT_SIGNING_KEY = os.getenv('ARTIFACT_SIGNING_KEY')
+    ARTIFACT_URL_TTL = int(os.getenv('ARTIFACT_URL_TTL', 604800))
+    # Public URL of this app, used to build artifact links for Lindy
+    PUBLIC_BASE_URL = os.getenv('PUBLIC_BASE_URL')
+    # SOPs up to this many bytes are also sent to Lindy inline, gzip-compressed
+    LINDY_INLINE_MAX_BYTES = int(os.getenv('LINDY_INLINE_MAX_BYTES', 32768))
+
+    # Where call transcripts and generated SOPs are stored by hash
+    # ('database' or 'artifacts' for the ARTIFACT_STORE backend)
+    TASK_BLOB_STORE = os.getenv('TASK_BLOB_STORE', 'database')
+    # Seconds Celery keeps task results in Redis
+    CELERY_RESULT_EXPIRES = int(os.getenv('CELERY_RESULT_EXPIRES', 86400))
+
+    # Celery per-worker rate limits for LLM and notification tasks (e.g. '60/m')
+    CELERY_LLM_RATE_LIMIT = os.getenv('CELERY_LLM_RATE_LIMIT')
+    CELERY_NOTIFY_RATE_LIMIT = os.getenv('CELERY_NOTIFY_RATE_LIMIT')
+
     # Server
     PORT = int(os.getenv('PORT', 5000))
     HOST = os.getenv('HOST', '0.0.0.0')
 
+    # Outbound HTTP (VAPI, GHL, Lindy)
+    HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 30))
+    HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 10))
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 10))
+    HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', 2))
+    HTTP_BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', 0.5))
+    HTTP_PREWARM = os.getenv('HTTP_PREWARM', 'True') == 'True'
+
+    # GHL document delivery: concurrent channels and overall deadline (seconds)
+    GHL_MAX_WORKERS = int(os.getenv('GHL_MAX_WORKERS', 4))
+    GHL_SEND_TIMEOUT = float(os.getenv('GHL_SEND_TIMEOUT', 60))
+    # Concurrent send_document calls per process (web threads or Celery worker
+    # concurrency); the GHL executor gets GHL_MAX_WORKERS threads for each
+    GHL_SEND_CONCURRENCY = int(os.getenv('GHL_SEND_CONCURRENCY', 8))
+    # GHL contact cache (TTL in seconds, 0 disables)
+    GHL_CONTACT_CACHE_TTL = int(os.getenv('GHL_CONTACT_CACHE_TTL', 300))
+    GHL_CONTACT_CACHE_SIZE = int(os.getenv('GHL_CONTACT_CACHE_SIZE', 1024))
+    GHL_CONTACT_CACHE_REDIS = os.getenv('GHL_CONTACT_CACHE_REDIS', 'False') == 'True'
+    # With Redis, how long other processes may serve a contact from before an update
+    GHL_CONTACT_CACHE_LOCAL_TTL = int(os.getenv('GHL_CONTACT_CACHE_LOCAL_TTL', 30))
+
     # VAPI Configuration
     VAPI_BASE_URL = 'https://api.vapi.ai'
 
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Create database tables and add columns missing from existing ones
+
+Run once per deploy before the web server and workers start (run_server.py
+does this for Railway and Docker); the web app no longer touches the schema
+when it is imported.
+"""
+import logging
+import sys
+
+from config import Config
+from models import Database
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        Database(Config.DATABASE_URL).create_tables()
+    except Exception as e:
+        print(f"Database migration failed: {e}", file=sys.stderr)
+        return 1
+
+    print("Database is up to date")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
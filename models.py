@@ -1,7 +1,8 @@
-from sqlalchemy import create_engine, Column, String, DateTime, Text, JSON, Integer
+from sqlalchemy import create_engine, inspect, text, Column, String, DateTime, Text, JSON, Integer, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
 from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,9 +18,27 @@ class Conversation(Base):
     call_id = Column(String(100), unique=True, nullable=False)
     contact_id = Column(String(100))
     assistant_id = Column(String(100))
-    transcript = Column(Text)
+    transcript = Column(Text)  # Only for rows saved before transcript_ref
+    transcript_ref = Column(String(64), index=True)  # SHA-256 of the transcript blob
     customer_info = Column(JSON)
-    status = Column(String(50), default='processing')  # processing, completed, failed
+    status = Column(String(50), default='processing')  # queued, processing, completed, failed
+    job_id = Column(String(100))  # Celery job ID when processed async
+    result = Column(JSON)  # Processing result returned to duplicate webhooks
+    checkpoints = Column(JSON)  # Output of each finished async pipeline stage
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class CallDraft(Base):
+    """Rolling transcript and speculative SOP draft for an in-progress call"""
+    __tablename__ = 'call_drafts'
+
+    call_id = Column(String(100), primary_key=True)
+    transcript = Column(Text, default='')
+    draft = Column(Text)  # Pre-generated SOP sections
+    drafted_length = Column(Integer, default=0)  # Transcript length the draft covers
+    status = Column(String(50), default='idle')  # idle, drafting
+    drafting_since = Column(DateTime)  # When the current drafting claim was taken
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -66,6 +85,33 @@ class WebhookLog(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+class LindyOutboxEvent(Base):
+    """Lindy events waiting for delivery by the outbox dispatcher"""
+    __tablename__ = 'lindy_outbox'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    call_id = Column(String(100), index=True)
+    event = Column(String(100))
+    payload = Column(JSON)
+    status = Column(String(50), default='pending', index=True)  # pending, sent, failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime)
+    locked_until = Column(DateTime)  # Set while a dispatcher is sending the event
+    last_error = Column(Text)
+    sent_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Blob(Base):
+    """Content-addressed blobs (transcripts and SOP bodies) referenced by calls"""
+    __tablename__ = 'blobs'
+
+    sha256 = Column(String(64), primary_key=True)
+    data = Column(LargeBinary)
+    size = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
 class Database:
     """Database manager"""
 
@@ -75,10 +121,66 @@ class Database:
         logger.info('Database initialized')
 
     def create_tables(self):
-        """Create all tables"""
-        Base.metadata.create_all(bind=self.engine)
+        """
+        Create all tables and add columns missing from existing ones
+
+        Run once per deploy (see migrate.py) rather than from every web or
+        worker process. It is still safe if two processes race: a table or
+        column the other one created first is skipped.
+        """
+        try:
+            Base.metadata.create_all(bind=self.engine)
+        except (OperationalError, ProgrammingError, IntegrityError):
+            # Another process created a table between the check and CREATE;
+            # a second pass only creates what is still missing
+            Base.metadata.create_all(bind=self.engine)
+        self.add_missing_columns()
         logger.info('Database tables created')
 
+    def add_missing_columns(self):
+        """
+        Add model columns that tables created by an older version lack
+
+        create_all() only creates missing tables, so columns added to a model
+        later (e.g. conversations.job_id, result, checkpoints) are added here
+        with ALTER TABLE. Added columns are nullable and have no server
+        default; existing rows read them as NULL.
+
+        Returns:
+            list: 'table.column' names that were added
+        """
+        inspector = inspect(self.engine)
+        existing_tables = set(inspector.get_table_names())
+        added = []
+
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+
+                column_type = column.type.compile(dialect=self.engine.dialect)
+                try:
+                    # One transaction per column, so a failure only affects its own
+                    with self.engine.begin() as connection:
+                        connection.execute(text(
+                            f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                        ))
+                except (OperationalError, ProgrammingError):
+                    # A concurrent migration may have added it ("duplicate column")
+                    current = {c['name'] for c in inspect(self.engine).get_columns(table.name)}
+                    if column.name not in current:
+                        raise
+                    continue
+                added.append(f'{table.name}.{column.name}')
+
+        for name in added:
+            logger.warning(f'Added missing database column {name}')
+        return added
+
     def get_session(self):
         """Get database session"""
         return self.SessionLocal()
@@ -91,13 +193,15 @@ class Database:
 
 # Utility functions for common database operations
 
-def save_conversation(session, call_id, transcript, customer_info, assistant_id=None):
-    """Save conversation to database"""
+def save_conversation(session, call_id, transcript, customer_info, assistant_id=None,
+                      transcript_ref=None):
+    """Save conversation to database (pass transcript_ref for a stored transcript)"""
     try:
         conversation = Conversation(
             id=call_id,
             call_id=call_id,
             transcript=transcript,
+            transcript_ref=transcript_ref,
             customer_info=customer_info,
             assistant_id=assistant_id,
             status='processing'
@@ -113,6 +217,338 @@ def save_conversation(session, call_id, transcript, customer_info, assistant_id=
         raise
 
 
+def get_conversation(session, call_id):
+    """Get conversation by call ID"""
+    return session.query(Conversation).filter(Conversation.call_id == call_id).first()
+
+
+def get_conversation_transcript(conversation, blob_store):
+    """
+    Get a conversation's transcript
+
+    Transcripts are kept once in the blob store by hash; rows saved before
+    that hold the transcript themselves.
+    """
+    if not conversation.transcript_ref:
+        return conversation.transcript
+
+    data = blob_store.get(conversation.transcript_ref)
+    if data is None:
+        raise LookupError(f'Transcript {conversation.transcript_ref} not found')
+    return data.decode('utf-8')
+
+
+def update_conversation_status(session, call_id, status):
+    """Update the processing status of a conversation"""
+    try:
+        conversation = get_conversation(session, call_id)
+        if conversation:
+            conversation.status = status
+            session.commit()
+        return conversation
+
+    except Exception as e:
+        session.rollback()
+        logger.error(f'Failed to update conversation status: {str(e)}')
+        raise
+
+
+def claim_conversation(session, call_id, transcript, customer_info, stale_after=300,
+                       transcript_ref=None):
+    """
+    Claim a call for processing, using the unique call_id as the lock
+
+    The first delivery of a call inserts the conversation and owns it. Later
+    deliveries only take over if the previous run failed or its lock is older
+    than stale_after seconds (e.g. the worker was killed mid-run).
+
+    Pass transcript_ref (and no transcript) when the transcript was put in
+    the blob store, so the row only references it.
+
+    Returns:
+        tuple: (conversation, claimed) - claimed is False for duplicates
+    """
+    try:
+        conversation = Conversation(
+            id=call_id,
+            call_id=call_id,
+            transcript=transcript,
+            transcript_ref=transcript_ref,
+            customer_info=customer_info,
+            status='processing'
+        )
+        session.add(conversation)
+        session.commit()
+        logger.info(f'Conversation claimed: {call_id}')
+        return conversation, True
+
+    except IntegrityError:
+        session.rollback()
+
+    conversation = get_conversation(session, call_id)
+    if conversation is None:
+        return None, False
+
+    stale_before = datetime.utcnow() - timedelta(seconds=stale_after)
+    is_stale = conversation.status == 'processing' and conversation.updated_at < stale_before
+
+    if conversation.status != 'failed' and not is_stale:
+        logger.info(f'Duplicate delivery for call {call_id} ({conversation.status})')
+        return conversation, False
+
+    # Compare-and-set so only one worker takes over a failed or stale call
+    claimed = session.query(Conversation).filter(
+        Conversation.call_id == call_id,
+        Conversation.status == conversation.status,
+        Conversation.updated_at == conversation.updated_at
+    ).update({
+        'status': 'processing',
+        'job_id': None,
+        'result': None,
+        'updated_at': datetime.utcnow()
+    }, synchronize_session=False)
+    session.commit()
+    session.refresh(conversation)
+
+    if claimed:
+        logger.info(f'Conversation reclaimed: {call_id}')
+    return conversation, bool(claimed)
+
+
+def release_conversation(session, call_id, claimed_at, status, updated_at):
+    """
+    Hand a claimed call back in the state it was claimed from
+
+    Only releases the claim made at claimed_at, so a call reclaimed or
+    finished by someone else since is left alone. Restoring updated_at
+    keeps a stale call reclaimable straight away.
+
+    Returns:
+        bool: Whether the claim was released
+    """
+    released = session.query(Conversation).filter(
+        Conversation.call_id == call_id,
+        Conversation.status == 'processing',
+        Conversation.updated_at == claimed_at
+    ).update({
+        'status': status,
+        'updated_at': updated_at
+    }, synchronize_session=False)
+    session.commit()
+
+    if released:
+        logger.info(f'Conversation released: {call_id} ({status})')
+    return bool(released)
+
+
+def spill_conversation(session, call_id):
+    """Park a claimed conversation until the queues have room for it"""
+    return update_conversation_status(session, call_id, 'queued')
+
+
+def claim_spilled_conversations(session, limit):
+    """
+    Claim up to limit parked conversations, oldest first
+
+    Each is moved from queued to processing with a compare-and-set, so
+    concurrent drainers never start the same call twice.
+
+    Returns:
+        list: Claimed conversations
+    """
+    candidates = session.query(Conversation).filter(
+        Conversation.status == 'queued'
+    ).order_by(Conversation.created_at).limit(limit).all()
+
+    claimed = []
+    for conversation in candidates:
+        updated = session.query(Conversation).filter(
+            Conversation.call_id == conversation.call_id,
+            Conversation.status == 'queued'
+        ).update({
+            'status': 'processing',
+            'updated_at': datetime.utcnow()
+        }, synchronize_session=False)
+        session.commit()
+
+        if updated:
+            session.refresh(conversation)
+            claimed.append(conversation)
+
+    return claimed
+
+
+def count_conversations(session, status):
+    """Count conversations with a status"""
+    return session.query(Conversation).filter(Conversation.status == status).count()
+
+
+def complete_conversation(session, call_id, result):
+    """Mark a conversation completed and store its result for duplicates"""
+    try:
+        conversation = get_conversation(session, call_id)
+        if conversation:
+            conversation.status = 'completed'
+            conversation.result = result
+            # The rolling transcript and draft were only needed until now
+            session.query(CallDraft).filter(
+                CallDraft.call_id == call_id
+            ).delete(synchronize_session=False)
+            session.commit()
+        return conversation
+
+    except Exception as e:
+        session.rollback()
+        logger.error(f'Failed to complete conversation: {str(e)}')
+        raise
+
+
+def get_checkpoint(session, call_id, stage):
+    """Get the stored output of a finished pipeline stage, or None"""
+    conversation = get_conversation(session, call_id)
+    if conversation is None or not conversation.checkpoints:
+        return None
+    return conversation.checkpoints.get(stage)
+
+
+def save_checkpoint(session, call_id, stage, output):
+    """Record a finished pipeline stage so retries resume after it"""
+    try:
+        conversation = get_conversation(session, call_id)
+        if conversation:
+            # Assign a new dict so SQLAlchemy sees the JSON change
+            conversation.checkpoints = dict(conversation.checkpoints or {}, **{stage: output})
+            session.commit()
+        return conversation
+
+    except Exception as e:
+        session.rollback()
+        logger.error(f'Failed to save checkpoint {stage} for {call_id}: {str(e)}')
+        raise
+
+
+def update_call_draft_transcript(session, call_id, text, append=False):
+    """
+    Update the rolling transcript of an in-progress call
+
+    Args:
+        text (str): Full transcript, or a single line when append is True
+        append (bool): Append text as a new line instead of replacing
+
+    Returns:
+        CallDraft: The updated draft
+    """
+    try:
+        draft = session.get(CallDraft, call_id)
+        if draft is None:
+            draft = CallDraft(call_id=call_id, transcript='', drafted_length=0, status='idle')
+            session.add(draft)
+
+        if append:
+            draft.transcript = f'{draft.transcript}\n{text}' if draft.transcript else text
+        else:
+            draft.transcript = text
+
+        session.commit()
+        return draft
+
+    except IntegrityError:
+        # Another worker created the draft first - retry against its row
+        session.rollback()
+        return update_call_draft_transcript(session, call_id, text, append)
+
+    except Exception as e:
+        session.rollback()
+        logger.error(f'Failed to update call draft: {str(e)}')
+        raise
+
+
+def claim_call_draft(session, call_id, min_new_chars, stale_after=300):
+    """
+    Claim a call for speculative drafting if enough new transcript arrived
+
+    A call being drafted is only taken over once its claim is older than
+    stale_after seconds (e.g. the worker was killed mid-draft). The claim
+    is timed by drafting_since rather than updated_at, which every
+    transcript event moves on.
+
+    Returns:
+        tuple: (transcript, claimed_at) - transcript is None if not claimed;
+            pass claimed_at to save_call_draft
+    """
+    draft = session.get(CallDraft, call_id)
+    if draft is None:
+        return None, None
+
+    stale_before = datetime.utcnow() - timedelta(seconds=stale_after)
+    if draft.status == 'drafting' and draft.drafting_since and draft.drafting_since >= stale_before:
+        return None, None
+
+    transcript = draft.transcript or ''
+    if len(transcript) - (draft.drafted_length or 0) < min_new_chars:
+        return None, None
+
+    # Compare-and-set so only one worker drafts a call at a time
+    status, drafting_since = draft.status, draft.drafting_since
+    claimed_at = datetime.utcnow()
+    query = session.query(CallDraft).filter(
+        CallDraft.call_id == call_id,
+        CallDraft.status == status
+    )
+    if drafting_since is None:
+        query = query.filter(CallDraft.drafting_since.is_(None))
+    else:
+        query = query.filter(CallDraft.drafting_since == drafting_since)
+    claimed = query.update(
+        {'status': 'drafting', 'drafting_since': claimed_at},
+        synchronize_session=False
+    )
+    session.commit()
+
+    if not claimed:
+        return None, None
+    if status == 'drafting':
+        logger.warning(f'Took over stale draft claim for call {call_id}')
+    return transcript, claimed_at
+
+
+def save_call_draft(session, call_id, draft_content, drafted_length, claimed_at=None):
+    """
+    Store pre-generated SOP sections and release the drafting claim
+
+    With claimed_at, nothing is written if the claim was taken over since,
+    so a late stale drafter can't replace a newer draft.
+
+    Returns:
+        bool: Whether the draft was stored
+    """
+    try:
+        values = {'status': 'idle', 'drafting_since': None}
+        if draft_content is not None:
+            values.update(draft=draft_content, drafted_length=drafted_length)
+
+        query = session.query(CallDraft).filter(CallDraft.call_id == call_id)
+        if claimed_at is not None:
+            query = query.filter(CallDraft.drafting_since == claimed_at)
+        saved = query.update(values, synchronize_session=False)
+        session.commit()
+
+        if not saved:
+            logger.warning(f'Draft claim for call {call_id} was taken over, dropping this draft')
+        return bool(saved)
+
+    except Exception as e:
+        session.rollback()
+        logger.error(f'Failed to save call draft: {str(e)}')
+        raise
+
+
+def get_call_draft_content(session, call_id):
+    """Get pre-generated SOP sections for a call, if any"""
+    draft = session.get(CallDraft, call_id)
+    return draft.draft if draft else None
+
+
 def save_sop_document(session, doc_id, doc_url, title, content, conversation_id=None, contact_id=None):
     """Save SOP document to database"""
     try:
@@ -137,6 +573,58 @@ def save_sop_document(session, doc_id, doc_url, title, content, conversation_id=
         raise
 
 
+def enqueue_lindy_event(session, call_id, event, payload):
+    """Add a Lindy event to the outbox"""
+    try:
+        outbox_event = LindyOutboxEvent(
+            call_id=call_id,
+            event=event,
+            payload=payload,
+            status='pending',
+            attempts=0
+        )
+        session.add(outbox_event)
+        session.commit()
+        return outbox_event
+
+    except Exception as e:
+        session.rollback()
+        logger.error(f'Failed to enqueue Lindy event: {str(e)}')
+        raise
+
+
+def claim_lindy_event(session, outbox_event, locked_until):
+    """
+    Claim a pending outbox event for sending
+
+    Compare-and-set on locked_until so two dispatchers never send the same
+    event; a claim from a crashed dispatcher lapses once locked_until passes.
+
+    Returns:
+        bool: True if this dispatcher owns the event
+    """
+    now = datetime.utcnow()
+    previous = outbox_event.locked_until
+    if previous is not None and previous > now:
+        return False
+
+    query = session.query(LindyOutboxEvent).filter(
+        LindyOutboxEvent.id == outbox_event.id,
+        LindyOutboxEvent.status == 'pending'
+    )
+    if previous is None:
+        query = query.filter(LindyOutboxEvent.locked_until.is_(None))
+    else:
+        query = query.filter(LindyOutboxEvent.locked_until == previous)
+
+    claimed = query.update({'locked_until': locked_until}, synchronize_session=False)
+    session.commit()
+
+    if claimed:
+        session.refresh(outbox_event)
+    return bool(claimed)
+
+
 def log_webhook(session, source, endpoint, payload, status, error=None):
     """Log webhook call"""
     try:
@@ -0,0 +1,180 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import logging
+import time
+
+from utils import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class StageTimeout(Exception):
+    """Raised when a pipeline stage runs past its timeout"""
+
+
+class Stage:
+    """A named unit of work in a pipeline"""
+
+    def __init__(self, name, func, depends_on=(), timeout=None, required=True):
+        """
+        Args:
+            name (str): Stage name, used as its key in the results
+            func (callable): Called with a dict of dependency results
+            depends_on (iterable): Names of stages that must finish first
+            timeout (float): Seconds the stage may run, measured from its start
+            required (bool): If True, a failure aborts the pipeline; otherwise
+                the failure is recorded and only dependent stages are skipped
+        """
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.timeout = timeout
+        self.required = required
+
+
+class Pipeline:
+    """
+    Run a graph of stages, starting each as soon as its dependencies finish
+
+    Independent stages run concurrently, so wall-clock time is bounded by
+    the slowest path through the graph rather than the sum of all stages.
+    A stage that times out is abandoned (its thread can't be killed) and
+    treated as failed.
+    """
+
+    def __init__(self, name, max_workers=4):
+        self.name = name
+        self.max_workers = max_workers
+        self.stages = {}
+
+    def add_stage(self, name, func, depends_on=(), timeout=None, required=True):
+        """Add a stage (see Stage for arguments)"""
+        for dependency in depends_on:
+            if dependency not in self.stages:
+                raise ValueError(f'Stage {name} depends on unknown stage {dependency}')
+
+        self.stages[name] = Stage(name, func, depends_on, timeout, required)
+        return self
+
+    def run(self, deadline=None):
+        """
+        Run all stages
+
+        Args:
+            deadline (Deadline): Optional overall budget - no stage starts or
+                keeps running once it is used up
+
+        Returns:
+            dict: {'results': {...}, 'errors': {...}, 'skipped': [...],
+                   'timings': {stage: milliseconds}}
+
+        Raises:
+            Exception: The error of the first required stage that failed
+        """
+        results = {}
+        errors = {}
+        skipped = []
+        timings = {}
+        pending = dict(self.stages)
+        running = {}  # future -> (stage, submitted_at)
+        stage_starts = {}  # stage name -> when its thread picked it up
+        started = time.monotonic()
+
+        def run_stage(stage, inputs):
+            stage_starts[stage.name] = time.monotonic()
+            return stage.func(inputs)
+
+        def stage_limit(stage):
+            # Queued stages only wait on the deadline; their own timeout runs
+            # from when a worker starts them
+            limits = []
+            start = stage_starts.get(stage.name)
+            if stage.timeout is not None and start is not None:
+                limits.append(start + stage.timeout)
+            if deadline is not None:
+                limits.append(deadline.expires_at)
+            return min(limits) if limits else None
+
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix=f'pipeline-{self.name}'
+        )
+
+        try:
+            while pending or running:
+                # Skip stages whose dependencies failed or were skipped
+                for name, stage in list(pending.items()):
+                    if any(d in errors or d in skipped for d in stage.depends_on):
+                        logger.warning(f'Pipeline {self.name}: skipping {name}, a dependency failed')
+                        skipped.append(name)
+                        del pending[name]
+
+                # Start stages whose dependencies have all finished
+                for name, stage in list(pending.items()):
+                    if not all(d in results for d in stage.depends_on):
+                        continue
+                    del pending[name]
+
+                    if deadline is not None and deadline.expired():
+                        error = DeadlineExceeded(f'Deadline exceeded before stage {name}')
+                        errors[name] = error
+                        logger.warning(f'Pipeline {self.name}: {str(error)}')
+                        if stage.required:
+                            raise error
+                        continue
+
+                    inputs = {d: results[d] for d in stage.depends_on}
+                    future = executor.submit(run_stage, stage, inputs)
+                    running[future] = (stage, time.monotonic())
+
+                if not running:
+                    # Anything left is waiting on a stage that failed to start
+                    skipped.extend(pending)
+                    break
+
+                limits = [
+                    limit for limit in (stage_limit(stage) for stage, _ in running.values())
+                    if limit is not None
+                ]
+                done, _ = wait(
+                    list(running),
+                    timeout=max(min(limits) - time.monotonic(), 0) if limits else None,
+                    return_when=FIRST_COMPLETED
+                )
+
+                now = time.monotonic()
+                for future, (stage, submitted) in list(running.items()):
+                    start = stage_starts.get(stage.name, submitted)
+                    limit = stage_limit(stage)
+                    if future in done:
+                        error = future.exception()
+                    elif limit is not None and now >= limit:
+                        error = StageTimeout(f'Stage {stage.name} timed out after {now - start:.1f}s')
+                        future.cancel()
+                    else:
+                        continue
+
+                    del running[future]
+                    timings[stage.name] = round((now - start) * 1000)
+
+                    if error is None:
+                        results[stage.name] = future.result()
+                        continue
+
+                    errors[stage.name] = error
+                    logger.warning(f'Pipeline {self.name}: stage {stage.name} failed: {str(error)}')
+
+                    if stage.required:
+                        raise error
+
+        finally:
+            # Don't wait on abandoned stages
+            executor.shutdown(wait=False, cancel_futures=True)
+            timings['total'] = round((time.monotonic() - started) * 1000)
+            logger.info(f'Pipeline {self.name} timings (ms): {timings}')
+
+        return {
+            'results': results,
+            'errors': {name: str(error) for name, error in errors.items()},
+            'skipped': skipped,
+            'timings': timings
+        }
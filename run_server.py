@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Startup script for Railway deployment
-Handles PORT environment variable and starts gunicorn
+Handles PORT environment variable, migrates the database and starts gunicorn
 """
 import os
 import sys
@@ -20,6 +20,10 @@ except ValueError:
     print(f"Error: PORT '{port}' is not a valid port number", file=sys.stderr)
     sys.exit(1)
 
+# Migrate the database once, before gunicorn forks its workers
+if subprocess.call([sys.executable, 'migrate.py']) != 0:
+    sys.exit(1)
+
 # Build gunicorn command
 cmd = [
     'gunicorn',
@@ -0,0 +1,210 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Hash where Celery's Redis transport keeps delivered but unacknowledged tasks
+UNACKED_KEY = 'unacked'
+
+
+class AdmissionController:
+    """
+    Queue-depth-aware admission control for webhook endpoints
+
+    Requests are admitted while the Celery queues in Redis are below
+    max_queue_depth and this process is handling fewer than max_in_flight
+    webhooks. Queue depths are sampled at most once per sample_interval, so
+    a burst of webhooks costs one Redis round trip rather than one each.
+    If Redis can't be read the controller fails open and only the in-flight
+    limit applies. What to do with a request that isn't admitted (spill it
+    or answer 429) is up to the caller.
+    """
+
+    def __init__(self, redis_url=None, queues=('celery',), max_queue_depth=0, max_in_flight=0,
+                 retry_after=30, sample_interval=1.0):
+        """
+        Initialize admission controller
+
+        Args:
+            redis_url (str): Celery broker URL (None disables queue checks)
+            queues (iterable): Celery queues whose depth is watched
+            max_queue_depth (int): Queued tasks, summed over queues, above
+                which requests are shed (0 disables)
+            max_in_flight (int): Concurrent admitted requests per process
+                above which requests are shed (0 disables)
+            retry_after (int): Seconds clients are told to wait when shed
+            sample_interval (float): Seconds a queue depth sample is reused
+        """
+        self.queues = tuple(queues)
+        self.max_queue_depth = max_queue_depth
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.sample_interval = sample_interval
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._depths = None  # None while Redis can't be read
+        self._reserved = None
+        self._sampled_at = None
+        self._stats = {
+            'admitted': 0,
+            'shed': {},
+            'spilled': 0,
+            'redis_errors': 0
+        }
+
+        self.redis = None
+        if redis_url and max_queue_depth:
+            try:
+                import redis
+                self.redis = redis.Redis.from_url(
+                    redis_url,
+                    socket_connect_timeout=1,
+                    socket_timeout=1
+                )
+            except Exception as e:
+                logger.warning(f'Admission queue depth checks disabled: {str(e)}')
+
+    @classmethod
+    def from_config(cls, config):
+        """Build controller from application config (limits off unless enabled)"""
+        if not config.ADMISSION_CONTROL:
+            return cls()
+
+        return cls(
+            redis_url=config.REDIS_URL,
+            queues=[q.strip() for q in config.ADMISSION_QUEUES.split(',') if q.strip()],
+            max_queue_depth=config.ADMISSION_MAX_QUEUE_DEPTH,
+            max_in_flight=config.ADMISSION_MAX_IN_FLIGHT,
+            retry_after=config.ADMISSION_RETRY_AFTER
+        )
+
+    def acquire(self, endpoint):
+        """
+        Decide whether to admit a request, taking an in-flight slot if so
+
+        Args:
+            endpoint (str): Name the decision is counted under
+
+        Returns:
+            dict: {'admitted': bool, 'reason': str or None, 'retry_after': int}
+        """
+        depth = self.queue_depth()
+
+        with self._lock:
+            reason = None
+            if self.max_in_flight and self._in_flight >= self.max_in_flight:
+                reason = 'in_flight'
+            elif self.max_queue_depth and depth is not None and depth >= self.max_queue_depth:
+                reason = 'queue_depth'
+
+            if reason is None:
+                self._in_flight += 1
+                self._stats['admitted'] += 1
+            else:
+                shed = self._stats['shed']
+                shed[endpoint] = shed.get(endpoint, 0) + 1
+
+        if reason is not None:
+            logger.warning(f'Shedding {endpoint} request: {reason} over limit '
+                           f'(queue depth {depth}, in flight {self._in_flight})')
+
+        return {'admitted': reason is None, 'reason': reason, 'retry_after': self.retry_after}
+
+    def release(self):
+        """Return an in-flight slot taken by acquire()"""
+        with self._lock:
+            self._in_flight -= 1
+
+    @contextmanager
+    def slot(self, endpoint):
+        """Context manager around acquire()/release() yielding the decision"""
+        decision = self.acquire(endpoint)
+        try:
+            yield decision
+        finally:
+            if decision['admitted']:
+                self.release()
+
+    def record_spill(self):
+        """Count a shed request that was stored for later processing"""
+        with self._lock:
+            self._stats['spilled'] += 1
+
+    def queue_depth(self):
+        """
+        Total tasks waiting in the watched queues
+
+        Returns:
+            int: Queued tasks, or None if depths can't be read
+        """
+        depths = self.queue_depths()
+        if depths is None:
+            return None
+        return sum(depths.values())
+
+    def queue_depths(self):
+        """Tasks waiting per watched queue (sampled), or None without Redis"""
+        if self.redis is None:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            if self._sampled_at is not None and now - self._sampled_at < self.sample_interval:
+                return dict(self._depths) if self._depths is not None else None
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for queue in self.queues:
+                pipe.llen(queue)
+            pipe.hlen(UNACKED_KEY)
+            *lengths, reserved = pipe.execute()
+        except Exception as e:
+            logger.warning(f'Failed to read Celery queue depths: {str(e)}')
+            with self._lock:
+                self._stats['redis_errors'] += 1
+                # Don't retry a down Redis on every request
+                self._sampled_at = now
+                self._depths = None
+                self._reserved = None
+            return None
+
+        with self._lock:
+            self._depths = dict(zip(self.queues, lengths))
+            self._reserved = reserved
+            self._sampled_at = now
+            return dict(self._depths)
+
+    def capacity(self):
+        """
+        Tasks that can be queued before max_queue_depth is reached
+
+        Returns:
+            int: Remaining capacity, or None if there is no queue limit or
+                depths can't be read
+        """
+        if not self.max_queue_depth:
+            return None
+        depth = self.queue_depth()
+        if depth is None:
+            return None
+        return max(self.max_queue_depth - depth, 0)
+
+    def stats(self):
+        """Get queue depth, in-flight and shed counters for this process"""
+        depths = self.queue_depths()
+
+        with self._lock:
+            stats = dict(self._stats)
+            stats['shed'] = dict(self._stats['shed'])
+            stats['shed_total'] = sum(stats['shed'].values())
+            stats['in_flight'] = self._in_flight
+            stats['reserved'] = self._reserved if depths is not None else None
+
+        stats['queue_depths'] = depths
+        stats['queue_depth'] = sum(depths.values()) if depths is not None else None
+        stats['max_queue_depth'] = self.max_queue_depth
+        stats['max_in_flight'] = self.max_in_flight
+        return stats
@@ -0,0 +1,338 @@
+import abc
+import hashlib
+import hmac
+import logging
+import os
+import re
+import tempfile
+import time
+from urllib.parse import urlencode
+
+logger = logging.getLogger(__name__)
+
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+# SECRET_KEY's default and .env.example placeholder - public, so anyone
+# could sign artifact URLs with them
+INSECURE_SIGNING_KEYS = {'', 'dev-secret-key', 'your_secret_key_here'}
+
+
+class ArtifactStore(abc.ABC):
+    """
+    Content-addressed store for generated artifacts
+
+    Artifacts are saved under the SHA-256 of their bytes, so storing the same
+    SOP twice is a no-op. signed_url() returns an expiring link to the Flask
+    /artifacts route, signed with HMAC so links can't be forged or extended.
+    Subclasses provide the storage backend.
+    """
+
+    def __init__(self, signing_key, base_url=None, url_ttl=604800):
+        """
+        Initialize artifact store
+
+        Args:
+            signing_key (str): Secret used to sign artifact URLs
+            base_url (str): Public base URL of this app, used in signed URLs
+            url_ttl (int): Seconds before a signed URL expires
+        """
+        self.signing_key = signing_key.encode('utf-8')
+        self.base_url = base_url.rstrip('/') if base_url else None
+        self.url_ttl = url_ttl
+
+    def put(self, data):
+        """
+        Store an artifact
+
+        Args:
+            data (bytes|str): Artifact content (str is stored as UTF-8)
+
+        Returns:
+            str: SHA-256 hex digest identifying the artifact
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        digest = hashlib.sha256(data).hexdigest()
+        if not self.exists(digest):
+            self._write(digest, data)
+            logger.info(f'Stored artifact {digest} ({len(data)} bytes)')
+        else:
+            # Stored again, e.g. for a new call - restart its retention period
+            self._touch(digest)
+        return digest
+
+    def get(self, digest):
+        """Get an artifact's bytes, or None if it doesn't exist"""
+        if not DIGEST_PATTERN.match(digest or ''):
+            return None
+        return self._read(digest)
+
+    def exists(self, digest):
+        """Check whether an artifact exists"""
+        if not DIGEST_PATTERN.match(digest or ''):
+            return False
+        return self._exists(digest)
+
+    def signed_url(self, digest, expires_in=None):
+        """
+        Build a signed, expiring URL for an artifact
+
+        Returns:
+            tuple: (url, expires) where expires is a Unix timestamp
+        """
+        if not self.base_url:
+            raise ValueError('A base URL is required to sign artifact URLs')
+
+        expires = int(time.time()) + (expires_in or self.url_ttl)
+        query = urlencode({'expires': expires, 'signature': self._sign(digest, expires)})
+        return f'{self.base_url}/artifacts/{digest}?{query}', expires
+
+    def verify(self, digest, expires, signature):
+        """Check a signed URL's signature and expiry"""
+        try:
+            expires = int(expires)
+        except (TypeError, ValueError):
+            return False
+
+        if expires < time.time() or not signature:
+            return False
+        return hmac.compare_digest(self._sign(digest, expires), signature)
+
+    def _sign(self, digest, expires):
+        message = f'{digest}:{expires}'.encode('utf-8')
+        return hmac.new(self.signing_key, message, hashlib.sha256).hexdigest()
+
+    @abc.abstractmethod
+    def _write(self, digest, data):
+        """Save an artifact's bytes under its digest"""
+
+    @abc.abstractmethod
+    def _read(self, digest):
+        """Get an artifact's bytes, or None if it doesn't exist"""
+
+    @abc.abstractmethod
+    def _exists(self, digest):
+        """Check whether an artifact exists in the backend"""
+
+    def _touch(self, digest):
+        """Mark an existing artifact as stored now (backends that expire artifacts)"""
+
+
+class LocalArtifactStore(ArtifactStore):
+    """Artifact store on the local filesystem (or a shared volume)"""
+
+    def __init__(self, root, **kwargs):
+        """
+        Args:
+            root (str): Directory artifacts are stored under
+        """
+        super().__init__(**kwargs)
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest):
+        # Fan out on the first two characters to keep directories small
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _write(self, digest, data):
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file and rename so readers never see partial data
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _read(self, digest):
+        try:
+            with open(self._path(digest), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _exists(self, digest):
+        return os.path.exists(self._path(digest))
+
+
+class S3ArtifactStore(ArtifactStore):
+    """Artifact store in an S3-compatible bucket (requires boto3)"""
+
+    def __init__(self, bucket, prefix='artifacts/', endpoint_url=None, region=None, **kwargs):
+        """
+        Args:
+            bucket (str): Bucket name
+            prefix (str): Key prefix for artifacts
+            endpoint_url (str): Optional endpoint for S3-compatible services
+            region (str): Optional region name
+        """
+        super().__init__(**kwargs)
+
+        try:
+            import boto3
+        except ImportError:
+            raise ImportError('boto3 is required for ARTIFACT_STORE=s3 (pip install boto3)')
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+
+    def _write(self, digest, data):
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + digest, Body=data)
+
+    def _read(self, digest):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.prefix + digest)
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return response['Body'].read()
+
+    def _exists(self, digest):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + digest)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+
+class DatabaseArtifactStore(ArtifactStore):
+    """Artifact store in the application database (blobs table)"""
+
+    def __init__(self, database, **kwargs):
+        """
+        Args:
+            database (Database): Database holding the blobs table
+        """
+        super().__init__(**kwargs)
+        self.database = database
+
+    def _write(self, digest, data):
+        from sqlalchemy.exc import IntegrityError
+        from models import Blob
+
+        session = self.database.get_session()
+        try:
+            session.add(Blob(sha256=digest, data=data, size=len(data)))
+            session.commit()
+        except IntegrityError:
+            # Stored concurrently by someone else - same content, same key
+            session.rollback()
+        finally:
+            session.close()
+
+    def _read(self, digest):
+        from models import Blob
+
+        session = self.database.get_session()
+        try:
+            blob = session.get(Blob, digest)
+            return blob.data if blob else None
+        finally:
+            session.close()
+
+    def _exists(self, digest):
+        from models import Blob
+
+        session = self.database.get_session()
+        try:
+            return session.query(Blob.sha256).filter(Blob.sha256 == digest).first() is not None
+        finally:
+            session.close()
+
+    def _touch(self, digest):
+        from datetime import datetime
+        from models import Blob
+
+        # The cleanup task removes blobs by created_at
+        session = self.database.get_session()
+        try:
+            session.query(Blob).filter(Blob.sha256 == digest).update(
+                {'created_at': datetime.utcnow()}, synchronize_session=False
+            )
+            session.commit()
+        finally:
+            session.close()
+
+
+def create_blob_store(config, database):
+    """
+    Build the store for call transcripts and generated SOPs
+
+    TASK_BLOB_STORE=database (default) keeps blobs in the application
+    database, which the web app and every worker already share;
+    TASK_BLOB_STORE=artifacts uses the ARTIFACT_STORE backend instead.
+    """
+    if config.TASK_BLOB_STORE == 'artifacts':
+        store = create_artifact_store(config, database)
+        if store is None:
+            raise ValueError('TASK_BLOB_STORE=artifacts requires ARTIFACT_STORE')
+        return store
+
+    return DatabaseArtifactStore(
+        database,
+        signing_key=config.ARTIFACT_SIGNING_KEY or config.SECRET_KEY,
+        base_url=config.PUBLIC_BASE_URL,
+        url_ttl=config.ARTIFACT_URL_TTL
+    )
+
+
+def create_artifact_store(config, database=None):
+    """
+    Build the artifact store selected by ARTIFACT_STORE
+
+    Artifacts are written by whichever process sends the SOP to Lindy (the
+    web app or a Celery worker) and served by the web app, so the backend
+    must be shared: 'database' or 's3', or 'local' on a volume mounted in
+    every container.
+
+    Signed URLs expose artifacts publicly, so the signing key (ARTIFACT_SIGNING_KEY
+    or SECRET_KEY) must be set to a real secret.
+
+    Args:
+        database (Database): Application database, for ARTIFACT_STORE=database
+
+    Returns:
+        ArtifactStore: The configured store, or None if disabled
+    """
+    backend = (config.ARTIFACT_STORE or '').lower()
+    if not backend:
+        return None
+
+    signing_key = config.ARTIFACT_SIGNING_KEY or config.SECRET_KEY
+    if (signing_key or '') in INSECURE_SIGNING_KEYS:
+        raise ValueError(
+            f'ARTIFACT_STORE={config.ARTIFACT_STORE} requires ARTIFACT_SIGNING_KEY or SECRET_KEY '
+            'to be set to a secret (not the default)'
+        )
+
+    options = {
+        'signing_key': signing_key,
+        'base_url': config.PUBLIC_BASE_URL,
+        'url_ttl': config.ARTIFACT_URL_TTL
+    }
+
+    if backend == 'database':
+        if database is None:
+            raise ValueError('ARTIFACT_STORE=database requires the application database')
+        return DatabaseArtifactStore(database, **options)
+    if backend == 'local':
+        return LocalArtifactStore(config.ARTIFACT_DIR, **options)
+    if backend == 's3':
+        return S3ArtifactStore(
+            config.ARTIFACT_S3_BUCKET,
+            prefix=config.ARTIFACT_S3_PREFIX,
+            endpoint_url=config.ARTIFACT_S3_ENDPOINT_URL,
+            region=config.ARTIFACT_S3_REGION,
+            **options
+        )
+
+    raise ValueError(f'Unknown ARTIFACT_STORE: {config.ARTIFACT_STORE}')
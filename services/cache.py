@@ -0,0 +1,142 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    Two-tier LRU cache with expiry
+
+    Tiers: a bounded in-process LRU and an optional Redis tier shared by all
+    gunicorn and Celery workers. Both tiers expire entries after the TTL,
+    or the in-process tier after local_ttl if that is shorter; Redis
+    eviction beyond that is left to the server's maxmemory policy.
+    delete() only reaches this process's in-process tier, so local_ttl bounds
+    how long other processes can keep serving a deleted value.
+    Values are stored in Redis as text, or as JSON when json_values is set.
+    """
+
+    def __init__(self, max_size=128, ttl=86400, redis_url=None, key_prefix='voice_sop:cache:',
+                 json_values=False, local_ttl=None):
+        """
+        Initialize cache
+
+        Args:
+            max_size (int): Maximum number of entries in the in-process tier
+            ttl (int): Seconds before an entry expires
+            redis_url (str): Optional Redis URL for the shared tier
+            key_prefix (str): Prefix for Redis keys
+            json_values (bool): Serialize values as JSON in Redis
+            local_ttl (int): Seconds before an in-process entry expires
+                (defaults to ttl)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.local_ttl = ttl if local_ttl is None else min(local_ttl, ttl)
+        self.key_prefix = key_prefix
+        self.json_values = json_values
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'redis_hits': 0,
+            'misses': 0,
+            'evictions': 0
+        }
+
+        self.redis = None
+        if redis_url:
+            try:
+                import redis
+                self.redis = redis.Redis.from_url(
+                    redis_url,
+                    socket_connect_timeout=1,
+                    socket_timeout=1
+                )
+            except Exception as e:
+                logger.warning(f'Cache Redis tier disabled for {key_prefix}: {str(e)}')
+
+    def get(self, key):
+        """Get a cached value, or None on a miss"""
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return value
+                del self._entries[key]
+
+        if self.redis is not None:
+            try:
+                value = self.redis.get(self.key_prefix + key)
+            except Exception as e:
+                logger.warning(f'Cache Redis get failed: {str(e)}')
+                value = None
+
+            if value is not None:
+                value = value.decode('utf-8')
+                if self.json_values:
+                    value = json.loads(value)
+                with self._lock:
+                    self._stats['redis_hits'] += 1
+                self._set_local(key, value)
+                return value
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def set(self, key, value):
+        """Store a value in both tiers"""
+        self._set_local(key, value)
+
+        if self.redis is not None:
+            try:
+                stored = json.dumps(value) if self.json_values else value
+                self.redis.setex(self.key_prefix + key, self.ttl, stored)
+            except Exception as e:
+                logger.warning(f'Cache Redis set failed: {str(e)}')
+
+    def delete(self, key):
+        """Remove a value from both tiers"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+        if self.redis is not None:
+            try:
+                self.redis.delete(self.key_prefix + key)
+            except Exception as e:
+                logger.warning(f'Cache Redis delete failed: {str(e)}')
+
+    def _set_local(self, key, value):
+        """Store a value in the in-process tier, evicting the LRU entry"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.local_ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        """Clear the in-process tier"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Get cache counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+
+        stats['max_size'] = self.max_size
+        stats['redis_enabled'] = self.redis is not None
+        return stats
@@ -1,5 +1,11 @@
 import requests
 import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from services.cache import TTLCache
+from services.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -7,22 +13,70 @@ logger = logging.getLogger(__name__)
 class GHLService:
     """Service for interacting with GoHighLevel API"""
 
-    def __init__(self, api_key):
+    def __init__(self, api_key, http_client=None, max_workers=4, send_timeout=60,
+                 contact_cache_ttl=300, contact_cache_size=1024, redis_url=None, send_concurrency=1,
+                 contact_cache_local_ttl=None):
+        """
+        Initialize GHL service
+
+        Args:
+            api_key (str): GHL API key
+            http_client (HTTPClient): Optional shared HTTP client
+            max_workers (int): Concurrent requests when sending a document
+            send_timeout (float): Overall deadline in seconds for send_document
+            contact_cache_ttl (int): Seconds to cache contacts (0 disables caching)
+            contact_cache_size (int): Contacts kept in the in-process cache
+            redis_url (str): Optional Redis URL to share cached contacts across processes
+            send_concurrency (int): send_document calls expected at once in
+                this process (request or worker threads); the shared executor
+                gets max_workers threads for each
+            contact_cache_local_ttl (int): Seconds to keep contacts in the
+                in-process tier when Redis is shared - how long other
+                processes may serve a contact from before it was updated
+        """
         self.api_key = api_key
+        self.http = http_client or get_http_client()
+        self.max_workers = max_workers
+        self.send_timeout = send_timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers * max(send_concurrency, 1),
+            thread_name_prefix='ghl'
+        )
+
+        self.contact_cache = None
+        if contact_cache_ttl > 0:
+            self.contact_cache = TTLCache(
+                max_size=contact_cache_size,
+                ttl=contact_cache_ttl,
+                redis_url=redis_url,
+                key_prefix='voice_sop:ghl_contact:',
+                json_values=True,
+                local_ttl=contact_cache_local_ttl
+            )
+        # Concurrent lookups of the same contact share one request
+        self._contact_lock = threading.Lock()
+        self._contact_requests = {}
         self.base_url = 'https://rest.gohighlevel.com/v1'
         self.headers = {
             'Authorization': f'Bearer {api_key}',
             'Content-Type': 'application/json'
         }
 
-    def send_document(self, contact_id, document_url, document_title):
+    def send_document(self, contact_id, document_url, document_title, timeout=None, deadline=None):
         """
         Send document to contact via GHL
 
+        SMS, email, note and task are independent, so they are sent
+        concurrently. Each channel gets the timeout from when it starts
+        running; channels that run past it, or are still queued behind
+        other sends after it, are reported as failed.
+
         Args:
             contact_id (str): GHL contact ID
             document_url (str): URL to the Google Doc
             document_title (str): Title of the document
+            timeout (float): Seconds each channel may run (default: send_timeout)
+            deadline (Deadline): Optional request budget, caps the timeout
 
         Returns:
             dict: Result of the operation
@@ -30,49 +84,125 @@ class GHLService:
         try:
             logger.info(f'Sending document to GHL contact: {contact_id}')
 
-            # Send via SMS
-            sms_result = self._send_sms(
-                contact_id,
-                f"Your SOP document '{document_title}' is ready! View it here: {document_url}"
-            )
+            channels = {
+                'sms': (
+                    self._send_sms,
+                    contact_id,
+                    f"Your SOP document '{document_title}' is ready! View it here: {document_url}"
+                ),
+                'email': (
+                    self._send_email,
+                    contact_id,
+                    f"Your SOP: {document_title}",
+                    self._create_email_body(document_title, document_url)
+                ),
+                'note': (
+                    self._add_note,
+                    contact_id,
+                    f"SOP Document Created: {document_title}\nURL: {document_url}"
+                ),
+                'task': (
+                    self._create_task,
+                    contact_id,
+                    f"Follow up on SOP: {document_title}"
+                )
+            }
 
-            # Send via Email
-            email_result = self._send_email(
-                contact_id,
-                f"Your SOP: {document_title}",
-                self._create_email_body(document_title, document_url)
-            )
+            if timeout is None:
+                timeout = self.send_timeout
+            if deadline is not None:
+                timeout = deadline.timeout(timeout)
 
-            # Add note to contact
-            note_result = self._add_note(
-                contact_id,
-                f"SOP Document Created: {document_title}\nURL: {document_url}"
-            )
-
-            # Create task for follow-up
-            task_result = self._create_task(
-                contact_id,
-                f"Follow up on SOP: {document_title}"
-            )
+            results = self._run_concurrently(channels, timeout, deadline=deadline)
 
             logger.info('Document sent to GHL successfully')
 
             return {
                 'success': True,
-                'sms_sent': sms_result['success'],
-                'email_sent': email_result['success'],
-                'note_added': note_result['success'],
-                'task_created': task_result['success']
+                'sms_sent': results['sms']['success'],
+                'email_sent': results['email']['success'],
+                'note_added': results['note']['success'],
+                'task_created': results['task']['success'],
+                'channels': results
             }
 
         except Exception as e:
             logger.error(f'Failed to send document to GHL: {str(e)}')
             raise Exception(f'GHL API Error: {str(e)}')
 
-    def _send_sms(self, contact_id, message):
+    def _run_concurrently(self, calls, timeout, deadline=None):
+        """
+        Run named calls on the executor and collect their results
+
+        Each call's timeout is measured from when it starts, so time spent
+        queued behind other sends doesn't count against it. A call still
+        queued after the timeout is cancelled without running. A deadline,
+        if given, caps the whole wait.
+
+        Args:
+            calls (dict): name -> (function, *args)
+            timeout (float): Seconds each call may run
+            deadline (Deadline): Optional request budget, passed to every call
+
+        Returns:
+            dict: name -> result dict ({'success': False, 'error': ...} on failure)
+        """
+        submitted = time.monotonic()
+        started = {}
+
+        def run(name, func, args):
+            started[name] = time.monotonic()
+            return func(*args, deadline=deadline)
+
+        futures = {
+            name: self._executor.submit(run, name, call[0], call[1:])
+            for name, call in calls.items()
+        }
+
+        results = {}
+        pending = set(futures)
+
+        while pending:
+            now = time.monotonic()
+            limits = {name: started.get(name, submitted) + timeout for name in pending}
+            stop_at = min(limits.values())
+            if deadline is not None:
+                stop_at = min(stop_at, now + deadline.remaining())
+
+            wait([futures[name] for name in pending], timeout=max(stop_at - now, 0),
+                 return_when=FIRST_COMPLETED)
+
+            now = time.monotonic()
+            deadline_passed = deadline is not None and deadline.expired()
+
+            for name in list(pending):
+                future = futures[name]
+                if future.done():
+                    pending.discard(name)
+                elif deadline_passed or now >= started.get(name, submitted) + timeout:
+                    pending.discard(name)
+                    if future.cancel():
+                        error = 'Deadline exceeded before start' if deadline_passed else f'Not started within {timeout}s'
+                    else:
+                        error = 'Deadline exceeded' if deadline_passed else f'Timed out after {timeout}s'
+                    logger.error(f'GHL {name}: {error}')
+                    results[name] = {'success': False, 'error': error}
+
+        for name, future in futures.items():
+            if name in results:
+                continue
+            if future.exception() is not None:
+                logger.error(f'GHL {name} failed: {str(future.exception())}')
+                results[name] = {'success': False, 'error': str(future.exception())}
+            else:
+                results[name] = future.result()
+
+        return results
+
+    def _send_sms(self, contact_id, message, deadline=None):
         """Send SMS to contact"""
         try:
-            response = requests.post(
+            response = self.http.post(
                 f'{self.base_url}/conversations/messages',
                 headers=self.headers,
                 json={
@@ -80,7 +210,7 @@ class GHLService:
                     'type': 'SMS',
                     'message': message
                 },
-                timeout=30
+                deadline=deadline
             )
 
             response.raise_for_status()
@@ -90,18 +220,18 @@ class GHLService:
             logger.error(f'Failed to send SMS: {str(e)}')
             return {'success': False, 'error': str(e)}
 
-    def _send_email(self, contact_id, subject, body):
+    def _send_email(self, contact_id, subject, body, deadline=None):
         """Send email to contact"""
         try:
             # Get contact details first
-            contact = self.get_contact(contact_id)
+            contact = self.get_contact(contact_id, deadline=deadline)
             email = contact.get('email')
 
             if not email:
                 logger.warning(f'No email found for contact: {contact_id}')
                 return {'success': False, 'error': 'No email address'}
 
-            response = requests.post(
+            response = self.http.post(
                 f'{self.base_url}/conversations/messages',
                 headers=self.headers,
                 json={
@@ -111,7 +241,7 @@ class GHLService:
                     'html': body,
                     'emailTo': email
                 },
-                timeout=30
+                deadline=deadline
             )
 
             response.raise_for_status()
@@ -121,16 +251,16 @@ class GHLService:
             logger.error(f'Failed to send email: {str(e)}')
             return {'success': False, 'error': str(e)}
 
-    def _add_note(self, contact_id, note_text):
+    def _add_note(self, contact_id, note_text, deadline=None):
         """Add note to contact"""
         try:
-            response = requests.post(
+            response = self.http.post(
                 f'{self.base_url}/contacts/{contact_id}/notes',
                 headers=self.headers,
                 json={
                     'body': note_text
                 },
-                timeout=30
+                deadline=deadline
             )
 
             response.raise_for_status()
@@ -140,14 +270,14 @@ class GHLService:
             logger.error(f'Failed to add note: {str(e)}')
             return {'success': False, 'error': str(e)}
 
-    def _create_task(self, contact_id, title, due_days=7):
+    def _create_task(self, contact_id, title, due_days=7, deadline=None):
         """Create follow-up task"""
         try:
             from datetime import datetime, timedelta
 
             due_date = (datetime.now() + timedelta(days=due_days)).isoformat()
 
-            response = requests.post(
+            response = self.http.post(
                 f'{self.base_url}/contacts/{contact_id}/tasks',
                 headers=self.headers,
                 json={
@@ -155,7 +285,7 @@ class GHLService:
                     'dueDate': due_date,
                     'completed': False
                 },
-                timeout=30
+                deadline=deadline
             )
 
             response.raise_for_status()
@@ -165,13 +295,67 @@ class GHLService:
             logger.error(f'Failed to create task: {str(e)}')
             return {'success': False, 'error': str(e)}
 
-    def get_contact(self, contact_id):
-        """Get contact details"""
+    def get_contact(self, contact_id, deadline=None):
+        """
+        Get contact details
+
+        Served from the contact cache when possible. Concurrent lookups for
+        the same contact wait on a single in-flight request.
+        """
+        if self.contact_cache is None:
+            return self._fetch_contact(contact_id, deadline=deadline)
+
+        contact = self.contact_cache.get(contact_id)
+        if contact is not None:
+            return contact
+
+        with self._contact_lock:
+            future = self._contact_requests.get(contact_id)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._contact_requests[contact_id] = future
+
+        if not is_leader:
+            return future.result(timeout=deadline.remaining() if deadline else None)
+
         try:
-            response = requests.get(
+            contact = self._fetch_contact(contact_id, deadline=deadline)
+
+            with self._contact_lock:
+                # invalidate_contact() drops the in-flight request, so don't
+                # cache a response that raced with an invalidation
+                if self._contact_requests.get(contact_id) is future:
+                    self.contact_cache.set(contact_id, contact)
+
+            future.set_result(contact)
+            return contact
+
+        except Exception as e:
+            future.set_exception(e)
+            raise
+
+        finally:
+            with self._contact_lock:
+                if self._contact_requests.get(contact_id) is future:
+                    del self._contact_requests[contact_id]
+
+    def invalidate_contact(self, contact_id):
+        """Drop a contact from the cache after it changes"""
+        if self.contact_cache is None:
+            return
+
+        with self._contact_lock:
+            self._contact_requests.pop(contact_id, None)
+        self.contact_cache.delete(contact_id)
+
+    def _fetch_contact(self, contact_id, deadline=None):
+        """Get contact details from the GHL API"""
+        try:
+            response = self.http.get(
                 f'{self.base_url}/contacts/{contact_id}',
                 headers=self.headers,
-                timeout=30
+                deadline=deadline
             )
 
             response.raise_for_status()
@@ -184,14 +368,14 @@ class GHLService:
     def update_contact(self, contact_id, data):
         """Update contact information"""
         try:
-            response = requests.put(
+            response = self.http.put(
                 f'{self.base_url}/contacts/{contact_id}',
                 headers=self.headers,
-                json=data,
-                timeout=30
+                json=data
             )
 
             response.raise_for_status()
+            self.invalidate_contact(contact_id)
             return response.json()
 
         except requests.exceptions.RequestException as e:
@@ -201,14 +385,14 @@ class GHLService:
     def add_tag(self, contact_id, tag):
         """Add tag to contact"""
         try:
-            response = requests.post(
+            response = self.http.post(
                 f'{self.base_url}/contacts/{contact_id}/tags',
                 headers=self.headers,
-                json={'tags': [tag]},
-                timeout=30
+                json={'tags': [tag]}
             )
 
             response.raise_for_status()
+            self.invalidate_contact(contact_id)
             return response.json()
 
         except requests.exceptions.RequestException as e:
@@ -257,10 +441,9 @@ class GHLService:
     def trigger_workflow(self, contact_id, workflow_id):
         """Trigger a GHL workflow for contact"""
         try:
-            response = requests.post(
+            response = self.http.post(
                 f'{self.base_url}/contacts/{contact_id}/workflow/{workflow_id}',
-                headers=self.headers,
-                timeout=30
+                headers=self.headers
             )
 
             response.raise_for_status()
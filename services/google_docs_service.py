@@ -1,7 +1,15 @@
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from datetime import datetime
+import difflib
+import json
 import logging
+import threading
+import time
+
+from services.cache import TTLCache
+from services.markdown_renderer import MarkdownRenderer, markdown_to_requests, merge_spans, utf16_len
 
 logger = logging.getLogger(__name__)
 
@@ -9,16 +17,39 @@ logger = logging.getLogger(__name__)
 class GoogleDocsService:
     """Service for creating and managing Google Docs"""
 
-    def __init__(self, credentials_path, folder_id=None):
+    # Placeholder in the template where the SOP body is inserted
+    CONTENT_PLACEHOLDER = '{{CONTENT}}'
+    # Seconds the template's layout is cached before it is read again
+    TEMPLATE_CACHE_TTL = 600
+
+    def __init__(self, credentials_path, folder_id=None, template_id=None,
+                 document_cache_size=64, document_cache_ttl=3600):
         """
         Initialize Google Docs service
 
         Args:
             credentials_path (str): Path to Google service account credentials JSON
             folder_id (str): Optional Google Drive folder ID to store documents
+            template_id (str): Optional pre-styled template document - when set,
+                new documents are copies of it with the SOP filled in
+            document_cache_size (int): Documents kept in the read cache
+            document_cache_ttl (int): Seconds to keep document content (0 disables)
         """
         self.credentials_path = credentials_path
         self.folder_id = folder_id
+        self.template_id = template_id
+        self._template_layout = None
+        self._template_lock = threading.Lock()
+
+        self.document_cache = None
+        if document_cache_ttl > 0:
+            self.document_cache = TTLCache(
+                max_size=document_cache_size,
+                ttl=document_cache_ttl,
+                key_prefix='voice_sop:gdoc:'
+            )
+        self._document_cache_lock = threading.Lock()
+        self._document_cache_stats = {'hits': 0, 'misses': 0, 'stale': 0}
         self.scopes = [
             'https://www.googleapis.com/auth/documents',
             'https://www.googleapis.com/auth/drive'
@@ -36,37 +67,70 @@ class GoogleDocsService:
             logger.error(f'Failed to initialize Google Docs service: {str(e)}')
             raise
 
-    def create_document(self, title, content):
+    def create_document(self, title, content, deadline=None, share_with=None, fields=None):
         """
         Create a new Google Doc with formatted content
 
+        The file is created directly in the folder with Drive files.create,
+        or as a copy of the template with files.copy. Its content is written
+        in one batchUpdate and all permissions go in one HTTP batch request -
+        three round trips in total.
+
         Args:
             title (str): Document title
             content (str): Markdown content to insert
+            deadline (Deadline): Optional request budget - checked before each
+                API call, so no further calls are made once it is used up
+            share_with (list): Optional emails to share the document with as
+                readers, in the same batch as the link permission
+            fields (dict): Optional template values - each key replaces
+                {{KEY}} in the template ({{TITLE}} and {{DATE}} are always set)
 
         Returns:
             dict: Document info with id and url
         """
         try:
             logger.info(f'Creating Google Doc: {title}')
-
-            # Create empty document
-            doc = self.docs_service.documents().create(
-                body={'title': title}
-            ).execute()
-
-            doc_id = doc['documentId']
+            self._check_deadline(deadline)
+
+            requests = None
+            if self.template_id:
+                requests = self._template_requests(title, content, fields, deadline)
+            from_template = requests is not None
+
+            if from_template:
+                # Copy of the template, created directly in the target folder
+                self._check_deadline(deadline)
+                doc_id = self._copy_file(self.template_id, title, self.folder_id)
+            else:
+                # Create empty document in the target folder
+                doc_id = self._create_file(title, self.folder_id)
+                requests = self._markdown_to_requests(content)
             logger.info(f'Created document with ID: {doc_id}')
 
             # Insert content
-            self._insert_content(doc_id, content)
-
-            # Move to folder if specified
-            if self.folder_id:
-                self._move_to_folder(doc_id, self.folder_id)
-
-            # Make document accessible
-            self._set_permissions(doc_id)
+            self._check_deadline(deadline)
+            try:
+                self._batch_update(doc_id, requests)
+            except HttpError as e:
+                if not from_template or e.resp.status != 400:
+                    raise
+                # The template was edited since its layout was cached. A failed
+                # batchUpdate changes nothing, so rebuild the requests from the
+                # copy's own layout (which also refreshes the cache) and retry once
+                logger.warning(f'Template layout out of date, retrying with a fresh layout: {str(e)}')
+                self._check_deadline(deadline)
+                layout = self._refresh_template_layout(doc_id)
+                self._check_deadline(deadline)
+                self._batch_update(doc_id, self._template_requests(title, content, fields, layout=layout))
+
+            # Make document accessible and share it
+            permissions = [{'type': 'anyone', 'role': 'reader'}]
+            for email in share_with or []:
+                permissions.append({'type': 'user', 'role': 'reader', 'emailAddress': email})
+
+            self._check_deadline(deadline)
+            self._set_permissions_batch(doc_id, permissions)
 
             doc_url = f'https://docs.google.com/document/d/{doc_id}/edit'
 
@@ -82,12 +146,143 @@ class GoogleDocsService:
             logger.error(f'Google Docs API error: {str(e)}')
             raise Exception(f'Failed to create Google Doc: {str(e)}')
 
+    def _template_requests(self, title, content, fields=None, deadline=None, layout=None):
+        """
+        Build the batchUpdate that fills a copy of the template
+
+        The SOP replaces the {{CONTENT}} placeholder (or is appended if the
+        template has none) and other placeholders are replaced with
+        replaceAllText. Positions come from the cached template layout, which
+        a fresh copy shares, unless a layout is given.
+
+        Returns:
+            list: Requests, or None if the template can't be read
+        """
+        if layout is None:
+            try:
+                layout = self._get_template_layout(deadline)
+            except HttpError as e:
+                logger.warning(f'Template {self.template_id} unavailable, creating an empty doc: {str(e)}')
+                return None
+
+        requests = []
+        index = layout['placeholder_index']
+        if index is not None:
+            requests.append({
+                'deleteContentRange': {
+                    'range': {
+                        'startIndex': index,
+                        'endIndex': index + utf16_len(self.CONTENT_PLACEHOLDER)
+                    }
+                }
+            })
+        else:
+            index = layout['end_index']
+
+        requests.extend(self._markdown_to_requests(content, start_index=index))
+
+        # replaceAllText matches by text, so it runs last and can't disturb
+        # the indices above
+        values = {'TITLE': title, 'DATE': datetime.utcnow().strftime('%B %d, %Y')}
+        values.update(fields or {})
+        for key, value in values.items():
+            requests.append({
+                'replaceAllText': {
+                    'containsText': {'text': f'{{{{{key}}}}}', 'matchCase': True},
+                    'replaceText': str(value) if value is not None else ''
+                }
+            })
+
+        return requests
+
+    def _get_template_layout(self, deadline=None):
+        """Get the template's content placeholder and end indices, cached"""
+        with self._template_lock:
+            layout = self._template_layout
+            if layout is not None and layout['expires_at'] > time.monotonic():
+                return layout
+
+            self._check_deadline(deadline)
+            layout = self._read_layout(self.template_id)
+            if layout['placeholder_index'] is None:
+                logger.warning(f'Template has no {self.CONTENT_PLACEHOLDER} placeholder, appending content')
+
+            self._template_layout = layout
+            return layout
+
+    def _refresh_template_layout(self, doc_id):
+        """Read the layout of a fresh template copy and cache it for the template"""
+        layout = self._read_layout(doc_id)
+        with self._template_lock:
+            self._template_layout = layout
+        return layout
+
+    def _read_layout(self, doc_id):
+        """Read a document's content placeholder and end indices"""
+        doc = self.docs_service.documents().get(documentId=doc_id).execute()
+
+        content = doc.get('body', {}).get('content', [])
+        return {
+            'placeholder_index': self._find_text(content, self.CONTENT_PLACEHOLDER),
+            'end_index': content[-1]['endIndex'] - 1 if content else 1,
+            'expires_at': time.monotonic() + self.TEMPLATE_CACHE_TTL
+        }
+
+    def _find_text(self, content, text):
+        """Find the document index of text within a single text run"""
+        for element in content:
+            for run in element.get('paragraph', {}).get('elements', []):
+                run_text = run.get('textRun', {}).get('content', '')
+                position = run_text.find(text)
+                if position != -1:
+                    return run['startIndex'] + utf16_len(run_text[:position])
+        return None
+
+    def _copy_file(self, file_id, title, folder_id=None):
+        """Copy a file, directly into folder_id if given"""
+        body = {'name': title}
+        if folder_id:
+            body['parents'] = [folder_id]
+
+        file = self.drive_service.files().copy(
+            fileId=file_id,
+            body=body,
+            fields='id',
+            supportsAllDrives=True
+        ).execute()
+
+        return file['id']
+
+    def _create_file(self, title, folder_id=None):
+        """Create an empty Google Doc, directly inside folder_id if given"""
+        body = {
+            'name': title,
+            'mimeType': 'application/vnd.google-apps.document'
+        }
+        if folder_id:
+            body['parents'] = [folder_id]
+
+        file = self.drive_service.files().create(
+            body=body,
+            fields='id',
+            supportsAllDrives=True
+        ).execute()
+
+        return file['id']
+
+    def _check_deadline(self, deadline):
+        """Stop before the next API call if the request budget is used up"""
+        if deadline is not None:
+            deadline.check()
+
     def _insert_content(self, doc_id, content):
         """Insert formatted content into document"""
-        try:
-            # Convert markdown to Google Docs requests
-            requests = self._markdown_to_requests(content)
+        # Convert markdown to Google Docs requests
+        self._batch_update(doc_id, self._markdown_to_requests(content))
 
+    def _batch_update(self, doc_id, requests):
+        """Apply content requests to a document in one batchUpdate"""
+        try:
             if requests:
                 self.docs_service.documents().batchUpdate(
                     documentId=doc_id,
@@ -100,127 +295,289 @@ class GoogleDocsService:
             logger.error(f'Failed to insert content: {str(e)}')
             raise
 
-    def _markdown_to_requests(self, markdown_content):
+    def _markdown_to_requests(self, markdown_content, start_index=1):
         """
         Convert markdown content to Google Docs API requests
-        This is a simplified version - you may want to enhance this
+        Headings, lists, bold/italic, code and links are rendered as Docs
+        styles in the same batchUpdate as the text (see MarkdownRenderer)
         """
-        requests = []
+        return markdown_to_requests(markdown_content, start_index)
 
-        # Simple approach: insert all text at beginning
-        requests.append({
-            'insertText': {
-                'location': {'index': 1},
-                'text': markdown_content
-            }
-        })
-
-        # You could enhance this to:
-        # - Parse markdown headings and apply heading styles
-        # - Parse bold/italic and apply text formatting
-        # - Parse lists and apply list formatting
-        # - etc.
+    def _set_permissions_batch(self, doc_id, permissions):
+        """
+        Create several permissions in one HTTP batch request
 
-        return requests
+        Args:
+            doc_id (str): Document ID
+            permissions (list): Permission bodies; 'user' permissions send a
+                notification email
+        """
+        def callback(request_id, response, exception):
+            permission = permissions[int(request_id)]
+            target = permission.get('emailAddress', permission['type'])
+            if exception is not None:
+                logger.warning(f'Failed to set permission for {target}: {str(exception)}')
+            else:
+                logger.info(f"Permissions set: {target} - {permission['role']}")
 
-    def _move_to_folder(self, doc_id, folder_id):
-        """Move document to specified folder"""
         try:
-            # Get current parents
-            file = self.drive_service.files().get(
-                fileId=doc_id,
-                fields='parents'
-            ).execute()
+            batch = self.drive_service.new_batch_http_request(callback=callback)
 
-            previous_parents = ','.join(file.get('parents', []))
+            for i, permission in enumerate(permissions):
+                options = {}
+                if permission['type'] == 'user':
+                    options['sendNotificationEmail'] = True
 
-            # Move to new folder
-            self.drive_service.files().update(
-                fileId=doc_id,
-                addParents=folder_id,
-                removeParents=previous_parents,
-                fields='id, parents'
-            ).execute()
+                batch.add(
+                    self.drive_service.permissions().create(
+                        fileId=doc_id,
+                        body=permission,
+                        fields='id',
+                        **options
+                    ),
+                    request_id=str(i)
+                )
 
-            logger.info(f'Document moved to folder: {folder_id}')
+            batch.execute()
 
         except Exception as e:
-            logger.warning(f'Failed to move document to folder: {str(e)}')
+            logger.warning(f'Failed to set permissions: {str(e)}')
 
-    def _set_permissions(self, doc_id, permission_type='anyone', role='reader'):
+    def update_document(self, doc_id, content, append=False, deadline=None):
         """
-        Set document permissions
+        Update existing document content
+
+        Replacing content is incremental: the document's paragraphs are
+        compared with the rendered markdown and only changed paragraphs are
+        deleted and re-inserted, in one batchUpdate pinned to the revision
+        that was read. Unchanged paragraphs keep their comments and anchors.
+        If someone edits the document in between, the diff is recomputed once.
 
         Args:
             doc_id (str): Document ID
-            permission_type (str): 'anyone', 'user', or 'domain'
-            role (str): 'reader', 'writer', or 'commenter'
+            content (str): New content
+            append (bool): If True, append to existing content; if False, replace
+            deadline (Deadline): Optional request budget
+
+        Returns:
+            dict: Document ID and the number of paragraphs rewritten
         """
         try:
-            permission = {
-                'type': permission_type,
-                'role': role
-            }
+            self._check_deadline(deadline)
+            if append:
+                self._insert_content(doc_id, content)
+                logger.info(f'Document updated: {doc_id}')
+                return {'id': doc_id, 'changed_paragraphs': None}
 
-            self.drive_service.permissions().create(
-                fileId=doc_id,
-                body=permission
-            ).execute()
+            for attempt in range(2):
+                doc = self.docs_service.documents().get(documentId=doc_id).execute()
+                requests, changed = self._diff_requests(doc, content)
+
+                if not requests:
+                    logger.info(f'Document unchanged: {doc_id}')
+                    return {'id': doc_id, 'changed_paragraphs': 0}
+
+                self._check_deadline(deadline)
+                try:
+                    self.docs_service.documents().batchUpdate(
+                        documentId=doc_id,
+                        body={
+                            'requests': requests,
+                            'writeControl': {'requiredRevisionId': doc['revisionId']}
+                        }
+                    ).execute()
+                    break
 
-            logger.info(f'Permissions set: {permission_type} - {role}')
+                except HttpError as e:
+                    if attempt == 0 and self._is_revision_conflict(e):
+                        logger.warning(f'Document {doc_id} changed while updating, retrying')
+                        continue
+                    raise
+
+            logger.info(f'Document updated: {doc_id} ({changed} paragraphs rewritten)')
+            return {'id': doc_id, 'changed_paragraphs': changed}
 
         except Exception as e:
-            logger.warning(f'Failed to set permissions: {str(e)}')
+            logger.error(f'Failed to update document: {str(e)}')
+            raise
 
-    def update_document(self, doc_id, content, append=False):
+    @staticmethod
+    def _is_revision_conflict(error):
         """
-        Update existing document content
+        Whether a batchUpdate failed because requiredRevisionId no longer matches
 
-        Args:
-            doc_id (str): Document ID
-            content (str): New content
-            append (bool): If True, append to existing content; if False, replace
+        Decided from the API's error status, or the error message for 400s
+        that don't carry one - never from the request URL.
         """
+        if error.resp.status not in (400, 409):
+            return False
+
         try:
-            if not append:
-                # Delete all content first
-                doc = self.docs_service.documents().get(documentId=doc_id).execute()
-                end_index = doc['body']['content'][-1]['endIndex']
+            details = json.loads(error.content.decode('utf-8'))['error']
+        except (ValueError, KeyError, TypeError, AttributeError):
+            details = {}
+
+        if details.get('status') in ('FAILED_PRECONDITION', 'ABORTED'):
+            return True
+        return details.get('status') in (None, 'INVALID_ARGUMENT') and 'revision' in error.reason.lower()
+
+    def _diff_requests(self, doc, content):
+        """
+        Build the requests that turn a document into rendered markdown
+
+        Paragraphs are matched on text, named style, list level and inline
+        styles. Changed runs of paragraphs are widened to whole lists, so
+        numbering doesn't restart mid-list, and applied from the end of the
+        document backwards so earlier indices stay valid.
 
-                requests = [{
-                    'deleteContentRange': {
-                        'range': {
-                            'startIndex': 1,
-                            'endIndex': end_index - 1
+        Returns:
+            tuple: (requests, number of new paragraphs written)
+        """
+        old = self._document_paragraphs(doc)
+        renderer = MarkdownRenderer().parse(content)
+        rendered = len(renderer.paragraphs)
+
+        # A rendered document ends with the document's own empty paragraph,
+        # which may only match the document's last paragraph
+        end_signature = ('', 'NORMAL_TEXT', None, ())
+        new = [renderer.paragraph_signature(i) for i in range(rendered)]
+        new.append(('\0end',))
+
+        old_signatures = [paragraph['signature'] for paragraph in old]
+        if old_signatures and old_signatures[-1] == end_signature:
+            old_signatures[-1] = new[-1]
+        matcher = difflib.SequenceMatcher(None, old_signatures, new, autojunk=False)
+
+        def in_list(signature):
+            # Tables ('\0', start) and the end marker have no list level
+            return len(signature) > 2 and signature[2] is not None
+
+        blocks = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                continue
+
+            # Rewrite whole lists, and never insert after the last paragraph
+            while i1 > 0 and j1 > 0 and (
+                i1 == len(old) or (in_list(old_signatures[i1 - 1]) and in_list(new[j1 - 1]))
+            ):
+                i1, j1 = i1 - 1, j1 - 1
+            while i2 < len(old) and j2 < len(new) and (
+                in_list(old_signatures[i2]) and in_list(new[j2])
+            ):
+                i2, j2 = i2 + 1, j2 + 1
+
+            if blocks and i1 <= blocks[-1][1]:
+                previous = blocks.pop()
+                i1, j1 = min(i1, previous[0]), min(j1, previous[2])
+            blocks.append([i1, i2, j1, j2])
+
+        end_index = old[-1]['end'] if old else 1
+        requests = []
+        changed = 0
+
+        for i1, i2, j1, j2 in reversed(blocks):
+            index = old[i1]['start'] if i1 < len(old) else end_index - 1
+
+            if i2 > i1:
+                # The document's final newline can't be deleted
+                delete_end = min(old[i2 - 1]['end'], end_index - 1)
+                if delete_end > index:
+                    requests.append({
+                        'deleteContentRange': {
+                            'range': {'startIndex': index, 'endIndex': delete_end}
                         }
-                    }
-                }]
+                    })
 
-                self.docs_service.documents().batchUpdate(
-                    documentId=doc_id,
-                    body={'requests': requests}
-                ).execute()
+            j2 = min(j2, rendered)
+            requests.extend(renderer.requests(j1, j2, index=index, reset=True))
+            changed += max(j2 - j1, 0)
 
-            # Insert new content
-            self._insert_content(doc_id, content)
+        return requests, changed
 
-            logger.info(f'Document updated: {doc_id}')
+    def _document_paragraphs(self, doc):
+        """
+        Get a document's paragraphs with their ranges and signatures
 
-        except Exception as e:
-            logger.error(f'Failed to update document: {str(e)}')
-            raise
+        Signatures match MarkdownRenderer.paragraph_signature. Tables and
+        other structural elements never match, so they are replaced if the
+        diff reaches them.
+        """
+        paragraphs = []
+
+        for element in doc.get('body', {}).get('content', []):
+            if 'startIndex' not in element:
+                continue
+
+            start, end = element['startIndex'], element['endIndex']
+            paragraph = element.get('paragraph')
+            if paragraph is None:
+                paragraphs.append({'start': start, 'end': end, 'signature': ('\0', start)})
+                continue
+
+            text = ''
+            spans = []
+            for run in paragraph.get('elements', []):
+                text_run = run.get('textRun')
+                if text_run is None:
+                    # Inline objects and breaks occupy indices but have no text
+                    text += '\0' * (run['endIndex'] - run['startIndex'])
+                    continue
+
+                text += text_run.get('content', '')
+                style = text_run.get('textStyle', {})
+                values = {
+                    'bold': style.get('bold'),
+                    'italic': style.get('italic'),
+                    'link': style.get('link', {}).get('url'),
+                    'weightedFontFamily': style.get('weightedFontFamily', {}).get('fontFamily')
+                }
+                for field, value in values.items():
+                    if value:
+                        spans.append((run['startIndex'] - start, run['endIndex'] - start, field, value))
+
+            text = text[:-1] if text.endswith('\n') else text
+            length = utf16_len(text)
+            spans = [(s, min(e, length), field, value) for s, e, field, value in spans if s < length]
+
+            bullet = paragraph.get('bullet')
+            signature = (
+                text,
+                paragraph.get('paragraphStyle', {}).get('namedStyleType', 'NORMAL_TEXT'),
+                bullet.get('nestingLevel', 0) if bullet is not None else None,
+                merge_spans(spans)
+            )
+            paragraphs.append({'start': start, 'end': end, 'signature': signature})
+
+        return paragraphs
 
     def get_document_content(self, doc_id):
-        """Get document content as plain text"""
+        """
+        Get document content as plain text
+
+        With the read cache enabled, a Drive probe of the file's revision
+        decides whether the cached text is current, so unchanged documents
+        are not downloaded again.
+        """
         try:
-            doc = self.docs_service.documents().get(documentId=doc_id).execute()
+            if self.document_cache is None:
+                doc = self.docs_service.documents().get(documentId=doc_id).execute()
+                return self._document_text(doc)
+
+            revision = self._get_revision(doc_id)
+            cached = self.document_cache.get(doc_id)
 
-            content = ''
-            for element in doc.get('body', {}).get('content', []):
-                if 'paragraph' in element:
-                    for text_run in element['paragraph'].get('elements', []):
-                        if 'textRun' in text_run:
-                            content += text_run['textRun'].get('content', '')
+            if cached is not None and cached['revision'] == revision:
+                self._count_document_read('hits')
+                return cached['content']
+
+            self._count_document_read('stale' if cached is not None else 'misses')
+
+            # Probed before reading, so a concurrent edit can only make the
+            # cached entry look older than it is, never newer
+            doc = self.docs_service.documents().get(documentId=doc_id).execute()
+            content = self._document_text(doc)
+            self.document_cache.set(doc_id, {'revision': revision, 'content': content})
 
             return content
 
@@ -228,6 +585,53 @@ class GoogleDocsService:
             logger.error(f'Failed to get document content: {str(e)}')
             raise
 
+    def _get_revision(self, doc_id):
+        """
+        Get a cheap identifier of a document's current revision
+
+        Drive only reports headRevisionId for binary files, so Google Docs
+        fall back to the file's version, which changes on every edit.
+        """
+        file = self.drive_service.files().get(
+            fileId=doc_id,
+            fields='headRevisionId,version',
+            supportsAllDrives=True
+        ).execute()
+
+        return file.get('headRevisionId') or file.get('version')
+
+    def _document_text(self, doc):
+        """Join a document's text runs into plain text"""
+        parts = []
+        for element in doc.get('body', {}).get('content', []):
+            if 'paragraph' in element:
+                for text_run in element['paragraph'].get('elements', []):
+                    if 'textRun' in text_run:
+                        parts.append(text_run['textRun'].get('content', ''))
+
+        return ''.join(parts)
+
+    def _count_document_read(self, outcome):
+        with self._document_cache_lock:
+            self._document_cache_stats[outcome] += 1
+
+    def document_cache_stats(self):
+        """Get read cache counters: hits, misses, stale (revision changed)"""
+        if self.document_cache is None:
+            return {'enabled': False}
+
+        with self._document_cache_lock:
+            stats = dict(self._document_cache_stats)
+
+        cache_stats = self.document_cache.stats()
+        stats.update({
+            'enabled': True,
+            'size': cache_stats['size'],
+            'max_size': cache_stats['max_size'],
+            'evictions': cache_stats['evictions']
+        })
+        return stats
+
     def share_document(self, doc_id, email, role='reader'):
         """
         Share document with specific user
@@ -0,0 +1,232 @@
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import InvalidHeader
+from urllib3.util.retry import Retry
+
+from config import Config
+from utils import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+RETRY_METHODS = frozenset(['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'])
+RETRY_STATUSES = frozenset([429, 502, 503, 504])
+
+
+class HTTPClient:
+    """
+    Shared HTTP client with keep-alive connection pools
+
+    Wraps a requests Session with one connection pool per host, a default
+    timeout and a retry policy. Only idempotent methods are retried, so a
+    failed POST never sends a duplicate SMS or webhook. The session is
+    recreated after a fork so prefork workers never share sockets.
+
+    Requests with a deadline go through a second session that shares the
+    connection pools but not the retry policy: they are retried here, and
+    only while a retry, including any Retry-After wait, fits in the time
+    remaining.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, max_retries=2,
+                 backoff_factor=0.5, timeout=30):
+        """
+        Initialize HTTP client
+
+        Args:
+            pool_connections (int): Number of per-host pools to keep
+            pool_maxsize (int): Keep-alive connections per host
+            max_retries (int): Retries for idempotent requests
+            backoff_factor (float): Exponential backoff between retries
+            timeout (float): Default timeout in seconds
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self._session = None
+        self._budget_session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Get the session for the current process"""
+        self._ensure_sessions()
+        return self._session
+
+    @property
+    def budget_session(self):
+        """Get the non-retrying session for requests with a deadline"""
+        self._ensure_sessions()
+        return self._budget_session
+
+    def _ensure_sessions(self):
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    self._session, self._budget_session = self._create_sessions()
+                    self._pid = os.getpid()
+
+    def _create_sessions(self):
+        """Create a session with pooled, retrying adapters and a non-retrying twin"""
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=RETRY_METHODS,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry
+        )
+        budget_adapter = HTTPAdapter(max_retries=Retry(0, read=False, redirect=False))
+        # Same sockets, different retry policy
+        budget_adapter.poolmanager = adapter.poolmanager
+
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        budget_session = requests.Session()
+        budget_session.mount('https://', budget_adapter)
+        budget_session.mount('http://', budget_adapter)
+        return session, budget_session
+
+    def request(self, method, url, deadline=None, **kwargs):
+        """
+        Send a request through the shared session
+
+        Args:
+            deadline (Deadline): Optional request budget; each attempt's timeout
+                is capped at the remaining time, retries happen only if they
+                fit, and nothing is sent once it is used up
+        """
+        timeout = kwargs.pop('timeout', self.timeout)
+        if deadline is None:
+            return self.session.request(method, url, timeout=timeout, **kwargs)
+
+        retries = self.max_retries if method.upper() in RETRY_METHODS else 0
+        attempt = 0
+
+        while True:
+            try:
+                attempt_timeout = deadline.timeout(timeout)
+            except DeadlineExceeded as e:
+                # Surface as a requests timeout so services handle it like one
+                raise requests.exceptions.Timeout(str(e))
+
+            response = None
+            try:
+                response = self.budget_session.request(method, url, timeout=attempt_timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt >= retries:
+                    raise
+                delay = self.backoff_factor * (2 ** attempt)
+                if delay >= deadline.remaining():
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                    return response
+                delay = self.backoff_factor * (2 ** attempt)
+                retry_after = response.headers.get('Retry-After')
+                if retry_after:
+                    try:
+                        delay = max(delay, Retry().parse_retry_after(retry_after))
+                    except InvalidHeader:
+                        pass
+                if delay >= deadline.remaining():
+                    # Waiting would use up the budget; let the caller see the status
+                    return response
+                response.close()
+
+            logger.info(f'Retrying {method} {url} in {delay:.1f}s (attempt {attempt + 1} of {retries})')
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def prewarm(self, urls, timeout=5):
+        """
+        Open keep-alive connections to the hosts of the given URLs
+
+        Sends a HEAD request to each host's root rather than the URL itself,
+        so webhook endpoints are never triggered. Failures are ignored.
+        """
+        origins = set()
+        for url in urls:
+            if not url:
+                continue
+            parts = urlsplit(url)
+            if parts.scheme and parts.netloc:
+                origins.add(f'{parts.scheme}://{parts.netloc}/')
+
+        for origin in origins:
+            try:
+                self.session.head(origin, timeout=timeout, allow_redirects=False)
+                logger.info(f'Prewarmed connection to {origin}')
+            except requests.exceptions.RequestException as e:
+                logger.warning(f'Failed to prewarm connection to {origin}: {str(e)}')
+
+    def close(self):
+        """Close pooled connections"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._budget_session.close()
+            self._session = None
+            self._budget_session = None
+            self._pid = None
+
+
+_http_client = None
+
+
+def get_http_client():
+    """Get the process-wide HTTP client configured from Config"""
+    global _http_client
+    if _http_client is None:
+        _http_client = HTTPClient(
+            pool_connections=Config.HTTP_POOL_CONNECTIONS,
+            pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+            max_retries=Config.HTTP_MAX_RETRIES,
+            backoff_factor=Config.HTTP_BACKOFF_FACTOR,
+            timeout=Config.HTTP_TIMEOUT
+        )
+    return _http_client
+
+
+def prewarm_connections():
+    """Prewarm connections to every configured outbound service"""
+    if not Config.HTTP_PREWARM:
+        return
+
+    get_http_client().prewarm([
+        Config.VAPI_BASE_URL,
+        Config.GHL_BASE_URL,
+        Config.LINDY_WEBHOOK_URL
+    ])
@@ -1,5 +1,11 @@
-import requests
+import base64
+import gzip
 import logging
+from datetime import datetime
+
+import requests
+
+from services.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -7,11 +13,31 @@ logger = logging.getLogger(__name__)
 class LindyService:
     """Service for sending callbacks to Lindy"""
 
-    def __init__(self, webhook_url, webhook_secret=None):
+    def __init__(self, webhook_url, webhook_secret=None, http_client=None, outbox=None,
+                 artifact_store=None, inline_max_bytes=32768):
+        """
+        Initialize Lindy service
+
+        Args:
+            webhook_url (str): Lindy webhook URL
+            webhook_secret (str): Optional secret sent as X-Webhook-Secret
+            http_client (HTTPClient): Optional shared HTTP client
+            outbox (LindyOutbox): Optional outbox - when set, events are queued
+                for background delivery instead of posted inline
+            artifact_store (ArtifactStore): Optional store - when set, SOP
+                content is sent as a signed URL instead of inline
+            inline_max_bytes (int): SOPs up to this size are also sent inline,
+                gzip-compressed, alongside the URL (0 disables)
+        """
         self.webhook_url = webhook_url
         self.webhook_secret = webhook_secret
+        self.http = http_client or get_http_client()
+        self.outbox = outbox
+        self.artifact_store = artifact_store
+        self.inline_max_bytes = inline_max_bytes
 
-    def notify_sop_completed(self, call_id, document_url, document_title, customer_info, sop_content=None):
+    def notify_sop_completed(self, call_id, document_url, document_title, customer_info, sop_content=None,
+                             deadline=None):
         """
         Notify Lindy that SOP has been completed
 
@@ -21,109 +47,67 @@ class LindyService:
             document_title (str): Document title
             customer_info (dict): Customer information
             sop_content (str): Full SOP text content for Lindy to create document
+            deadline (Deadline): Optional request budget
 
         Returns:
             dict: Response from Lindy
         """
-        try:
-            logger.info(f'Notifying Lindy about completed SOP for call: {call_id}')
-
-            payload = {
-                'event': 'sop_completed',
-                'call_id': call_id,
-                'document': {
-                    'url': document_url,  # Will be None - Lindy creates the doc
-                    'title': document_title,
-                    'content': sop_content  # Full SOP content for Lindy
-                },
-                'customer': {
-                    'name': customer_info.get('name'),
-                    'email': customer_info.get('email'),
-                    'phone': customer_info.get('phone'),
-                    'contact_id': customer_info.get('contact_id'),
-                    'company': customer_info.get('company')
-                },
-                'status': 'completed',
-                'timestamp': self._get_timestamp()
-            }
-
-            headers = {
-                'Content-Type': 'application/json'
-            }
-
-            if self.webhook_secret:
-                headers['X-Webhook-Secret'] = self.webhook_secret
-
-            response = requests.post(
-                self.webhook_url,
-                json=payload,
-                headers=headers,
-                timeout=30
-            )
-
-            response.raise_for_status()
-
-            logger.info(f'Successfully notified Lindy: {response.status_code}')
-
-            return {
-                'success': True,
-                'status_code': response.status_code,
-                'response': response.json() if response.text else None
-            }
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f'Failed to notify Lindy: {str(e)}')
-            return {
-                'success': False,
-                'error': str(e)
-            }
-
-    def notify_sop_started(self, call_id, customer_info):
+        logger.info(f'Notifying Lindy about completed SOP for call: {call_id}')
+
+        payload = {
+            'event': 'sop_completed',
+            'call_id': call_id,
+            'document': {
+                'url': document_url,  # Will be None - Lindy creates the doc
+                'title': document_title,
+                'content': sop_content  # Full SOP content for Lindy
+            },
+            'customer': {
+                'name': customer_info.get('name'),
+                'email': customer_info.get('email'),
+                'phone': customer_info.get('phone'),
+                'contact_id': customer_info.get('contact_id'),
+                'company': customer_info.get('company')
+            },
+            'status': 'completed',
+            'timestamp': self._get_timestamp()
+        }
+
+        if sop_content and self.artifact_store is not None:
+            payload['document'].update(self._content_reference(sop_content))
+
+        return self._deliver(call_id, payload, deadline)
+
+    def notify_sop_started(self, call_id, customer_info, deadline=None):
         """
         Notify Lindy that SOP generation has started
 
         Args:
             call_id (str): VAPI call ID
             customer_info (dict): Customer information
+            deadline (Deadline): Optional request budget
 
         Returns:
             dict: Response from Lindy
         """
-        try:
-            logger.info(f'Notifying Lindy that SOP generation started for call: {call_id}')
-
-            payload = {
-                'event': 'sop_started',
-                'call_id': call_id,
-                'customer': {
-                    'name': customer_info.get('name'),
-                    'email': customer_info.get('email'),
-                    'phone': customer_info.get('phone'),
-                    'contact_id': customer_info.get('contact_id')
-                },
-                'status': 'processing',
-                'timestamp': self._get_timestamp()
-            }
-
-            headers = {'Content-Type': 'application/json'}
-            if self.webhook_secret:
-                headers['X-Webhook-Secret'] = self.webhook_secret
-
-            response = requests.post(
-                self.webhook_url,
-                json=payload,
-                headers=headers,
-                timeout=30
-            )
-
-            response.raise_for_status()
-            return {'success': True, 'status_code': response.status_code}
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f'Failed to notify Lindy (start): {str(e)}')
-            return {'success': False, 'error': str(e)}
-
-    def notify_error(self, call_id, error_message, customer_info=None):
+        logger.info(f'Notifying Lindy that SOP generation started for call: {call_id}')
+
+        payload = {
+            'event': 'sop_started',
+            'call_id': call_id,
+            'customer': {
+                'name': customer_info.get('name'),
+                'email': customer_info.get('email'),
+                'phone': customer_info.get('phone'),
+                'contact_id': customer_info.get('contact_id')
+            },
+            'status': 'processing',
+            'timestamp': self._get_timestamp()
+        }
+
+        return self._deliver(call_id, payload, deadline)
+
+    def notify_error(self, call_id, error_message, customer_info=None, deadline=None):
         """
         Notify Lindy about an error during SOP generation
 
@@ -131,77 +115,248 @@ class LindyService:
             call_id (str): VAPI call ID
             error_message (str): Error description
             customer_info (dict): Optional customer information
+            deadline (Deadline): Optional request budget
 
         Returns:
             dict: Response from Lindy
         """
-        try:
-            logger.info(f'Notifying Lindy about error for call: {call_id}')
-
-            payload = {
-                'event': 'sop_error',
-                'call_id': call_id,
-                'error': error_message,
-                'customer': customer_info if customer_info else {},
-                'status': 'failed',
-                'timestamp': self._get_timestamp()
-            }
-
-            headers = {'Content-Type': 'application/json'}
-            if self.webhook_secret:
-                headers['X-Webhook-Secret'] = self.webhook_secret
-
-            response = requests.post(
-                self.webhook_url,
-                json=payload,
-                headers=headers,
-                timeout=30
-            )
+        logger.info(f'Notifying Lindy about error for call: {call_id}')
 
-            response.raise_for_status()
-            return {'success': True, 'status_code': response.status_code}
+        payload = {
+            'event': 'sop_error',
+            'call_id': call_id,
+            'error': error_message,
+            'customer': customer_info if customer_info else {},
+            'status': 'failed',
+            'timestamp': self._get_timestamp()
+        }
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f'Failed to notify Lindy (error): {str(e)}')
-            return {'success': False, 'error': str(e)}
+        return self._deliver(call_id, payload, deadline)
 
-    def send_custom_event(self, event_type, data):
+    def send_custom_event(self, event_type, data, deadline=None):
         """
         Send custom event to Lindy
 
         Args:
             event_type (str): Event type
             data (dict): Event data
+            deadline (Deadline): Optional request budget
 
         Returns:
             dict: Response from Lindy
         """
+        payload = {
+            'event': event_type,
+            'data': data,
+            'timestamp': self._get_timestamp()
+        }
+
+        return self._deliver((data or {}).get('call_id'), payload, deadline)
+
+    def _content_reference(self, content):
+        """
+        Store SOP content and build the document fields that reference it
+
+        Returns the inline content unchanged if the artifact can't be stored,
+        so Lindy still receives the SOP.
+        """
+        data = content.encode('utf-8')
+
         try:
-            payload = {
-                'event': event_type,
-                'data': data,
-                'timestamp': self._get_timestamp()
+            digest = self.artifact_store.put(data)
+            url, expires = self.artifact_store.signed_url(digest)
+        except Exception as e:
+            logger.error(f'Failed to store SOP artifact, sending content inline: {str(e)}')
+            return {'content': content}
+
+        fields = {
+            'content': None,
+            'content_ref': {
+                'url': url,
+                'sha256': digest,
+                'size': len(data),
+                'expires_at': datetime.utcfromtimestamp(expires).isoformat() + 'Z'
             }
+        }
+
+        if len(data) <= self.inline_max_bytes:
+            fields['content_gzip'] = base64.b64encode(gzip.compress(data, mtime=0)).decode('ascii')
+
+        return fields
+
+    def _deliver(self, call_id, payload, deadline=None):
+        """Queue the event in the outbox if configured, otherwise post it now"""
+        if self.outbox is not None:
+            try:
+                outbox_id = self.outbox.enqueue(call_id, payload)
+                return {'success': True, 'queued': True, 'outbox_id': outbox_id}
 
+            except Exception as e:
+                # Fall back to posting inline rather than losing the event
+                logger.error(f"Failed to queue Lindy event {payload['event']}: {str(e)}")
+
+        return self.send_payload(payload, deadline=deadline)
+
+    def send_payload(self, payload, deadline=None):
+        """
+        Post an event payload to the Lindy webhook
+
+        Args:
+            payload (dict): Event payload
+            deadline (Deadline): Optional request budget
+
+        Returns:
+            dict: Result with success, status_code and Lindy's response
+        """
+        try:
             headers = {'Content-Type': 'application/json'}
             if self.webhook_secret:
                 headers['X-Webhook-Secret'] = self.webhook_secret
 
-            response = requests.post(
+            response = self.http.post(
                 self.webhook_url,
                 json=payload,
                 headers=headers,
-                timeout=30
+                deadline=deadline
             )
 
             response.raise_for_status()
-            return {'success': True, 'status_code': response.status_code}
+
+            logger.info(f"Successfully notified Lindy ({payload['event']}): {response.status_code}")
+
+            try:
+                body = response.json() if response.text else None
+            except ValueError:
+                # Lindy accepted the event but didn't reply with JSON
+                body = None
+
+            return {
+                'success': True,
+                'status_code': response.status_code,
+                'response': body
+            }
 
         except requests.exceptions.RequestException as e:
-            logger.error(f'Failed to send custom event to Lindy: {str(e)}')
-            return {'success': False, 'error': str(e)}
+            logger.error(f"Failed to notify Lindy ({payload['event']}): {str(e)}")
+            status_code = e.response.status_code if e.response is not None else None
+            return {'success': False, 'status_code': status_code, 'error': str(e)}
 
     def _get_timestamp(self):
         """Get current timestamp in ISO format"""
-        from datetime import datetime
         return datetime.utcnow().isoformat() + 'Z'
+
+
+class LindyOutbox:
+    """
+    Durable outbox for Lindy events
+
+    The request path stores each event with a single insert. dispatch() -
+    run periodically by a Celery beat task - drains the outbox in batches,
+    retrying failures with exponential backoff. Events for the same call are
+    delivered in order: a call's later events wait until its earlier ones
+    are sent or given up on.
+    """
+
+    def __init__(self, database, batch_size=50, max_attempts=8, backoff_base=5,
+                 backoff_max=900, lock_timeout=120):
+        """
+        Initialize outbox
+
+        Args:
+            database (Database): Database holding the outbox table
+            batch_size (int): Events fetched per dispatch
+            max_attempts (int): Attempts before an event is marked failed
+            backoff_base (float): Seconds before the first retry, doubled per attempt
+            backoff_max (float): Longest delay between retries
+            lock_timeout (float): Seconds a dispatcher holds an event it is sending
+        """
+        self.database = database
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lock_timeout = lock_timeout
+
+    def enqueue(self, call_id, payload):
+        """Store an event for delivery and return its outbox ID"""
+        from models import enqueue_lindy_event
+
+        session = self.database.get_session()
+        try:
+            return enqueue_lindy_event(session, call_id, payload['event'], payload).id
+        finally:
+            session.close()
+
+    def dispatch(self, lindy_service):
+        """
+        Deliver due events
+
+        Args:
+            lindy_service (LindyService): Service used to post events
+
+        Returns:
+            dict: Counts of sent, retried and failed events
+        """
+        from datetime import datetime, timedelta
+        from sqlalchemy import and_, exists, or_
+        from sqlalchemy.orm import aliased
+        from models import LindyOutboxEvent, claim_lindy_event
+
+        counts = {'sent': 0, 'retried': 0, 'failed': 0}
+        session = self.database.get_session()
+
+        try:
+            now = datetime.utcnow()
+            earlier = aliased(LindyOutboxEvent)
+
+            # Only events that are due, unclaimed and first in line for their
+            # call, so events backing off never crowd newer calls out of the
+            # batch and a call's later events wait for its earlier ones
+            events = session.query(LindyOutboxEvent).filter(
+                LindyOutboxEvent.status == 'pending',
+                or_(LindyOutboxEvent.next_attempt_at.is_(None), LindyOutboxEvent.next_attempt_at <= now),
+                or_(LindyOutboxEvent.locked_until.is_(None), LindyOutboxEvent.locked_until <= now),
+                ~exists().where(and_(
+                    earlier.call_id == LindyOutboxEvent.call_id,
+                    earlier.status == 'pending',
+                    earlier.id < LindyOutboxEvent.id
+                ))
+            ).order_by(LindyOutboxEvent.id).limit(self.batch_size).all()
+
+            for event in events:
+                now = datetime.utcnow()
+                if not claim_lindy_event(session, event, now + timedelta(seconds=self.lock_timeout)):
+                    continue
+
+                result = lindy_service.send_payload(event.payload)
+                event.attempts = (event.attempts or 0) + 1
+                event.locked_until = None
+
+                if result['success']:
+                    event.status = 'sent'
+                    event.sent_at = datetime.utcnow()
+                    counts['sent'] += 1
+                elif self._is_permanent(result) or event.attempts >= self.max_attempts:
+                    event.status = 'failed'
+                    event.last_error = result.get('error')
+                    counts['failed'] += 1
+                    logger.error(f'Giving up on Lindy event {event.id} after {event.attempts} attempts')
+                else:
+                    delay = min(self.backoff_base * 2 ** (event.attempts - 1), self.backoff_max)
+                    event.next_attempt_at = now + timedelta(seconds=delay)
+                    event.last_error = result.get('error')
+                    counts['retried'] += 1
+
+                session.commit()
+
+            if any(counts.values()):
+                logger.info(f'Dispatched Lindy outbox: {counts}')
+            return counts
+
+        finally:
+            session.close()
+
+    def _is_permanent(self, result):
+        """Client errors other than timeouts and rate limits won't succeed on retry"""
+        status_code = result.get('status_code')
+        return status_code is not None and 400 <= status_code < 500 and status_code not in (408, 429)
@@ -0,0 +1,379 @@
+import re
+
+HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+LIST_ITEM_PATTERN = re.compile(r'^(\s*)([-*+]|\d+[.)])\s+(.*)$')
+RULE_PATTERN = re.compile(r'^(?:-{3,}|\*{3,}|_{3,})$')
+QUOTE_PATTERN = re.compile(r'^>\s?(.*)$')
+
+# Inline markup, longest markers first so ** wins over *
+INLINE_PATTERN = re.compile(
+    r'\*\*(?P<bold>.+?)\*\*'
+    r'|__(?P<bold_alt>.+?)__'
+    r'|(?<![\w*])\*(?!\s)(?P<italic>.+?)(?<!\s)\*(?![\w*])'
+    r'|(?<![\w_])_(?!\s)(?P<italic_alt>.+?)(?<!\s)_(?![\w_])'
+    r'|`(?P<code>[^`]+)`'
+    r'|\[(?P<link_text>[^\]]+)\]\((?P<link_url>[^)\s]+)\)'
+)
+
+CODE_FONT = {'weightedFontFamily': {'fontFamily': 'Roboto Mono'}}
+
+INLINE_STYLES = {
+    'bold': ({'bold': True}, 'bold'),
+    'bold_alt': ({'bold': True}, 'bold'),
+    'italic': ({'italic': True}, 'italic'),
+    'italic_alt': ({'italic': True}, 'italic'),
+    'code': (CODE_FONT, 'weightedFontFamily')
+}
+
+# Soft line break within a paragraph, used for list item continuation lines
+LINE_BREAK = '\u000b'
+
+BULLET_PRESETS = {
+    'unordered': 'BULLET_DISC_CIRCLE_SQUARE',
+    'ordered': 'NUMBERED_DECIMAL_ALPHA_ROMAN'
+}
+
+
+def utf16_len(text):
+    """Length of text in UTF-16 code units, the unit of Google Docs indices"""
+    if text.isascii():
+        return len(text)
+    return len(text.encode('utf-16-le')) // 2
+
+
+class MarkdownRenderer:
+    """
+    Render markdown as a single Google Docs batchUpdate
+
+    The markdown is parsed in one pass that builds the plain document text
+    and, alongside it, the UTF-16 ranges of headings, list runs and inline
+    bold/italic/code/link spans. The result is one insertText followed by
+    the style requests, so a formatted SOP takes a single API round trip.
+
+    Supports ATX headings, unordered and ordered lists (nested by two-space
+    indents), fenced code blocks, block quotes and horizontal rules. Lines
+    indented at least as deep as a list item's text continue that item on
+    a new line, so "1. **Step**\n   details" stays one numbered list.
+    """
+
+    def __init__(self, start_index=1):
+        """
+        Args:
+            start_index (int): Document index the text is inserted at
+        """
+        self.start_index = start_index
+
+    def render(self, markdown):
+        """
+        Build batchUpdate requests for markdown content
+
+        Args:
+            markdown (str): Markdown content
+
+        Returns:
+            list: Google Docs API requests (empty for empty content)
+        """
+        self.parse(markdown)
+        return self.requests()
+
+    def parse(self, markdown):
+        """
+        Parse markdown into document text, paragraphs and style ranges
+
+        After parsing, self.paragraphs holds one dict per paragraph with its
+        UTF-16 'start' and 'end', character offsets into self.text, its
+        named 'style' and its list nesting 'level' (None outside lists).
+        """
+        self._parts = []
+        self._offset = self.start_index
+        self._chars = 0
+        self.paragraphs = []
+        self._paragraph_styles = []
+        self._text_styles = []
+        self._bullets = []
+
+        list_run = None     # [start, end, preset] of the current list
+        item_column = None  # Indent of the current list item's text
+        in_code = False
+        blank_pending = False
+
+        for raw_line in markdown.splitlines():
+            line = raw_line.rstrip()
+            stripped = line.strip()
+
+            if stripped.startswith('```'):
+                if blank_pending and not in_code and self._parts:
+                    self._end_paragraph(self._offset)
+                blank_pending = False
+                in_code = not in_code
+                list_run = None
+                continue
+
+            if in_code:
+                start = self._offset
+                self._append(line)
+                if line:
+                    self._text_styles.append((start, self._offset, *INLINE_STYLES['code']))
+                self._end_paragraph(start)
+                continue
+
+            if not stripped:
+                blank_pending = True
+                continue
+
+            if RULE_PATTERN.match(stripped):
+                list_run = None
+                blank_pending = False
+                continue
+
+            item = LIST_ITEM_PATTERN.match(line)
+            continuation = (
+                not item and list_run is not None and _indent_width(line) >= item_column
+            )
+
+            # Blank lines between list items are cosmetic in markdown; keeping
+            # them would split the list and restart its numbering
+            if blank_pending and self._parts and not ((item or continuation) and list_run):
+                self._end_paragraph(self._offset)
+                list_run = None
+            blank_pending = False
+
+            start = self._offset
+
+            if continuation:
+                # Another line of the last item, not a paragraph of its own,
+                # which would break the list
+                paragraph = self._reopen_paragraph()
+                self._append(LINE_BREAK)
+                self._append_inline(stripped)
+                self._end_paragraph(paragraph['start'], level=paragraph['level'])
+                list_run[1] = self._offset
+                continue
+
+            if item:
+                indent, marker, content = item.groups()
+                kind = 'unordered' if marker in '-*+' else 'ordered'
+                item_column = len(line[:item.start(3)].expandtabs(4))
+
+                # Leading tabs set the nesting level; Docs removes them when
+                # the bullets are created
+                level = len(indent.expandtabs(4)) // 2
+                self._append('\t' * level)
+                self._append_inline(content)
+                self._end_paragraph(start, level=level)
+
+                if list_run is None:
+                    list_run = [start, self._offset, BULLET_PRESETS[kind]]
+                    self._bullets.append(list_run)
+                else:
+                    list_run[1] = self._offset
+                continue
+
+            list_run = None
+            heading = HEADING_PATTERN.match(line)
+
+            if heading:
+                level, content = heading.groups()
+                self._append_inline(content)
+                self._end_paragraph(start, style=f'HEADING_{len(level)}')
+                continue
+
+            quote = QUOTE_PATTERN.match(stripped)
+            self._append_inline(quote.group(1) if quote else stripped)
+            self._end_paragraph(start)
+
+        self.text = ''.join(self._parts)
+        return self
+
+    def requests(self, first=0, last=None, index=None, reset=False):
+        """
+        Build requests for a run of parsed paragraphs
+
+        Args:
+            first (int): Index of the first paragraph
+            last (int): Index after the last paragraph (default: all)
+            index (int): Document index to insert at (default: where the
+                paragraphs were parsed)
+            reset (bool): Clear paragraph and text styles the inserted text
+                inherits from its surroundings, for inserts into existing text
+
+        Returns:
+            list: Google Docs API requests (empty if there are no paragraphs)
+        """
+        last = len(self.paragraphs) if last is None else last
+        if first >= last:
+            return []
+
+        low = self.paragraphs[first]['start']
+        high = self.paragraphs[last - 1]['end']
+        shift = (low if index is None else index) - low
+        text = self.text[self.paragraphs[first]['char_start']:self.paragraphs[last - 1]['char_end']]
+
+        def clip(start, end):
+            start, end = max(start, low), min(end, high)
+            if start >= end:
+                return None
+            return {'startIndex': start + shift, 'endIndex': end + shift}
+
+        requests = [{
+            'insertText': {
+                'location': {'index': low + shift},
+                'text': text
+            }
+        }]
+
+        if reset:
+            whole = clip(low, high)
+            requests.extend([
+                {'updateParagraphStyle': {
+                    'range': whole,
+                    'paragraphStyle': {'namedStyleType': 'NORMAL_TEXT'},
+                    'fields': 'namedStyleType'
+                }},
+                {'deleteParagraphBullets': {'range': whole}},
+                {'updateTextStyle': {
+                    'range': whole,
+                    'textStyle': {},
+                    'fields': 'bold,italic,link,weightedFontFamily'
+                }}
+            ])
+
+        for start, end, style in self._paragraph_styles:
+            range_ = clip(start, end)
+            if range_:
+                requests.append({
+                    'updateParagraphStyle': {
+                        'range': range_,
+                        'paragraphStyle': {'namedStyleType': style},
+                        'fields': 'namedStyleType'
+                    }
+                })
+
+        for start, end, style, fields in self._text_styles:
+            range_ = clip(start, end)
+            if range_:
+                requests.append({
+                    'updateTextStyle': {
+                        'range': range_,
+                        'textStyle': style,
+                        'fields': fields
+                    }
+                })
+
+        # Creating bullets strips the nesting tabs and shifts later text, so
+        # lists go last and from the end of the document backwards
+        for start, end, preset in reversed(self._bullets):
+            range_ = clip(start, end)
+            if range_:
+                requests.append({
+                    'createParagraphBullets': {
+                        'range': range_,
+                        'bulletPreset': preset
+                    }
+                })
+
+        return requests
+
+    def paragraph_signature(self, number):
+        """
+        Comparable description of a parsed paragraph
+
+        Matches GoogleDocsService's signature of the same paragraph in a
+        document: its text (without nesting tabs), named style, list level
+        and inline style spans relative to the paragraph start.
+        """
+        paragraph = self.paragraphs[number]
+        text = self.text[paragraph['char_start']:paragraph['char_end'] - 1]
+        tabs = paragraph['level'] or 0
+        origin = paragraph['start'] + tabs
+
+        spans = []
+        for start, end, style, fields in self._text_styles:
+            if start >= paragraph['start'] and end <= paragraph['end']:
+                spans.append((start - origin, end - origin, fields, _style_value(style, fields)))
+
+        return (text[tabs:], paragraph['style'], paragraph['level'], merge_spans(spans))
+
+    def _end_paragraph(self, start, style='NORMAL_TEXT', level=None):
+        """Close the current paragraph and record where it lies"""
+        char_start = self.paragraphs[-1]['char_end'] if self.paragraphs else 0
+        self._append('\n')
+        self.paragraphs.append({
+            'start': start,
+            'end': self._offset,
+            'char_start': char_start,
+            'char_end': self._chars,
+            'style': style,
+            'level': level
+        })
+        if style != 'NORMAL_TEXT':
+            self._paragraph_styles.append((start, self._offset, style))
+
+    def _reopen_paragraph(self):
+        """Remove the last paragraph's closing newline so it can be extended"""
+        paragraph = self.paragraphs.pop()
+        self._parts.pop()
+        self._offset -= 1
+        self._chars -= 1
+        return paragraph
+
+    def _append(self, text):
+        """Add text to the document and advance the UTF-16 offset"""
+        if text:
+            self._parts.append(text)
+            self._offset += utf16_len(text)
+            self._chars += len(text)
+
+    def _append_inline(self, text):
+        """Add a line of text, recording the ranges of its inline markup"""
+        position = 0
+
+        for match in INLINE_PATTERN.finditer(text):
+            self._append(text[position:match.start()])
+            position = match.end()
+
+            group = match.lastgroup
+            if group == 'link_url':
+                content = match.group('link_text')
+                style, fields = {'link': {'url': match.group('link_url')}}, 'link'
+            else:
+                content = match.group(group)
+                style, fields = INLINE_STYLES[group]
+
+            start = self._offset
+            self._append(content)
+            self._text_styles.append((start, self._offset, style, fields))
+
+        self._append(text[position:])
+
+
+def _indent_width(line):
+    """Columns of leading whitespace, with tabs expanded to 4"""
+    expanded = line.expandtabs(4)
+    return len(expanded) - len(expanded.lstrip())
+
+
+def _style_value(style, fields):
+    """The value a text style sets for its field, for comparing spans"""
+    if fields == 'link':
+        return style['link'].get('url')
+    if fields == 'weightedFontFamily':
+        return style['weightedFontFamily'].get('fontFamily')
+    return style.get(fields)
+
+
+def merge_spans(spans):
+    """Sort (start, end, field, value) spans and join touching equal ones"""
+    merged = []
+    for span in sorted(spans, key=lambda s: (s[2], str(s[3]), s[0])):
+        previous = merged[-1] if merged else None
+        if previous and previous[2:] == span[2:] and previous[1] == span[0]:
+            merged[-1] = (previous[0], span[1]) + span[2:]
+        else:
+            merged.append(span)
+    return tuple(sorted(merged, key=lambda s: (s[0], s[2])))
+
+
+def markdown_to_requests(markdown, start_index=1):
+    """Build Google Docs batchUpdate requests for markdown content"""
+    return MarkdownRenderer(start_index).render(markdown)
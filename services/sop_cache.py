@@ -0,0 +1,55 @@
+import hashlib
+import json
+
+from services.cache import TTLCache
+
+
+class SOPCache(TTLCache):
+    """
+    Content-addressed cache for generated SOPs
+
+    Keys are a hash of everything that affects the generated SOP, so
+    resubmitted transcripts return the stored SOP instead of calling GPT-4.
+    """
+
+    def __init__(self, max_size=128, ttl=86400, redis_url=None, key_prefix='voice_sop:sop:'):
+        """
+        Initialize SOP cache
+
+        Args:
+            max_size (int): Maximum number of entries in the in-process tier
+            ttl (int): Seconds before a cached SOP expires
+            redis_url (str): Optional Redis URL for the shared tier
+            key_prefix (str): Prefix for Redis keys
+        """
+        super().__init__(max_size=max_size, ttl=ttl, redis_url=redis_url, key_prefix=key_prefix)
+
+    @classmethod
+    def from_config(cls, config):
+        """Build cache from application config"""
+        return cls(
+            max_size=config.SOP_CACHE_SIZE,
+            ttl=config.SOP_CACHE_TTL,
+            redis_url=config.REDIS_URL if config.SOP_CACHE_REDIS else None
+        )
+
+    @staticmethod
+    def make_key(transcript, context, model, system_prompt, temperature, compaction_level=None,
+                 max_transcript_tokens=None, draft=None):
+        """
+        Build a cache key from everything that affects the generated SOP
+
+        This includes the transcript preparation settings and any speculative
+        draft the SOP was finished from. The transcript is normalized so
+        whitespace-only differences between resubmissions of the same call
+        still hit the cache.
+        """
+        normalized = '\n'.join(
+            ' '.join(line.split()) for line in transcript.splitlines() if line.strip()
+        )
+        material = json.dumps(
+            [normalized, context, model, system_prompt, temperature, compaction_level,
+             max_transcript_tokens, draft],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(material.encode()).hexdigest()
@@ -1,24 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
 import logging
 import json
 
+from utils import DeadlineExceeded, chunk_transcript, compact_transcript, estimate_tokens
+
 logger = logging.getLogger(__name__)
 
 
 class SOPGenerator:
     """Service for generating SOPs using GPT-4"""
 
-    def __init__(self, api_key):
+    # Fact categories extracted from each chunk of a long transcript
+    FACT_FIELDS = [
+        'process', 'steps', 'tools', 'safety', 'outcomes', 'issues', 'roles', 'other'
+    ]
+
+    # Heads a condensed transcript that had to be cut to fit
+    TRUNCATED_NOTE = '(Truncated to fit: parts of each section below are omitted)\n\n'
+
+    def __init__(self, api_key, cache=None, max_transcript_tokens=12000, chunk_workers=4,
+                 compaction_level=1):
+        """
+        Initialize SOP generator
+
+        Args:
+            api_key (str): OpenAI API key
+            cache (SOPCache): Optional cache for generated SOPs
+            max_transcript_tokens (int): Transcripts above this size are
+                condensed chunk by chunk before the SOP is generated
+            chunk_workers (int): Concurrent fact extraction requests
+            compaction_level (int): Transcript compaction level (0-3, see
+                utils.compact_transcript)
+        """
         self.client = OpenAI(api_key=api_key)
         self.model = "gpt-4-turbo-preview"
+        self.temperature = 0.7
+        self.cache = cache
+        self.max_transcript_tokens = max_transcript_tokens
+        self.chunk_workers = chunk_workers
+        self.compaction_level = compaction_level
 
-    def generate_sop(self, transcript, customer_info=None):
+    def generate_sop(self, transcript, customer_info=None, draft=None, deadline=None):
         """
         Generate a comprehensive SOP from a conversation transcript
 
         Args:
             transcript (str): The conversation transcript
             customer_info (dict): Optional customer information
+            draft (str): Optional sections pre-generated while the call was
+                running (see generate_draft) - only the rest is generated
+            deadline (Deadline): Optional request budget used as the OpenAI timeout
 
         Returns:
             str: Formatted SOP content
@@ -31,21 +63,42 @@ class SOPGenerator:
 
             # Create the prompt
             system_prompt = self._get_system_prompt()
-            user_prompt = self._build_user_prompt(transcript, context)
+
+            # Resubmitted transcripts return the previously generated SOP
+            cache_key = None
+            if self.cache is not None:
+                cache_key = self._cache_key(transcript, context, system_prompt, draft)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    logger.info('Returning cached SOP')
+                    return cached
+
+            transcript = self._prepare_transcript(transcript, deadline)
+
+            if draft:
+                user_prompt = self._build_finalize_prompt(transcript, context, draft)
+            else:
+                user_prompt = self._build_user_prompt(transcript, context)
 
             # Call GPT-4
-            response = self.client.chat.completions.create(
+            response = self._client(deadline).chat.completions.create(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                temperature=0.7,
+                temperature=self.temperature,
                 max_tokens=4000
             )
 
             sop_content = response.choices[0].message.content
 
+            if draft and sop_content:
+                sop_content = f"{draft.rstrip()}\n\n{sop_content.lstrip()}"
+
+            if cache_key is not None and sop_content:
+                self.cache.set(cache_key, sop_content)
+
             logger.info('Successfully generated SOP')
             return sop_content
 
@@ -56,6 +109,298 @@ class SOPGenerator:
             logger.error(f'Full traceback: {error_details}')
             raise Exception(f'SOP Generation Error: {str(e)}')
 
+    def generate_draft(self, transcript, customer_info=None):
+        """
+        Pre-generate the opening SOP sections from a partial transcript
+
+        Called while the call is still running so that only the remaining
+        sections need generating once the call ends.
+
+        Args:
+            transcript (str): The transcript so far
+            customer_info (dict): Optional customer information
+
+        Returns:
+            str: Markdown for the title, overview and prerequisites sections
+        """
+        try:
+            logger.info('Generating draft SOP sections from partial transcript')
+
+            context = self._build_context(customer_info)
+            transcript = self._prepare_transcript(transcript)
+
+            prompt = "The following conversation is still in progress.\n\n"
+            if context:
+                prompt += f"CONTEXT:\n{context}\n\n"
+            prompt += f"CONVERSATION TRANSCRIPT SO FAR:\n{transcript}\n\n"
+            prompt += (
+                "Write ONLY these opening sections of the SOP in markdown:\n"
+                "- Title (# heading)\n"
+                "- Overview/Purpose\n"
+                "- Prerequisites/Requirements (tools, materials, software)\n\n"
+                "Do not write any other sections."
+            )
+
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": self._get_system_prompt()},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=self.temperature,
+                max_tokens=1500
+            )
+
+            return response.choices[0].message.content
+
+        except Exception as e:
+            logger.error(f'Failed to generate draft SOP: {str(e)}')
+            raise Exception(f'SOP Draft Error: {str(e)}')
+
+    def generate_sop_stream(self, transcript, customer_info=None, draft=None, deadline=None):
+        """
+        Generate an SOP, yielding content as it streams back from GPT-4
+
+        Args:
+            transcript (str): The conversation transcript
+            customer_info (dict): Optional customer information
+            draft (str): Optional pre-generated sections (see generate_sop),
+                yielded first
+            deadline (Deadline): Optional budget for the whole stream
+
+        Yields:
+            str: SOP content chunks, which join to what generate_sop returns
+        """
+        try:
+            logger.info('Streaming SOP from transcript')
+
+            context = self._build_context(customer_info)
+            system_prompt = self._get_system_prompt()
+
+            cache_key = None
+            if self.cache is not None:
+                cache_key = self._cache_key(transcript, context, system_prompt, draft)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    logger.info('Returning cached SOP')
+                    yield cached
+                    return
+
+            transcript = self._prepare_transcript(transcript, deadline)
+
+            if draft:
+                user_prompt = self._build_finalize_prompt(transcript, context, draft)
+            else:
+                user_prompt = self._build_user_prompt(transcript, context)
+
+            stream = self._client(deadline).chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=self.temperature,
+                max_tokens=4000,
+                stream=True
+            )
+
+            parts = []
+            if draft:
+                parts.append(f"{draft.rstrip()}\n\n")
+                yield parts[0]
+
+            for chunk in stream:
+                if deadline is not None:
+                    deadline.check()
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if draft and len(parts) == 1 and delta:
+                    # Joined to the draft as generate_sop does
+                    delta = delta.lstrip()
+                if delta:
+                    parts.append(delta)
+                    yield delta
+
+            sop_content = ''.join(parts)
+
+            if cache_key is not None and sop_content:
+                self.cache.set(cache_key, sop_content)
+
+            logger.info('Successfully streamed SOP')
+
+        except Exception as e:
+            logger.error(f'Failed to stream SOP: {str(e)}')
+            raise Exception(f'SOP Generation Error: {str(e)}')
+
+    def _cache_key(self, transcript, context, system_prompt, draft=None):
+        """Cache key for an SOP generated with this generator's settings"""
+        return self.cache.make_key(
+            transcript, context, self.model, system_prompt, self.temperature,
+            compaction_level=self.compaction_level,
+            max_transcript_tokens=self.max_transcript_tokens,
+            draft=draft
+        )
+
+    def _prepare_transcript(self, transcript, deadline=None):
+        """Compact the transcript, then condense it if still too long"""
+        if self.compaction_level > 0:
+            transcript, stats = compact_transcript(transcript, self.compaction_level)
+            logger.info(
+                f"Compacted transcript from {stats['tokens_before']} to {stats['tokens_after']} tokens",
+                extra=stats
+            )
+
+        return self._condense_transcript(transcript, deadline)
+
+    def _condense_transcript(self, transcript, deadline=None, rounds=2):
+        """
+        Condense a transcript too long for a single request into extracted facts
+
+        The transcript is split on speaker turns and facts are extracted from
+        each chunk concurrently, so latency follows the slowest chunk rather
+        than the total length. Short transcripts are returned unchanged.
+        Facts still too long are condensed again, up to rounds times, and
+        then truncated (see _truncate_chunks).
+        """
+        if estimate_tokens(transcript) <= self.max_transcript_tokens:
+            return transcript
+
+        chunk_tokens = max(self.max_transcript_tokens // 2, 1000)
+        chunks = chunk_transcript(transcript, chunk_tokens)
+
+        if rounds == 0:
+            logger.warning(f'Condensed transcript still too long, truncating its {len(chunks)} chunks')
+            return self._truncate_chunks(chunks)
+
+        logger.info(f'Long transcript: extracting facts from {len(chunks)} chunks')
+
+        with ThreadPoolExecutor(max_workers=min(self.chunk_workers, len(chunks))) as executor:
+            results = list(executor.map(
+                lambda args: self._extract_facts(*args, deadline=deadline),
+                [(chunk, i + 1, len(chunks)) for i, chunk in enumerate(chunks)]
+            ))
+
+        failed = sum(1 for _, extracted in results if not extracted)
+        if failed:
+            logger.warning(f'Partial fact extraction: kept raw text for {failed} of {len(chunks)} chunks')
+
+        # Raw chunks or a very long call can leave the facts too long too
+        return self._condense_transcript(
+            self._merge_facts([facts for facts, _ in results]), deadline, rounds - 1
+        )
+
+    def _truncate_chunks(self, chunks):
+        """
+        Cut chunks to fit max_transcript_tokens between them
+
+        Each chunk keeps as much of its head and tail as fits its share of the
+        limit, so no part of the call is dropped entirely, and each cut is
+        marked so the model knows the text is incomplete.
+        """
+        marker = '[... truncated ...]'
+        budget = self.max_transcript_tokens * 4 - len(self.TRUNCATED_NOTE)
+        share = budget // len(chunks) - len(marker) - 4
+
+        kept = []
+        for chunk in chunks:
+            if len(chunk) <= share:
+                kept.append(chunk)
+                continue
+
+            head = chunk[:max(share // 2, 0)]
+            tail = chunk[len(chunk) - max(share - len(head), 0):]
+            kept.append('\n'.join(part for part in (head, marker, tail) if part))
+
+        return self.TRUNCATED_NOTE + '\n\n'.join(kept)
+
+    def _extract_facts(self, chunk, part, total, deadline=None):
+        """
+        Extract structured SOP facts from one chunk of a transcript
+
+        A failed request is retried once; if that fails too, the chunk's raw
+        text is kept under 'other' so one bad chunk doesn't fail the SOP.
+
+        Returns:
+            tuple: (facts, extracted) - extracted is False for raw text
+        """
+        for attempt in (1, 2):
+            try:
+                return self._request_facts(chunk, part, total, deadline), True
+            except DeadlineExceeded:
+                break
+            except Exception as e:
+                logger.warning(f'Fact extraction failed for chunk {part} (attempt {attempt}): {str(e)}')
+
+        return {'other': [chunk]}, False
+
+    def _request_facts(self, chunk, part, total, deadline=None):
+        """Ask the model for one chunk's facts"""
+        prompt = f"""This is part {part} of {total} of a conversation about a business process.
+
+{chunk}
+
+Extract every detail relevant to a Standard Operating Procedure as a JSON object
+with these keys, each a list of short strings in the order they were mentioned:
+{', '.join(self.FACT_FIELDS)}
+Use "steps" for procedure steps and "other" for anything that doesn't fit elsewhere."""
+
+        response = self._client(deadline).chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": "You extract facts from conversation transcripts."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0,
+            max_tokens=1500,
+            response_format={"type": "json_object"}
+        )
+
+        content = response.choices[0].message.content
+        try:
+            facts = json.loads(content)
+            if isinstance(facts, dict):
+                return facts
+        except ValueError:
+            pass
+
+        logger.warning(f'Could not parse facts for chunk {part}, keeping raw text')
+        return {'other': [content]}
+
+    def _client(self, deadline):
+        """
+        OpenAI client for a request budget
+
+        The SDK retries timed-out requests, which would let one call run
+        several times the remaining budget, so budgeted calls don't retry.
+        """
+        if deadline is None:
+            return self.client
+        return self.client.with_options(timeout=deadline.timeout(), max_retries=0)
+
+    def _merge_facts(self, results):
+        """Merge per-chunk facts in order, dropping exact duplicates"""
+        lines = ['(Facts extracted in order from a long conversation)']
+
+        for field in self.FACT_FIELDS:
+            seen = set()
+            items = []
+            for facts in results:
+                values = facts.get(field) or []
+                if isinstance(values, str):
+                    values = [values]
+                for value in values:
+                    value = str(value).strip()
+                    if value and value.lower() not in seen:
+                        seen.add(value.lower())
+                        items.append(value)
+
+            if items:
+                lines.append(f"\n{field.upper()}:")
+                lines.extend(f"- {item}" for item in items)
+
+        return "\n".join(lines)
+
     def _get_system_prompt(self):
         """Get the system prompt for SOP generation"""
         return """You are an expert in creating professional Standard Operating Procedures (SOPs).
@@ -109,6 +454,25 @@ Be thorough but concise. Focus on actionable steps."""
 
         return prompt
 
+    def _build_finalize_prompt(self, transcript, context, draft):
+        """Build the user prompt that completes a pre-generated draft"""
+        prompt = "An SOP is being created from the following conversation.\n\n"
+
+        if context:
+            prompt += f"CONTEXT:\n{context}\n\n"
+
+        prompt += f"CONVERSATION TRANSCRIPT:\n{transcript}\n\n"
+        prompt += f"SECTIONS ALREADY WRITTEN:\n{draft}\n\n"
+        prompt += (
+            "Continue the SOP from where these sections end. Do not repeat them. "
+            "Write the remaining sections in markdown: step-by-step procedures, "
+            "quality standards/expected outcomes, troubleshooting and revision history. "
+            "If the transcript adds requirements missing from the sections already "
+            "written, list them under an 'Additional Requirements' section first."
+        )
+
+        return prompt
+
     def generate_sop_structured(self, data):
         """
         Generate SOP from structured data (not transcript)
@@ -149,7 +513,7 @@ Format this as a professional markdown SOP document with proper sections."""
                     {"role": "system", "content": self._get_system_prompt()},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.7,
+                temperature=self.temperature,
                 max_tokens=3000
             )
 
@@ -200,7 +564,7 @@ Maintain the professional format and structure while incorporating the feedback.
                     {"role": "system", "content": self._get_system_prompt()},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.7,
+                temperature=self.temperature,
                 max_tokens=4000
             )
 
@@ -1,14 +1,17 @@
 import requests
 import logging
 
+from services.http_client import get_http_client
+
 logger = logging.getLogger(__name__)
 
 
 class VAPIService:
     """Service for interacting with VAPI API"""
 
-    def __init__(self, api_key):
+    def __init__(self, api_key, http_client=None):
         self.api_key = api_key
+        self.http = http_client or get_http_client()
         self.base_url = 'https://api.vapi.ai'
         self.headers = {
             'Authorization': f'Bearer {api_key}',
@@ -33,11 +36,10 @@ class VAPIService:
         try:
             logger.info(f'Creating VAPI assistant: {config.get("name")}')
 
-            response = requests.post(
+            response = self.http.post(
                 f'{self.base_url}/assistant',
                 headers=self.headers,
-                json=config,
-                timeout=30
+                json=config
             )
 
             response.raise_for_status()
@@ -53,10 +55,9 @@ class VAPIService:
     def get_assistant(self, assistant_id):
         """Get assistant by ID"""
         try:
-            response = requests.get(
+            response = self.http.get(
                 f'{self.base_url}/assistant/{assistant_id}',
-                headers=self.headers,
-                timeout=30
+                headers=self.headers
             )
             response.raise_for_status()
             return response.json()
@@ -68,11 +69,10 @@ class VAPIService:
     def update_assistant(self, assistant_id, config):
         """Update an existing assistant"""
         try:
-            response = requests.patch(
+            response = self.http.patch(
                 f'{self.base_url}/assistant/{assistant_id}',
                 headers=self.headers,
-                json=config,
-                timeout=30
+                json=config
             )
             response.raise_for_status()
             return response.json()
@@ -84,10 +84,9 @@ class VAPIService:
     def delete_assistant(self, assistant_id):
         """Delete an assistant"""
         try:
-            response = requests.delete(
+            response = self.http.delete(
                 f'{self.base_url}/assistant/{assistant_id}',
-                headers=self.headers,
-                timeout=30
+                headers=self.headers
             )
             response.raise_for_status()
             return {'success': True, 'message': f'Assistant {assistant_id} deleted'}
@@ -99,10 +98,9 @@ class VAPIService:
     def list_assistants(self):
         """List all assistants"""
         try:
-            response = requests.get(
+            response = self.http.get(
                 f'{self.base_url}/assistant',
-                headers=self.headers,
-                timeout=30
+                headers=self.headers
             )
             response.raise_for_status()
             return response.json()
@@ -114,10 +112,9 @@ class VAPIService:
     def get_call_details(self, call_id):
         """Get details of a specific call"""
         try:
-            response = requests.get(
+            response = self.http.get(
                 f'{self.base_url}/call/{call_id}',
-                headers=self.headers,
-                timeout=30
+                headers=self.headers
             )
             response.raise_for_status()
             return response.json()
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the app's top-level modules (models, pipeline, services...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.py builds its OpenAI client at import
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+
+@pytest.fixture
+def web_app(tmp_path, monkeypatch):
+    """The Flask app module, on a fresh SQLite database with Lindy disabled"""
+    import app as web_app
+    from models import Database
+    from services.artifact_store import DatabaseArtifactStore
+
+    database = Database(f"sqlite:///{tmp_path / 'app.db'}")
+    database.create_tables()
+    monkeypatch.setattr(web_app, 'db', database)
+    monkeypatch.setattr(web_app, 'blob_store', DatabaseArtifactStore(database, signing_key='test'))
+    monkeypatch.setattr(web_app, 'lindy_service', None)
+    web_app.app.config['TESTING'] = True
+    return web_app
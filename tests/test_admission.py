@@ -0,0 +1,176 @@
+import pytest
+
+import celery_tasks
+from models import Database, claim_conversation, get_conversation, spill_conversation
+from services.admission import AdmissionController
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def llen(self, queue):
+        self.commands.append(self.redis.lengths.get(queue, 0))
+
+    def hlen(self, key):
+        self.commands.append(self.redis.unacked if key == 'unacked' else 0)
+
+    def execute(self):
+        self.redis.round_trips += 1
+        if self.redis.down:
+            raise ConnectionError('Redis is down')
+        return self.commands
+
+
+class FakeRedis:
+    def __init__(self, lengths, unacked=0):
+        self.lengths = lengths
+        self.unacked = unacked
+        self.round_trips = 0
+        self.down = False
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+def watched(lengths, **kwargs):
+    controller = AdmissionController(queues=('celery', 'llm'), max_queue_depth=10, **kwargs)
+    controller.redis = FakeRedis(lengths, unacked=3)
+    return controller
+
+
+def test_in_flight_slots_are_taken_and_returned():
+    controller = AdmissionController(max_in_flight=2, retry_after=15)
+
+    assert controller.acquire('vapi')['admitted']
+    assert controller.acquire('vapi')['admitted']
+    assert controller.acquire('lindy') == {'admitted': False, 'reason': 'in_flight', 'retry_after': 15}
+
+    controller.release()
+    with pytest.raises(RuntimeError):
+        with controller.slot('vapi') as decision:
+            assert decision['admitted']
+            raise RuntimeError('handler failed')
+
+    stats = controller.stats()
+    assert stats['in_flight'] == 1
+    assert (stats['admitted'], stats['shed'], stats['shed_total']) == (3, {'lindy': 1}, 1)
+
+
+def test_requests_are_shed_once_the_queues_are_full():
+    controller = watched({'celery': 2, 'llm': 5}, sample_interval=60)
+
+    assert controller.acquire('vapi')['admitted']
+    assert controller.capacity() == 3
+
+    controller.redis.lengths['llm'] = 8
+    # The sample is reused within sample_interval
+    assert controller.acquire('vapi')['admitted']
+    assert controller.redis.round_trips == 1
+
+    controller.sample_interval = 0
+    assert controller.acquire('vapi')['reason'] == 'queue_depth'
+    assert controller.capacity() == 0
+    stats = controller.stats()
+    assert (stats['queue_depths'], stats['reserved']) == ({'celery': 2, 'llm': 8}, 3)
+
+
+def test_unreadable_queues_fail_open():
+    controller = watched({'llm': 50}, sample_interval=60)
+    controller.redis.down = True
+
+    assert controller.acquire('vapi')['admitted']
+    assert controller.acquire('vapi')['admitted']
+    assert controller.capacity() is None
+    # A down Redis is only retried after sample_interval
+    assert controller.redis.round_trips == 1
+    assert controller.stats()['redis_errors'] == 1
+
+
+@pytest.fixture
+def full(web_app, monkeypatch):
+    """The web app with its only in-flight slot taken"""
+    controller = AdmissionController(max_in_flight=1, retry_after=20)
+    controller.acquire('held')
+    monkeypatch.setattr(web_app, 'admission', controller)
+    return controller
+
+
+def end_of_call(client, call_id='c1'):
+    return client.post('/webhook/vapi', json={'message': {
+        'type': 'end-of-call-report', 'transcript': 'User: hello', 'call': {'id': call_id}
+    }})
+
+
+def test_shed_webhook_gets_429_with_retry_after(web_app, full, monkeypatch):
+    monkeypatch.setitem(web_app.app.config, 'ASYNC_WEBHOOKS', False)
+
+    response = end_of_call(web_app.app.test_client())
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '20'
+    assert response.get_json()['reason'] == 'in_flight'
+    session = web_app.db.get_session()
+    try:
+        assert get_conversation(session, 'c1') is None
+    finally:
+        session.close()
+
+
+def test_shed_webhook_is_spilled_in_async_mode(web_app, full, monkeypatch):
+    monkeypatch.setitem(web_app.app.config, 'ASYNC_WEBHOOKS', True)
+    monkeypatch.setitem(web_app.app.config, 'ADMISSION_OVERLOAD_MODE', 'spill')
+
+    response = end_of_call(web_app.app.test_client())
+
+    assert response.status_code == 202
+    assert response.get_json()['spilled']
+    assert full.stats()['spilled'] == 1
+    session = web_app.db.get_session()
+    try:
+        assert get_conversation(session, 'c1').status == 'queued'
+    finally:
+        session.close()
+
+
+class FakeServices:
+    def __init__(self, database, capacity=None):
+        self.db = database
+        self.admission = AdmissionController()
+        self.admission.capacity = lambda: capacity
+
+
+class FakeTask:
+    def __init__(self, task_id):
+        self.id = task_id
+
+
+def test_spilled_call_is_started_exactly_once(tmp_path, monkeypatch):
+    database = Database(f"sqlite:///{tmp_path / 'spill.db'}")
+    database.create_tables()
+    session = database.get_session()
+    for call_id in ('c1', 'c2'):
+        claim_conversation(session, call_id, 'User: hello', {'name': 'Ann'})
+        spill_conversation(session, call_id)
+
+    started = []
+
+    def start(call_id, customer_info):
+        started.append(call_id)
+        return FakeTask(f'job-{call_id}')
+
+    services = FakeServices(database, capacity=1)
+    monkeypatch.setattr(celery_tasks, 'get_worker_services', lambda: services)
+    monkeypatch.setattr(celery_tasks, 'start_sop_pipeline', start)
+
+    # Room for one call per run; the other stays parked until the next
+    assert celery_tasks.drain_spilled_calls()['started'] == 1
+    assert celery_tasks.drain_spilled_calls()['started'] == 1
+    assert celery_tasks.drain_spilled_calls()['started'] == 0
+
+    assert started == ['c1', 'c2']
+    session.expire_all()
+    conversation = get_conversation(session, 'c1')
+    assert (conversation.status, conversation.job_id) == ('processing', 'job-c1')
+    session.close()
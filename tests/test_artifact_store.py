@@ -0,0 +1,125 @@
+import base64
+import gzip
+import hashlib
+import time
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from services.artifact_store import LocalArtifactStore, create_artifact_store
+from services.lindy_service import LindyService
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalArtifactStore(str(tmp_path), signing_key='secret', base_url='https://sop.example/')
+
+
+def signed_args(store, digest, **kwargs):
+    url, _ = store.signed_url(digest, **kwargs)
+    query = parse_qs(urlparse(url).query)
+    return urlparse(url).path, query['expires'][0], query['signature'][0]
+
+
+def config(**overrides):
+    settings = dict(
+        ARTIFACT_STORE='local', ARTIFACT_DIR='unused', ARTIFACT_SIGNING_KEY=None,
+        SECRET_KEY='dev-secret-key', PUBLIC_BASE_URL=None, ARTIFACT_URL_TTL=60
+    )
+    settings.update(overrides)
+    return SimpleNamespace(**settings)
+
+
+def test_signed_url_verifies_until_it_expires(store):
+    digest = store.put('# SOP')
+    path, expires, signature = signed_args(store, digest, expires_in=60)
+
+    assert path == f'/artifacts/{digest}'
+    assert store.verify(digest, expires, signature)
+    assert not store.verify(digest, int(time.time()) - 1, store._sign(digest, int(time.time()) - 1))
+
+
+def test_tampered_signature_expiry_or_digest_is_rejected(store):
+    digest = store.put('# SOP')
+    other = store.put('# Other SOP')
+    _, expires, signature = signed_args(store, digest)
+
+    assert not store.verify(digest, expires, signature[:-1] + ('0' if signature[-1] != '0' else '1'))
+    assert not store.verify(digest, int(expires) + 3600, signature)
+    assert not store.verify(other, expires, signature)
+    assert not store.verify(digest, 'soon', signature)
+
+
+def test_invalid_digests_are_never_read(store):
+    assert store.get('../../etc/passwd') is None
+    assert not store.exists('abc')
+
+
+def test_default_signing_key_is_refused(tmp_path):
+    with pytest.raises(ValueError):
+        create_artifact_store(config(ARTIFACT_DIR=str(tmp_path)))
+    with pytest.raises(ValueError):
+        create_artifact_store(config(ARTIFACT_DIR=str(tmp_path), SECRET_KEY=''))
+
+    store = create_artifact_store(config(ARTIFACT_DIR=str(tmp_path), ARTIFACT_SIGNING_KEY='real'))
+    assert store.signing_key == b'real'
+    assert create_artifact_store(config(ARTIFACT_STORE='')) is None
+
+
+def test_artifacts_route_serves_only_signed_urls(web_app, store, monkeypatch):
+    monkeypatch.setattr(web_app, 'artifact_store', store)
+    client = web_app.app.test_client()
+    digest = store.put('# SOP')
+    path, expires, signature = signed_args(store, digest)
+
+    response = client.get(path, query_string={'expires': expires, 'signature': signature})
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == '# SOP'
+    assert response.headers['ETag'] == f'"{digest}"'
+
+    cached = client.get(path, query_string={'expires': expires, 'signature': signature},
+                        headers={'If-None-Match': f'"{digest}"'})
+    assert cached.status_code == 304
+
+    assert client.get(path, query_string={'expires': expires, 'signature': 'bad'}).status_code == 403
+
+    missing = hashlib.sha256(b'never stored').hexdigest()
+    _, expires, signature = signed_args(store, missing)
+    assert client.get(f'/artifacts/{missing}',
+                      query_string={'expires': expires, 'signature': signature}).status_code == 404
+
+
+class RecordingLindy(LindyService):
+    def __init__(self, **kwargs):
+        super().__init__('https://lindy.example/hook', **kwargs)
+        self.payloads = []
+
+    def send_payload(self, payload, deadline=None):
+        self.payloads.append(payload)
+        return {'success': True}
+
+
+def test_lindy_gets_a_content_ref_and_gzipped_copy(store):
+    lindy = RecordingLindy(artifact_store=store, inline_max_bytes=100)
+    lindy.notify_sop_completed('c1', None, 'SOP', {}, '# SOP')
+    lindy.notify_sop_completed('c2', None, 'SOP', {}, '# SOP\n' + 'step\n' * 50)
+
+    small, large = (payload['document'] for payload in lindy.payloads)
+    assert small['content'] is None
+    assert small['content_ref']['sha256'] == hashlib.sha256(b'# SOP').hexdigest()
+    assert small['content_ref']['size'] == 5
+    assert gzip.decompress(base64.b64decode(small['content_gzip'])) == b'# SOP'
+    query = parse_qs(urlparse(small['content_ref']['url']).query)
+    assert store.verify(small['content_ref']['sha256'], query['expires'][0], query['signature'][0])
+
+    # Over inline_max_bytes only the reference is sent
+    assert 'content_gzip' not in large and large['content_ref']['size'] == 256
+
+
+def test_lindy_falls_back_to_inline_content_without_a_base_url(tmp_path):
+    lindy = RecordingLindy(artifact_store=LocalArtifactStore(str(tmp_path), signing_key='secret'))
+    lindy.notify_sop_completed('c1', None, 'SOP', {}, '# SOP')
+
+    document = lindy.payloads[0]['document']
+    assert document['content'] == '# SOP' and 'content_ref' not in document
@@ -0,0 +1,104 @@
+from services import cache as cache_module
+from services.cache import TTLCache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value.encode('utf-8')
+        self.ttls[key] = ttl
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def redis_cache(**kwargs):
+    cache = TTLCache(key_prefix='test:', **kwargs)
+    cache.redis = FakeRedis()
+    return cache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_size=2)
+    cache.set('a', '1')
+    cache.set('b', '2')
+    assert cache.get('a') == '1'
+
+    cache.set('c', '3')
+
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == ('1', '3')
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, 'monotonic', clock)
+    cache = TTLCache(ttl=60)
+    cache.set('a', '1')
+
+    clock.now += 59
+    assert cache.get('a') == '1'
+    clock.now += 2
+    assert cache.get('a') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_counters():
+    cache = redis_cache()
+    cache.redis.values['test:shared'] = b'from redis'
+    cache.set('a', '1')
+
+    cache.get('a')
+    cache.get('shared')
+    cache.get('shared')
+    cache.get('missing')
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['redis_hits'], stats['misses']) == (2, 1, 1)
+    assert stats['redis_enabled']
+
+
+def test_redis_tier_is_written_through_and_read_through():
+    cache = redis_cache(ttl=300, json_values=True)
+    cache.set('a', {'sections': 3})
+    assert cache.redis.values['test:a'] == b'{"sections": 3}'
+    assert cache.redis.ttls['test:a'] == 300
+
+    # Another process only has the Redis tier
+    other = redis_cache(json_values=True)
+    other.redis = cache.redis
+    assert other.get('a') == {'sections': 3}
+    assert other.stats()['size'] == 1
+
+    cache.delete('a')
+    assert 'test:a' not in cache.redis.values
+    assert cache.get('a') is None
+
+
+def test_local_ttl_bounds_in_process_entries(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, 'monotonic', clock)
+    cache = redis_cache(ttl=300, local_ttl=10)
+    cache.set('a', '1')
+    cache.redis.values['test:a'] = b'2'
+
+    clock.now += 11
+
+    # The local copy has expired, so the value comes from Redis again
+    assert cache.get('a') == '2'
+    assert cache.stats()['redis_hits'] == 1
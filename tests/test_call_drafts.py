@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import (
+    CallDraft, Database, claim_call_draft, claim_conversation, complete_conversation,
+    save_call_draft, update_call_draft_transcript
+)
+
+
+@pytest.fixture
+def session(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'drafts.db'}")
+    database.create_tables()
+    session = database.get_session()
+    yield session
+    session.close()
+
+
+def age_claim(session, call_id, seconds):
+    session.query(CallDraft).filter(CallDraft.call_id == call_id).update(
+        {'drafting_since': datetime.utcnow() - timedelta(seconds=seconds)},
+        synchronize_session=False
+    )
+    session.commit()
+
+
+def test_claim_needs_enough_new_transcript(session):
+    update_call_draft_transcript(session, 'c1', 'User: short')
+    assert claim_call_draft(session, 'c1', min_new_chars=100) == (None, None)
+
+    transcript, claimed_at = claim_call_draft(session, 'c1', min_new_chars=5)
+    assert transcript == 'User: short' and claimed_at is not None
+
+
+def test_active_claim_blocks_other_drafters(session):
+    update_call_draft_transcript(session, 'c1', 'User: hello there')
+    claim_call_draft(session, 'c1', min_new_chars=1)
+
+    # Transcript events keep arriving while the draft runs
+    update_call_draft_transcript(session, 'c1', 'AI: hi', append=True)
+    assert claim_call_draft(session, 'c1', min_new_chars=1) == (None, None)
+
+
+def test_stale_claim_is_taken_over(session):
+    update_call_draft_transcript(session, 'c1', 'User: hello there')
+    _, first_claim = claim_call_draft(session, 'c1', min_new_chars=1)
+    age_claim(session, 'c1', 600)
+    update_call_draft_transcript(session, 'c1', 'AI: hi', append=True)
+
+    transcript, second_claim = claim_call_draft(session, 'c1', min_new_chars=1, stale_after=300)
+    assert transcript == 'User: hello there\nAI: hi'
+
+    # The killed worker's late result is dropped, the new one is kept
+    assert not save_call_draft(session, 'c1', 'old draft', 17, claimed_at=first_claim)
+    assert save_call_draft(session, 'c1', 'new draft', len(transcript), claimed_at=second_claim)
+
+    session.expire_all()
+    draft = session.get(CallDraft, 'c1')
+    assert (draft.draft, draft.status, draft.drafting_since) == ('new draft', 'idle', None)
+
+
+def test_completing_the_call_deletes_its_draft(session):
+    update_call_draft_transcript(session, 'c1', 'User: hello there')
+    claim_conversation(session, 'c1', 'User: hello there', {})
+
+    complete_conversation(session, 'c1', {'success': True})
+
+    session.expire_all()
+    assert session.get(CallDraft, 'c1') is None
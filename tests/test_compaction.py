@@ -0,0 +1,30 @@
+from utils import compact_transcript
+
+
+def compact(text, level=1):
+    return compact_transcript(text, level=level)[0]
+
+
+def test_removes_fillers_set_off_by_punctuation():
+    assert compact('User: So, um, you open the panel.') == 'User: So you open the panel.'
+    assert compact('User: Um, first we uh... check it.') == 'User: first we check it.'
+
+
+def test_keeps_filler_lookalikes_that_are_content():
+    assert compact('User: Take them to the ER, then call.') == 'User: Take them to the ER, then call.'
+    assert compact('User: Use the 100 Ah battery.') == 'User: Use the 100 Ah battery.'
+    assert compact("User: I'll let you know, then send it.") == "User: I'll let you know, then send it."
+
+
+def test_collapses_stutters_but_not_digits_or_acronyms():
+    assert compact('User: Open the the panel.', level=2) == 'User: Open the panel.'
+    assert compact('User: Press 1 1 2 now.', level=2) == 'User: Press 1 1 2 now.'
+    assert compact('User: Check the FAQ FAQ page.', level=2) == 'User: Check the FAQ FAQ page.'
+
+
+def test_level_1_keeps_multi_line_steps_and_repeated_words():
+    transcript = 'User: Here are the steps:\n1. Um, unlock the  cabinet\n2. Check that that light is off\nAI: Thanks.'
+
+    assert compact(transcript) == (
+        'User: Here are the steps:\n1. unlock the cabinet\n2. Check that that light is off\nAI: Thanks.'
+    )
@@ -0,0 +1,51 @@
+from services.sop_generator import SOPGenerator
+from utils import estimate_tokens
+
+
+class FailingChunkGenerator(SOPGenerator):
+    """Generator whose fact requests fail for chunks containing 'broken'"""
+
+    def __init__(self, **kwargs):
+        super().__init__('test-key', **kwargs)
+        self.requests = []
+
+    def _request_facts(self, chunk, part, total, deadline=None):
+        self.requests.append(part)
+        if 'broken' in chunk:
+            raise RuntimeError('OpenAI is down')
+        return {'steps': [f'step from part {part}']}
+
+
+def long_transcript(turns):
+    return '\n'.join(f'User: {turn} ' + 'words ' * 400 for turn in turns)
+
+
+def test_failed_chunk_is_retried_then_kept_as_raw_text():
+    generator = FailingChunkGenerator(max_transcript_tokens=1000, chunk_workers=2)
+
+    condensed = generator._condense_transcript(long_transcript(['fine', 'broken', 'fine']))
+
+    assert generator.requests.count(2) == 2  # One retry for the failed chunk
+    assert 'step from part 1' in condensed and 'step from part 3' in condensed
+    assert 'User: broken' in condensed
+
+
+def test_facts_still_too_long_are_cut_to_the_limit():
+    generator = FailingChunkGenerator(max_transcript_tokens=1000, chunk_workers=2)
+
+    condensed = generator._condense_transcript(long_transcript(['broken'] * 4))
+
+    assert estimate_tokens(condensed) <= 1000
+
+
+def test_truncation_keeps_the_head_and_tail_of_every_chunk():
+    generator = FailingChunkGenerator(max_transcript_tokens=1000, chunk_workers=2)
+    transcript = long_transcript([f'broken turn {i}' for i in range(8)]) + 'the last words'
+
+    condensed = generator._condense_transcript(transcript)
+
+    assert estimate_tokens(condensed) <= 1000
+    assert condensed.startswith(generator.TRUNCATED_NOTE)
+    assert condensed.count('[... truncated ...]') > 1
+    # The end of the call survives as well as the start
+    assert 'User: broken turn 0' in condensed and condensed.endswith('the last words')
@@ -0,0 +1,203 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from googleapiclient.errors import HttpError
+
+from services.google_docs_service import GoogleDocsService
+from services.markdown_renderer import MarkdownRenderer
+
+SOP = """# Onboarding
+
+Intro with **bold** and [a link](http://example.com).
+
+1. First step
+2. Second step
+   - detail
+
+End.
+"""
+
+STYLE_VALUES = {
+    'link': lambda value: {'url': value},
+    'weightedFontFamily': lambda value: {'fontFamily': value}
+}
+
+
+def document(markdown, revision='1'):
+    """Build the documents.get response Google returns for rendered markdown"""
+    renderer = MarkdownRenderer().parse(markdown)
+    signatures = [renderer.paragraph_signature(i) for i in range(len(renderer.paragraphs))]
+    signatures.append(('', 'NORMAL_TEXT', None, ()))  # The document's own last paragraph
+
+    content = [{'endIndex': 1, 'sectionBreak': {}}]
+    index = 1
+    for text, style, level, spans in signatures:
+        cuts = sorted({0, len(text)} | {s for span in spans for s in span[:2]})
+
+        elements = []
+        for start, end in zip(cuts, cuts[1:]):
+            text_style = {}
+            for s, e, field, value in spans:
+                if s <= start and end <= e:
+                    text_style[field] = STYLE_VALUES.get(field, lambda v: v)(value)
+            elements.append({
+                'startIndex': index + start,
+                'endIndex': index + end,
+                'textRun': {'content': text[start:end], 'textStyle': text_style}
+            })
+        elements.append({
+            'startIndex': index + len(text),
+            'endIndex': index + len(text) + 1,
+            'textRun': {'content': '\n', 'textStyle': {}}
+        })
+
+        paragraph = {'elements': elements, 'paragraphStyle': {'namedStyleType': style}}
+        if level is not None:
+            paragraph['bullet'] = {'nestingLevel': level}
+        end = index + len(text) + 1
+        content.append({'startIndex': index, 'endIndex': end, 'paragraph': paragraph})
+        index = end
+
+    return {'revisionId': revision, 'body': {'content': content}}
+
+
+def paragraph_range(doc, text):
+    """Get the (start, end) of the paragraph whose text is text"""
+    for element in doc['body']['content'][1:]:
+        if 'paragraph' not in element:
+            continue
+        runs = element['paragraph']['elements']
+        if ''.join(run['textRun']['content'] for run in runs).rstrip('\n') == text:
+            return element['startIndex'], element['endIndex']
+    raise AssertionError(f'No paragraph {text!r}')
+
+
+def deletes(requests):
+    return [r['deleteContentRange']['range'] for r in requests if 'deleteContentRange' in r]
+
+
+def inserts(requests):
+    return [r['insertText'] for r in requests if 'insertText' in r]
+
+
+@pytest.fixture
+def service():
+    return GoogleDocsService.__new__(GoogleDocsService)
+
+
+def test_unchanged_document_needs_no_requests(service):
+    assert service._diff_requests(document(SOP), SOP) == ([], 0)
+
+
+def test_only_the_changed_paragraph_is_rewritten(service):
+    doc = document(SOP)
+    requests, changed = service._diff_requests(doc, SOP.replace('End.', 'Done.'))
+
+    start, end = paragraph_range(doc, 'End.')
+    assert changed == 1
+    assert deletes(requests) == [{'startIndex': start, 'endIndex': end}]
+    assert [i['location']['index'] for i in inserts(requests)] == [start]
+    assert ''.join(i['text'] for i in inserts(requests)) == 'Done.\n'
+
+
+def test_style_change_rewrites_the_paragraph(service):
+    doc = document(SOP)
+    requests, changed = service._diff_requests(doc, SOP.replace('**bold**', 'bold'))
+
+    assert changed == 1
+    assert deletes(requests)[0]['startIndex'] == paragraph_range(doc, 'Intro with bold and a link.')[0]
+
+
+def test_list_edits_rewrite_the_whole_list(service):
+    doc = document(SOP)
+    requests, changed = service._diff_requests(doc, SOP.replace('Second step', 'Second step, carefully'))
+
+    assert changed == 3
+    assert deletes(requests) == [{
+        'startIndex': paragraph_range(doc, 'First step')[0],
+        'endIndex': paragraph_range(doc, 'detail')[1]
+    }]
+
+
+def test_appended_paragraph_is_inserted_before_the_final_newline(service):
+    doc = document(SOP)
+    requests, changed = service._diff_requests(doc, SOP + '\nAppendix.\n')
+
+    end_index = doc['body']['content'][-1]['endIndex']
+    assert changed == 2  # The blank separator and the new paragraph
+    assert deletes(requests) == []
+    assert {i['location']['index'] for i in inserts(requests)} == {end_index - 1}
+
+
+def test_blocks_are_applied_from_the_end_backwards(service):
+    doc = document(SOP)
+    content = SOP.replace('# Onboarding', '# Onboarding v2').replace('End.', 'Done.')
+    requests, changed = service._diff_requests(doc, content)
+
+    starts = [r['startIndex'] for r in deletes(requests)]
+    assert changed == 2
+    assert starts == sorted(starts, reverse=True) and len(starts) == 2
+
+
+def with_table(doc, before_text, size=10):
+    """Insert a table element before a paragraph, shifting the rest of the document"""
+    content = doc['body']['content']
+    position = next(i for i, element in enumerate(content[1:], 1)
+                    if paragraph_range(doc, before_text)[0] == element['startIndex'])
+    start = content[position]['startIndex']
+    for element in content[position:]:
+        element['startIndex'] += size
+        element['endIndex'] += size
+        for run in element['paragraph']['elements']:
+            run['startIndex'] += size
+            run['endIndex'] += size
+    content.insert(position, {'startIndex': start, 'endIndex': start + size, 'table': {}})
+    return doc
+
+
+def test_tables_are_replaced_without_widening_the_list(service):
+    doc = with_table(document(SOP), 'End.')
+    table = next(element for element in doc['body']['content'] if 'table' in element)
+
+    requests, changed = service._diff_requests(doc, SOP.replace('End.', 'Done.'))
+
+    # The table (not in the markdown) and the edited paragraph go; the list stays
+    assert deletes(requests) == [
+        {'startIndex': table['startIndex'], 'endIndex': paragraph_range(doc, 'End.')[1]}
+    ]
+    assert changed == 1
+
+
+def conflict(status, message):
+    body = json.dumps({'error': {'code': 400, 'message': message, 'status': status}})
+    return HttpError(MagicMock(status=400, reason='Bad Request'), body.encode())
+
+
+def test_update_retries_once_after_a_concurrent_edit(service):
+    service.docs_service = MagicMock()
+    documents = service.docs_service.documents.return_value
+    documents.get.return_value.execute.side_effect = [document(SOP, '1'), document(SOP, '2')]
+    documents.batchUpdate.return_value.execute.side_effect = [
+        conflict('FAILED_PRECONDITION', 'The required revision ID does not match'), {}
+    ]
+
+    result = service.update_document('doc', SOP.replace('End.', 'Done.'))
+
+    assert result == {'id': 'doc', 'changed_paragraphs': 1}
+    revisions = [c.kwargs['body']['writeControl']['requiredRevisionId'] for c in documents.batchUpdate.call_args_list]
+    assert revisions == ['1', '2']
+
+
+def test_other_bad_requests_are_not_retried(service):
+    service.docs_service = MagicMock()
+    documents = service.docs_service.documents.return_value
+    documents.get.return_value.execute.return_value = document(SOP, '1')
+    # A document ID containing "revision" used to look like a conflict
+    error = conflict('INVALID_ARGUMENT', 'Invalid requests[0].insertText: Index 9 out of bounds')
+    error.uri = 'https://docs.googleapis.com/v1/documents/revision-notes:batchUpdate'
+    documents.batchUpdate.return_value.execute.side_effect = [error, {}]
+
+    with pytest.raises(HttpError):
+        service.update_document('revision-notes', SOP.replace('End.', 'Done.'))
+    assert documents.batchUpdate.call_count == 1
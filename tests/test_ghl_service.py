@@ -0,0 +1,173 @@
+import threading
+import time
+
+from services.ghl_service import GHLService
+from utils import Deadline
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class FakeHTTP:
+    """Contacts API whose GETs block until released"""
+
+    def __init__(self):
+        self.gets = 0
+        self.release = threading.Event()
+
+    def get(self, url, headers=None, deadline=None):
+        self.gets += 1
+        self.release.wait(5)
+        return FakeResponse({'contact': {'id': url.rsplit('/', 1)[1], 'version': self.gets}})
+
+    def put(self, url, headers=None, json=None):
+        return FakeResponse({'contact': json})
+
+    def post(self, url, headers=None, json=None):
+        return FakeResponse({'tags': json['tags']})
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value.encode('utf-8')
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+
+def cached_service():
+    http = FakeHTTP()
+    ghl = GHLService('key', http_client=http, contact_cache_ttl=300)
+    ghl.contact_cache.redis = FakeRedis()
+    return ghl, http
+
+
+def sleeping(seconds, result=None):
+    def call(*args, deadline=None):
+        time.sleep(seconds)
+        return result or {'success': True}
+    return call
+
+
+def failing(*args, deadline=None):
+    raise RuntimeError('GHL is down')
+
+
+def service(**kwargs):
+    return GHLService('key', contact_cache_ttl=0, **kwargs)
+
+
+def test_slow_channel_does_not_hold_up_the_others():
+    finished = {}
+
+    def record(name):
+        def call(*args, deadline=None):
+            finished[name] = time.monotonic()
+            return {'success': True}
+        return call
+
+    started = time.monotonic()
+    results = service()._run_concurrently(
+        {'sms': (sleeping(0.3),), 'email': (record('email'),), 'note': (record('note'),)}, timeout=5
+    )
+
+    assert all(result['success'] for result in results.values())
+    assert max(finished.values()) - started < 0.2
+
+
+def test_channel_past_its_timeout_is_reported_failed():
+    started = time.monotonic()
+    results = service()._run_concurrently(
+        {'sms': (sleeping(1),), 'note': (sleeping(0),)}, timeout=0.2
+    )
+
+    assert time.monotonic() - started < 0.8
+    assert results['sms'] == {'success': False, 'error': 'Timed out after 0.2s'}
+    assert results['note']['success']
+
+
+def test_timeout_counts_from_when_a_queued_channel_starts():
+    # One worker: the note waits behind the SMS but still gets its own timeout
+    results = service(max_workers=1)._run_concurrently(
+        {'sms': (sleeping(0.15),), 'note': (sleeping(0.15),)}, timeout=0.25
+    )
+
+    assert results['sms']['success'] and results['note']['success']
+
+
+def test_partial_failure_keeps_the_other_results():
+    results = service()._run_concurrently(
+        {'sms': (failing,), 'note': (sleeping(0, {'success': True, 'data': {'id': 'n1'}}),)},
+        timeout=5
+    )
+
+    assert results['sms'] == {'success': False, 'error': 'GHL is down'}
+    assert results['note'] == {'success': True, 'data': {'id': 'n1'}}
+
+
+def test_deadline_caps_the_wait_and_reaches_every_call():
+    seen = []
+
+    def check_deadline(*args, deadline=None):
+        seen.append(deadline)
+        return {'success': True}
+
+    deadline = Deadline(0.2)
+    results = service()._run_concurrently(
+        {'sms': (sleeping(1),), 'note': (check_deadline,)}, timeout=5, deadline=deadline
+    )
+
+    assert results['sms'] == {'success': False, 'error': 'Deadline exceeded'}
+    assert seen == [deadline]
+
+
+def test_concurrent_lookups_of_a_contact_share_one_request():
+    ghl, http = cached_service()
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(ghl.get_contact('k1')))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Let every lookup reach the in-flight request before it returns
+    time.sleep(0.1)
+    http.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert http.gets == 1
+    assert results == [{'contact': {'id': 'k1', 'version': 1}}] * 8
+    assert ghl.get_contact('k1') == results[0] and http.gets == 1
+
+
+def test_updates_evict_the_contact_locally_and_in_redis():
+    ghl, http = cached_service()
+    http.release.set()
+    redis_key = 'voice_sop:ghl_contact:k1'
+
+    for change in (lambda: ghl.update_contact('k1', {'name': 'Ann'}), lambda: ghl.add_tag('k1', 'sop')):
+        ghl.get_contact('k1')
+        assert redis_key in ghl.contact_cache.redis.values
+
+        change()
+
+        assert ghl.contact_cache.stats()['size'] == 0
+        assert redis_key not in ghl.contact_cache.redis.values
+
+    assert ghl.get_contact('k1')['contact']['version'] == 3
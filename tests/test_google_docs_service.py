@@ -0,0 +1,171 @@
+from unittest.mock import MagicMock
+
+import pytest
+from googleapiclient.errors import HttpError
+
+from services import google_docs_service
+from services.google_docs_service import GoogleDocsService
+from utils import Deadline, DeadlineExceeded
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    """Mocked Docs and Drive clients, as returned by build()"""
+    clients = {'docs': MagicMock(), 'drive': MagicMock()}
+    monkeypatch.setattr(google_docs_service.service_account.Credentials,
+                        'from_service_account_file', MagicMock())
+    monkeypatch.setattr(google_docs_service, 'build', lambda name, version, credentials: clients[name])
+    return clients
+
+
+def make_service(clients, **kwargs):
+    kwargs.setdefault('document_cache_ttl', 0)
+    return GoogleDocsService('credentials.json', folder_id='folder', **kwargs)
+
+
+def round_trips(clients):
+    """Count every request sent to Google, by API call"""
+    docs, drive = clients['docs'], clients['drive']
+    calls = {
+        'documents.create': docs.documents.return_value.create.return_value.execute,
+        'documents.get': docs.documents.return_value.get.return_value.execute,
+        'batchUpdate': docs.documents.return_value.batchUpdate.return_value.execute,
+        'files.create': drive.files.return_value.create.return_value.execute,
+        'files.copy': drive.files.return_value.copy.return_value.execute,
+        'files.get': drive.files.return_value.get.return_value.execute,
+        'files.update': drive.files.return_value.update.return_value.execute,
+        'permissions.create': drive.permissions.return_value.create.return_value.execute,
+        'permissions batch': drive.new_batch_http_request.return_value.execute
+    }
+    return {name: mock.call_count for name, mock in calls.items() if mock.call_count}
+
+
+def test_document_is_created_in_three_round_trips(clients):
+    drive = clients['drive']
+    drive.files.return_value.create.return_value.execute.return_value = {'id': 'doc1'}
+    service = make_service(clients)
+
+    result = service.create_document('SOP', '# Title\n\nStep one.', share_with=['ann@example.com'])
+
+    assert result == {'id': 'doc1', 'url': 'https://docs.google.com/document/d/doc1/edit', 'title': 'SOP'}
+    assert round_trips(clients) == {'files.create': 1, 'batchUpdate': 1, 'permissions batch': 1}
+
+    # Created straight into the folder as a Google Doc, so it is never moved
+    assert drive.files.return_value.create.call_args.kwargs['body'] == {
+        'name': 'SOP', 'mimeType': 'application/vnd.google-apps.document', 'parents': ['folder']
+    }
+    assert drive.new_batch_http_request.return_value.add.call_count == 2
+    permissions = [call.kwargs['body'] for call in drive.permissions.return_value.create.call_args_list]
+    assert permissions == [
+        {'type': 'anyone', 'role': 'reader'},
+        {'type': 'user', 'role': 'reader', 'emailAddress': 'ann@example.com'}
+    ]
+
+
+def test_expired_deadline_stops_before_the_next_call(clients):
+    service = make_service(clients)
+
+    with pytest.raises(DeadlineExceeded):
+        service.create_document('SOP', '# Title', deadline=Deadline(0))
+    assert round_trips(clients) == {}
+
+
+def template(*lines):
+    """documents.get response for a template with one text run per line"""
+    content = [{'endIndex': 1, 'sectionBreak': {}}]
+    index = 1
+    for line in lines:
+        end = index + len(line) + 1
+        content.append({'startIndex': index, 'endIndex': end, 'paragraph': {'elements': [
+            {'startIndex': index, 'endIndex': end, 'textRun': {'content': line + '\n'}}
+        ]}})
+        index = end
+    return {'body': {'content': content}}
+
+
+def batch_requests(clients, call=-1):
+    calls = clients['docs'].documents.return_value.batchUpdate.call_args_list
+    return calls[call].kwargs['body']['requests']
+
+
+def test_template_copy_fills_placeholders(clients):
+    docs, drive = clients['docs'], clients['drive']
+    docs.documents.return_value.get.return_value.execute.return_value = template('{{TITLE}}', '{{CONTENT}}')
+    drive.files.return_value.copy.return_value.execute.return_value = {'id': 'doc1'}
+    service = make_service(clients, template_id='tpl')
+
+    service.create_document('SOP', 'Step one.', fields={'CUSTOMER_NAME': 'Ann'})
+    service.create_document('SOP 2', 'Step one.')
+
+    # The template's layout is read once and shared by its copies
+    assert round_trips(clients) == {
+        'documents.get': 1, 'files.copy': 2, 'batchUpdate': 2, 'permissions batch': 2
+    }
+    assert drive.files.return_value.copy.call_args.kwargs['fileId'] == 'tpl'
+    assert drive.files.return_value.copy.call_args.kwargs['body'] == {'name': 'SOP 2', 'parents': ['folder']}
+
+    requests = batch_requests(clients, 0)
+    placeholder = template('{{TITLE}}')['body']['content'][-1]['endIndex']
+    assert requests[0] == {'deleteContentRange': {'range': {
+        'startIndex': placeholder, 'endIndex': placeholder + len('{{CONTENT}}')
+    }}}
+    inserted = [r['insertText'] for r in requests if 'insertText' in r]
+    assert inserted[0]['location']['index'] == placeholder
+    replaced = {
+        r['replaceAllText']['containsText']['text']: r['replaceAllText']['replaceText']
+        for r in requests if 'replaceAllText' in r
+    }
+    assert replaced['{{TITLE}}'] == 'SOP' and replaced['{{CUSTOMER_NAME}}'] == 'Ann'
+    assert '{{DATE}}' in replaced
+
+
+def test_stale_template_layout_is_refreshed_and_retried_once(clients):
+    docs, drive = clients['docs'], clients['drive']
+    # The template gained a line after its layout was cached
+    docs.documents.return_value.get.return_value.execute.side_effect = [
+        template('{{CONTENT}}'), template('New header', '{{CONTENT}}')
+    ]
+    stale = HttpError(MagicMock(status=400), b'Invalid requests[0].deleteContentRange')
+    docs.documents.return_value.batchUpdate.return_value.execute.side_effect = [stale, {}]
+    drive.files.return_value.copy.return_value.execute.return_value = {'id': 'doc1'}
+    service = make_service(clients, template_id='tpl')
+
+    service.create_document('SOP', 'Step one.')
+
+    assert round_trips(clients)['files.copy'] == 1
+    assert docs.documents.return_value.get.call_args.kwargs['documentId'] == 'doc1'
+    moved = template('New header')['body']['content'][-1]['endIndex']
+    assert batch_requests(clients, 0)[0]['deleteContentRange']['range']['startIndex'] == 1
+    assert batch_requests(clients, 1)[0]['deleteContentRange']['range']['startIndex'] == moved
+    assert service._template_layout['placeholder_index'] == moved
+
+
+def test_document_reads_are_cached_until_the_revision_changes(clients):
+    docs, drive = clients['docs'], clients['drive']
+    drive.files.return_value.get.return_value.execute.side_effect = [
+        {'version': '5'}, {'version': '5'}, {'version': '6'}
+    ]
+    docs.documents.return_value.get.return_value.execute.side_effect = [
+        template('First', 'draft'), template('Second', 'draft')
+    ]
+    service = make_service(clients, document_cache_ttl=3600)
+
+    assert service.get_document_content('doc1') == 'First\ndraft\n'
+    assert service.get_document_content('doc1') == 'First\ndraft\n'
+    assert service.get_document_content('doc1') == 'Second\ndraft\n'
+
+    assert round_trips(clients) == {'files.get': 3, 'documents.get': 2}
+    assert drive.files.return_value.get.call_args.kwargs['fields'] == 'headRevisionId,version'
+    stats = service.document_cache_stats()
+    assert (stats['hits'], stats['misses'], stats['stale'], stats['size']) == (1, 1, 1, 1)
+
+
+def test_disabled_cache_reads_the_document_every_time(clients):
+    clients['docs'].documents.return_value.get.return_value.execute.return_value = template('Text')
+    service = make_service(clients)
+
+    service.get_document_content('doc1')
+    service.get_document_content('doc1')
+
+    assert round_trips(clients) == {'documents.get': 2}
+    assert service.document_cache_stats() == {'enabled': False}
@@ -0,0 +1,88 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from services.http_client import HTTPClient
+from utils import Deadline
+
+
+class Handler(BaseHTTPRequestHandler):
+    # Responses to send in order: (status, headers, delay)
+    responses = []
+    hits = 0
+
+    def do_GET(self):
+        cls = type(self)
+        status, headers, delay = cls.responses[min(cls.hits, len(cls.responses) - 1)]
+        cls.hits += 1
+        time.sleep(delay)
+        try:
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.responses = []
+    Handler.hits = 0
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}/'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def client():
+    return HTTPClient(max_retries=2, backoff_factor=0.05, timeout=10)
+
+
+def test_budgeted_request_is_not_retried_past_the_deadline(server):
+    Handler.responses = [(200, {}, 1.0)]
+
+    started = time.monotonic()
+    with pytest.raises(requests.exceptions.Timeout):
+        client().get(server, deadline=Deadline(0.3))
+
+    assert time.monotonic() - started < 0.8
+    assert Handler.hits == 1
+
+
+def test_retry_after_beyond_the_deadline_returns_the_response(server):
+    Handler.responses = [(503, {'Retry-After': '30'}, 0)]
+
+    started = time.monotonic()
+    response = client().get(server, deadline=Deadline(2))
+
+    assert response.status_code == 503
+    assert time.monotonic() - started < 1
+    assert Handler.hits == 1
+
+
+def test_budgeted_request_retries_within_the_deadline(server):
+    Handler.responses = [(503, {}, 0), (503, {'Retry-After': '0'}, 0), (200, {}, 0)]
+
+    response = client().get(server, deadline=Deadline(5))
+
+    assert response.status_code == 200
+    assert Handler.hits == 3
+
+
+def test_post_is_not_retried(server):
+    Handler.responses = [(503, {}, 0), (200, {}, 0)]
+    Handler.do_POST = Handler.do_GET
+
+    response = client().post(server, deadline=Deadline(5))
+
+    assert response.status_code == 503
+    assert Handler.hits == 1
@@ -0,0 +1,95 @@
+import pytest
+
+from models import CallDraft
+
+
+class InlineExecutor:
+    def submit(self, func, *args):
+        func(*args)
+
+
+class FakeGenerator:
+    def __init__(self):
+        self.drafted = []
+        self.generated = []
+
+    def generate_draft(self, transcript, customer_info=None):
+        self.drafted.append(transcript)
+        return f'# Draft {len(self.drafted)}'
+
+    def generate_sop(self, transcript, customer_info=None, draft=None, deadline=None):
+        self.generated.append(draft)
+        return '# SOP'
+
+
+@pytest.fixture
+def generator(web_app, monkeypatch):
+    generator = FakeGenerator()
+    monkeypatch.setattr(web_app, 'sop_generator', generator)
+    monkeypatch.setattr(web_app, 'draft_executor', InlineExecutor())
+    monkeypatch.setitem(web_app.app.config, 'SPECULATIVE_DRAFTS', True)
+    monkeypatch.setitem(web_app.app.config, 'DRAFT_MIN_NEW_CHARS', 30)
+    monkeypatch.setitem(web_app.app.config, 'ASYNC_WEBHOOKS', False)
+    return generator
+
+
+@pytest.fixture
+def client(web_app):
+    return web_app.app.test_client()
+
+
+def post(client, message):
+    message.setdefault('call', {'id': 'c1', 'customer': {'name': 'Ann'}})
+    return client.post('/webhook/vapi', json={'message': message})
+
+
+def utterance(client, text, role='user', transcript_type='final'):
+    return post(client, {
+        'type': 'transcript', 'role': role, 'transcriptType': transcript_type, 'transcript': text
+    })
+
+
+def test_final_utterances_are_drafted_once_enough_is_new(client, generator):
+    assert utterance(client, 'Open the valve').get_json()['drafting'] is False
+    assert utterance(client, 'partial', transcript_type='partial').get_json()['status'] == 'ignored'
+
+    response = utterance(client, 'Check the pressure', role='assistant')
+
+    assert response.get_json()['drafting'] is True
+    assert generator.drafted == ['User: Open the valve\nAssistant: Check the pressure']
+
+
+def test_new_text_below_the_threshold_is_not_redrafted(client, generator):
+    utterance(client, 'Open the valve and wait slowly')
+    utterance(client, 'Short')
+    assert len(generator.drafted) == 1
+
+    utterance(client, 'Then close the outlet slowly')
+    assert len(generator.drafted) == 2
+
+
+def test_conversation_update_replaces_the_transcript(web_app, client, generator):
+    utterance(client, 'Open the valve and wait slowly')
+
+    post(client, {'type': 'conversation-update', 'conversation': [
+        {'role': 'system', 'content': 'You are a helper'},
+        {'role': 'user', 'content': 'Open the valve and wait slowly'},
+        {'role': 'bot', 'message': 'Then close the outlet'}
+    ]})
+
+    session = web_app.db.get_session()
+    try:
+        draft = session.get(CallDraft, 'c1')
+        assert draft.transcript == 'User: Open the valve and wait slowly\nAssistant: Then close the outlet'
+    finally:
+        session.close()
+    assert generator.drafted[-1] == draft.transcript
+
+
+def test_draft_is_handed_to_generate_sop(client, generator):
+    utterance(client, 'Open the valve and wait slowly')
+
+    response = post(client, {'type': 'end-of-call-report', 'transcript': 'User: Open the valve and wait slowly'})
+
+    assert response.status_code == 200
+    assert generator.generated == ['# Draft 1']
@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Database, LindyOutboxEvent, claim_lindy_event, enqueue_lindy_event
+from services.lindy_service import LindyOutbox
+
+
+class FakeLindy:
+    """Records delivered payloads; calls listed in failing get a 503"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.sent = []
+
+    def send_payload(self, payload):
+        if payload['call_id'] in self.failing:
+            return {'success': False, 'status_code': 503, 'error': 'unavailable'}
+        self.sent.append((payload['call_id'], payload['event']))
+        return {'success': True, 'status_code': 200}
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'outbox.db'}")
+    database.create_tables()
+    return database
+
+
+def enqueue(database, call_id, event):
+    session = database.get_session()
+    try:
+        return enqueue_lindy_event(session, call_id, event, {'event': event, 'call_id': call_id}).id
+    finally:
+        session.close()
+
+
+def statuses(database):
+    session = database.get_session()
+    try:
+        return {e.id: e.status for e in session.query(LindyOutboxEvent)}
+    finally:
+        session.close()
+
+
+def test_events_for_a_call_are_delivered_in_order(database):
+    for event in ('sop_started', 'sop_progress', 'sop_completed'):
+        enqueue(database, 'call-1', event)
+    lindy = FakeLindy()
+    outbox = LindyOutbox(database)
+
+    # Only the head of each call's queue is eligible per dispatch
+    for _ in range(3):
+        outbox.dispatch(lindy)
+
+    assert lindy.sent == [('call-1', 'sop_started'), ('call-1', 'sop_progress'), ('call-1', 'sop_completed')]
+
+
+def test_failing_event_holds_back_only_its_own_call(database):
+    first = enqueue(database, 'bad', 'sop_started')
+    second = enqueue(database, 'bad', 'sop_completed')
+    enqueue(database, 'good', 'sop_started')
+    lindy = FakeLindy(failing={'bad'})
+
+    counts = LindyOutbox(database).dispatch(lindy)
+
+    assert counts == {'sent': 1, 'retried': 1, 'failed': 0}
+    assert lindy.sent == [('good', 'sop_started')]
+    assert statuses(database)[first] == 'pending'
+    assert statuses(database)[second] == 'pending'
+
+
+def test_events_backing_off_do_not_starve_newer_calls(database):
+    # A full batch of events waiting to retry, then a new call's event
+    for n in range(3):
+        enqueue(database, f'backing-off-{n}', 'sop_started')
+    LindyOutbox(database, batch_size=3).dispatch(FakeLindy(failing={f'backing-off-{n}' for n in range(3)}))
+    enqueue(database, 'new', 'sop_started')
+
+    lindy = FakeLindy()
+    LindyOutbox(database, batch_size=3).dispatch(lindy)
+
+    assert lindy.sent == [('new', 'sop_started')]
+
+
+def test_permanent_errors_give_up_and_release_the_call(database):
+    class Rejecting(FakeLindy):
+        def send_payload(self, payload):
+            if payload['event'] == 'sop_started':
+                return {'success': False, 'status_code': 400, 'error': 'bad request'}
+            return super().send_payload(payload)
+
+    first = enqueue(database, 'call-1', 'sop_started')
+    enqueue(database, 'call-1', 'sop_completed')
+    lindy = Rejecting()
+    outbox = LindyOutbox(database)
+
+    outbox.dispatch(lindy)
+    outbox.dispatch(lindy)
+
+    assert statuses(database)[first] == 'failed'
+    assert lindy.sent == [('call-1', 'sop_completed')]
+
+
+def test_claim_is_compare_and_set(database):
+    event_id = enqueue(database, 'call-1', 'sop_started')
+    locked_until = datetime.utcnow() + timedelta(seconds=60)
+
+    first, second = database.get_session(), database.get_session()
+    try:
+        # Both dispatchers loaded the event before either claimed it
+        mine = first.get(LindyOutboxEvent, event_id)
+        theirs = second.get(LindyOutboxEvent, event_id)
+
+        assert claim_lindy_event(first, mine, locked_until)
+        assert not claim_lindy_event(second, theirs, locked_until)
+    finally:
+        first.close()
+        second.close()
+
+
+def test_expired_claim_can_be_taken_over(database):
+    event_id = enqueue(database, 'call-1', 'sop_started')
+
+    session = database.get_session()
+    try:
+        event = session.get(LindyOutboxEvent, event_id)
+        assert claim_lindy_event(session, event, datetime.utcnow() - timedelta(seconds=1))
+        assert claim_lindy_event(session, event, datetime.utcnow() + timedelta(seconds=60))
+    finally:
+        session.close()
@@ -0,0 +1,97 @@
+from services.markdown_renderer import LINE_BREAK, MarkdownRenderer, markdown_to_requests, utf16_len
+
+
+def inserted_text(requests):
+    return requests[0]['insertText']['text']
+
+
+def requests_of(requests, kind):
+    return [r[kind] for r in requests if kind in r]
+
+
+def text_at(requests, range_):
+    """Slice the inserted text (inserted at index 1) by a request range"""
+    return inserted_text(requests)[range_['startIndex'] - 1:range_['endIndex'] - 1]
+
+
+def test_empty_markdown_renders_nothing():
+    assert markdown_to_requests('') == []
+
+
+def test_headings_and_inline_styles():
+    requests = markdown_to_requests('## Setup\n\nUse **bold**, *italic*, `code` and [docs](http://x.io).')
+
+    assert inserted_text(requests) == 'Setup\n\nUse bold, italic, code and docs.\n'
+    headings = requests_of(requests, 'updateParagraphStyle')
+    assert [h['paragraphStyle']['namedStyleType'] for h in headings] == ['HEADING_2']
+    assert text_at(requests, headings[0]['range']) == 'Setup\n'
+
+    styles = {s['fields']: text_at(requests, s['range']) for s in requests_of(requests, 'updateTextStyle')}
+    assert styles == {'bold': 'bold', 'italic': 'italic', 'weightedFontFamily': 'code', 'link': 'docs'}
+
+
+def test_indices_count_utf16_units():
+    requests = markdown_to_requests('😀 **ok**')
+
+    bold = requests_of(requests, 'updateTextStyle')[0]['range']
+    assert utf16_len('😀') == 2
+    assert bold == {'startIndex': 4, 'endIndex': 6}
+
+
+def test_nested_list_is_one_run_with_tab_levels():
+    requests = markdown_to_requests('- one\n  - nested\n- two')
+
+    assert inserted_text(requests) == 'one\n\tnested\ntwo\n'
+    bullets = requests_of(requests, 'createParagraphBullets')
+    assert len(bullets) == 1
+    assert bullets[0]['bulletPreset'] == 'BULLET_DISC_CIRCLE_SQUARE'
+
+
+def test_indented_continuation_lines_stay_in_the_list():
+    markdown = (
+        '1. **Prepare**\n'
+        '   Clear the desk.\n'
+        '\n'
+        '2. **Wash**\n'
+        '\n'
+        '   Use soap.\n'
+        '3. **Dry**\n'
+    )
+    requests = markdown_to_requests(markdown)
+
+    assert inserted_text(requests) == (
+        f'Prepare{LINE_BREAK}Clear the desk.\nWash{LINE_BREAK}Use soap.\nDry\n'
+    )
+    bullets = requests_of(requests, 'createParagraphBullets')
+    assert len(bullets) == 1
+    assert bullets[0]['range'] == {'startIndex': 1, 'endIndex': 1 + len(inserted_text(requests))}
+
+
+def test_unindented_text_ends_the_list():
+    requests = markdown_to_requests('1. First\nNot part of it\n1. Second')
+
+    assert inserted_text(requests) == 'First\nNot part of it\nSecond\n'
+    assert len(requests_of(requests, 'createParagraphBullets')) == 2
+
+
+def test_continuation_paragraph_signature():
+    renderer = MarkdownRenderer().parse('1. **Step**\n   details')
+
+    assert len(renderer.paragraphs) == 1
+    assert renderer.paragraph_signature(0) == (
+        f'Step{LINE_BREAK}details', 'NORMAL_TEXT', 0, ((0, 4, 'bold', True),)
+    )
+
+
+def test_code_blocks_keep_lines_and_use_code_font():
+    requests = markdown_to_requests('```\nrun --fast\n```')
+
+    assert inserted_text(requests) == 'run --fast\n'
+    assert requests_of(requests, 'updateTextStyle')[0]['fields'] == 'weightedFontFamily'
+
+
+def test_start_index_shifts_every_range():
+    requests = MarkdownRenderer(start_index=10).render('# Title')
+
+    assert requests[0]['insertText']['location'] == {'index': 10}
+    assert requests_of(requests, 'updateParagraphStyle')[0]['range'] == {'startIndex': 10, 'endIndex': 16}
@@ -0,0 +1,49 @@
+from sqlalchemy import inspect, text
+
+import models
+from models import Database
+
+
+def conversation_columns(database):
+    return {column['name'] for column in inspect(database.engine).get_columns('conversations')}
+
+
+def test_missing_columns_are_added_once(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'old.db'}")
+    with database.engine.begin() as connection:
+        connection.execute(text('CREATE TABLE conversations (id VARCHAR(100) PRIMARY KEY, call_id VARCHAR(100))'))
+
+    database.create_tables()
+    assert {'job_id', 'result', 'checkpoints'} <= conversation_columns(database)
+
+    assert database.add_missing_columns() == []
+
+
+def test_column_added_by_a_concurrent_migration_is_skipped(tmp_path, monkeypatch):
+    database = Database(f"sqlite:///{tmp_path / 'race.db'}")
+    database.create_tables()
+
+    # This process inspected the table before the other one added job_id
+    real_inspect = models.inspect
+    inspections = []
+
+    class StaleInspector:
+        def __init__(self, engine):
+            self.inspector = real_inspect(engine)
+            self.stale = not inspections
+            inspections.append(self)
+
+        def get_table_names(self):
+            return self.inspector.get_table_names()
+
+        def get_columns(self, table_name):
+            columns = self.inspector.get_columns(table_name)
+            if self.stale and table_name == 'conversations':
+                columns = [column for column in columns if column['name'] != 'job_id']
+            return columns
+
+    monkeypatch.setattr(models, 'inspect', StaleInspector)
+
+    assert database.add_missing_columns() == []
+    assert len(inspections) == 2  # Re-inspected after "duplicate column"
+    assert 'job_id' in conversation_columns(database)
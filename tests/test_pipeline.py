@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import Pipeline, StageTimeout
+from utils import Deadline, DeadlineExceeded
+
+
+def test_stages_run_after_their_dependencies():
+    order = []
+    lock = threading.Lock()
+
+    def stage(name, value):
+        def run(inputs):
+            with lock:
+                order.append(name)
+            return value + sum(inputs.values())
+        return run
+
+    pipeline = Pipeline('test')
+    pipeline.add_stage('a', stage('a', 1))
+    pipeline.add_stage('b', stage('b', 10), depends_on=['a'])
+    pipeline.add_stage('c', stage('c', 100), depends_on=['a'])
+    pipeline.add_stage('d', stage('d', 1000), depends_on=['b', 'c'])
+    outcome = pipeline.run()
+
+    assert outcome['results'] == {'a': 1, 'b': 11, 'c': 101, 'd': 1112}
+    assert order[0] == 'a' and order[-1] == 'd'
+    assert outcome['errors'] == {} and outcome['skipped'] == []
+
+
+def test_independent_stages_run_concurrently():
+    barrier = threading.Barrier(2, timeout=1)
+
+    pipeline = Pipeline('test', max_workers=2)
+    pipeline.add_stage('a', lambda inputs: barrier.wait())
+    pipeline.add_stage('b', lambda inputs: barrier.wait())
+    outcome = pipeline.run()
+
+    assert set(outcome['results']) == {'a', 'b'}
+
+
+def test_unknown_dependency_is_rejected():
+    with pytest.raises(ValueError):
+        Pipeline('test').add_stage('a', lambda inputs: 1, depends_on=['missing'])
+
+
+def test_optional_failure_skips_only_dependents():
+    def fail(inputs):
+        raise RuntimeError('boom')
+
+    pipeline = Pipeline('test')
+    pipeline.add_stage('a', lambda inputs: 1)
+    pipeline.add_stage('b', fail, depends_on=['a'], required=False)
+    pipeline.add_stage('c', lambda inputs: 2, depends_on=['b'])
+    pipeline.add_stage('d', lambda inputs: 3, depends_on=['c'])
+    pipeline.add_stage('e', lambda inputs: 4, depends_on=['a'])
+    outcome = pipeline.run()
+
+    assert outcome['results'] == {'a': 1, 'e': 4}
+    assert outcome['errors'] == {'b': 'boom'}
+    assert sorted(outcome['skipped']) == ['c', 'd']
+
+
+def test_required_failure_is_raised():
+    def fail(inputs):
+        raise RuntimeError('boom')
+
+    ran = []
+    pipeline = Pipeline('test')
+    pipeline.add_stage('a', fail)
+    pipeline.add_stage('b', lambda inputs: ran.append('b'), depends_on=['a'])
+
+    with pytest.raises(RuntimeError, match='boom'):
+        pipeline.run()
+    assert ran == []
+
+
+def test_stage_timeout():
+    release = threading.Event()
+    pipeline = Pipeline('test')
+    pipeline.add_stage('slow', lambda inputs: release.wait(5), timeout=0.05, required=False)
+    pipeline.add_stage('fast', lambda inputs: 1)
+
+    started = time.monotonic()
+    outcome = pipeline.run()
+    release.set()
+
+    assert time.monotonic() - started < 1
+    assert outcome['results'] == {'fast': 1}
+    assert 'timed out' in outcome['errors']['slow']
+
+    pipeline = Pipeline('test')
+    pipeline.add_stage('slow', lambda inputs: release.wait(5), timeout=0.05)
+    release.clear()
+    with pytest.raises(StageTimeout):
+        pipeline.run()
+    release.set()
+
+
+def test_deadline_caps_stage_timeouts():
+    release = threading.Event()
+    pipeline = Pipeline('test')
+    pipeline.add_stage('slow', lambda inputs: release.wait(5), timeout=10, required=False)
+    pipeline.add_stage('after', lambda inputs: 1, depends_on=['slow'])
+
+    started = time.monotonic()
+    outcome = pipeline.run(deadline=Deadline(0.05))
+    release.set()
+
+    assert time.monotonic() - started < 1
+    assert outcome['skipped'] == ['after']
+
+
+def test_expired_deadline_fails_required_stage():
+    pipeline = Pipeline('test')
+    pipeline.add_stage('a', lambda inputs: 1)
+
+    with pytest.raises(DeadlineExceeded):
+        pipeline.run(deadline=Deadline(0))
+
+
+def test_timeout_runs_from_stage_start_not_submission():
+    pipeline = Pipeline('test', max_workers=1)
+    pipeline.add_stage('a', lambda inputs: time.sleep(0.15) or 1, timeout=0.5)
+    pipeline.add_stage('b', lambda inputs: time.sleep(0.15) or 2, timeout=0.25)
+    outcome = pipeline.run()
+
+    assert outcome['results'] == {'a': 1, 'b': 2}
@@ -0,0 +1,18 @@
+from services.sop_cache import SOPCache
+
+
+def key(**overrides):
+    args = dict(transcript='User: hi', context='', model='gpt-4', system_prompt='p', temperature=0.7)
+    args.update(overrides)
+    return SOPCache.make_key(**args)
+
+
+def test_key_ignores_whitespace_only_changes():
+    assert key(transcript='User:  hi\n\n') == key(transcript='User: hi')
+
+
+def test_key_covers_transcript_preparation_and_draft():
+    base = key(compaction_level=1, max_transcript_tokens=12000)
+    assert key(compaction_level=2, max_transcript_tokens=12000) != base
+    assert key(compaction_level=1, max_transcript_tokens=8000) != base
+    assert key(compaction_level=1, max_transcript_tokens=12000, draft='# Title') != base
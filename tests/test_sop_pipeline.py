@@ -0,0 +1,226 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import celery_tasks
+import models
+from models import (
+    Blob, Conversation, Database, claim_conversation, complete_conversation,
+    get_conversation, update_conversation_status
+)
+from services.artifact_store import DatabaseArtifactStore
+
+
+class FakeGenerator:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_sop(self, transcript, customer_info=None, draft=None, deadline=None):
+        self.calls += 1
+        return f'# SOP {self.calls}\n\n{transcript}'
+
+
+class FakeLindy:
+    def __init__(self):
+        self.completed = []
+
+    def notify_sop_completed(self, call_id, document_url, document_title, customer_info, sop_content):
+        self.completed.append((call_id, document_url))
+        return {'success': True}
+
+
+class FakeGHL:
+    def __init__(self):
+        self.notes = []
+
+    def _add_note(self, contact_id, note):
+        self.notes.append(contact_id)
+        return {'id': 'n1'}
+
+
+class FakeServices:
+    def __init__(self, database):
+        self.db = database
+        self.blob_store = DatabaseArtifactStore(database, signing_key='test')
+        self.sop_generator = FakeGenerator()
+        self.lindy_service = FakeLindy()
+        self.ghl_service = FakeGHL()
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'pipeline.db'}")
+    database.create_tables()
+    return database
+
+
+@pytest.fixture
+def session(database):
+    session = database.get_session()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def services(database, monkeypatch):
+    services = FakeServices(database)
+    monkeypatch.setattr(celery_tasks, 'get_worker_services', lambda: services)
+    return services
+
+
+def claim(session, call_id='c1', **kwargs):
+    # Each webhook delivery claims with a fresh session
+    session.expunge_all()
+    return claim_conversation(
+        session, call_id, 'User: hello', {'name': 'Ann', 'contact_id': 'k1'}, **kwargs
+    )
+
+
+def run_pipeline(call_id='c1'):
+    celery_tasks.generate_stage(call_id)
+    return celery_tasks.notify_stage(call_id)
+
+
+def test_duplicate_delivery_gets_the_claimed_call(session):
+    assert claim(session)[1]
+
+    conversation, claimed = claim(session)
+    assert not claimed and conversation.status == 'processing'
+
+    complete_conversation(session, 'c1', {'success': True, 'sop_length': 10})
+    conversation, claimed = claim(session)
+    assert not claimed
+    assert (conversation.status, conversation.result) == ('completed', {'success': True, 'sop_length': 10})
+
+
+def test_failed_and_stale_calls_are_reclaimed(session):
+    claim(session)
+    update_conversation_status(session, 'c1', 'failed')
+    conversation, claimed = claim(session)
+    assert claimed and conversation.status == 'processing'
+
+    # Fresh processing calls belong to their worker until the lock times out
+    assert not claim(session, stale_after=300)[1]
+    session.query(Conversation).update(
+        {'updated_at': datetime.utcnow() - timedelta(seconds=600)}, synchronize_session=False
+    )
+    session.commit()
+    assert claim(session, stale_after=300)[1]
+
+
+def test_only_one_reclaim_of_a_failed_call_wins(database, session, monkeypatch):
+    claim(session)
+    update_conversation_status(session, 'c1', 'failed')
+    real_get_conversation = models.get_conversation
+
+    def read_then_lose_race(session, call_id):
+        conversation = real_get_conversation(session, call_id)
+        monkeypatch.setattr(models, 'get_conversation', real_get_conversation)
+
+        # Another delivery reclaims the call after this one read it as failed
+        other = database.get_session()
+        try:
+            assert claim(other)[1]
+        finally:
+            other.close()
+        return conversation
+
+    monkeypatch.setattr(models, 'get_conversation', read_then_lose_race)
+    assert not claim(session)[1]
+
+
+def test_pipeline_delivers_the_call_once(services, session):
+    claim(session)
+
+    result = run_pipeline()
+
+    assert result['lindy_notified']
+    # Lindy creates the Google Doc, so no URL is sent yet
+    assert services.lindy_service.completed == [('c1', None)]
+    assert services.ghl_service.notes == ['k1']
+
+    session.expire_all()
+    conversation = get_conversation(session, 'c1')
+    assert conversation.status == 'completed'
+    assert conversation.result['sop_ref'] == conversation.checkpoints['generate']['sop_ref']
+    assert services.blob_store.get(result['sop_ref']) == b'# SOP 1\n\nUser: hello'
+
+
+def test_retried_pipeline_resumes_after_completed_stages(services, session):
+    claim(session)
+    celery_tasks.generate_stage('c1')
+
+    # The chain is retried from the start, e.g. after the call was reclaimed
+    run_pipeline()
+    run_pipeline()
+
+    assert services.sop_generator.calls == 1
+    assert len(services.lindy_service.completed) == 1
+    assert services.ghl_service.notes == ['k1']
+
+
+def test_failed_stage_is_not_checkpointed(services, session):
+    claim(session)
+    calls = []
+
+    def flaky(session, conversation):
+        calls.append(conversation.call_id)
+        if len(calls) == 1:
+            raise RuntimeError('Lindy unavailable')
+        return {'success': True}
+
+    with pytest.raises(RuntimeError):
+        celery_tasks.run_stage('c1', 'notify_completed', flaky)
+    assert celery_tasks.run_stage('c1', 'notify_completed', flaky) == {'success': True}
+    assert celery_tasks.run_stage('c1', 'notify_completed', flaky) == {'success': True}
+    assert calls == ['c1', 'c1']
+
+
+def test_identical_transcripts_are_stored_once(services, session):
+    for call_id in ('c1', 'c2'):
+        transcript_ref = services.blob_store.put('User: hello')
+        claim_conversation(session, call_id, None, {}, transcript_ref=transcript_ref)
+
+    assert session.query(Blob).count() == 1
+
+    celery_tasks.generate_stage('c2')
+    assert services.sop_generator.calls == 1
+    session.expire_all()
+    assert get_conversation(session, 'c2').transcript is None
+
+
+def test_cleanup_keeps_referenced_transcripts_and_sops_stored_again(services, session):
+    transcript_ref = services.blob_store.put('User: hello')
+    claim_conversation(session, 'c1', None, {}, transcript_ref=transcript_ref)
+    sop_ref = services.blob_store.put('# SOP')
+    old_sop_ref = services.blob_store.put('# Old SOP')
+    session.query(Blob).update(
+        {'created_at': datetime.utcnow() - timedelta(days=40)}, synchronize_session=False
+    )
+    session.commit()
+
+    # A new call generates the same SOP
+    services.blob_store.put('# SOP')
+    celery_tasks.cleanup_old_logs()
+
+    assert services.blob_store.exists(transcript_ref)
+    assert services.blob_store.exists(sop_ref)
+    assert not services.blob_store.exists(old_sop_ref)
+
+
+def test_cleanup_keeps_the_sop_of_a_call_that_has_not_completed(services, session):
+    claim(session)
+    celery_tasks.generate_stage('c1')
+    update_conversation_status(session, 'c1', 'failed')
+    session.query(Blob).update(
+        {'created_at': datetime.utcnow() - timedelta(days=40)}, synchronize_session=False
+    )
+    session.commit()
+
+    celery_tasks.cleanup_old_logs()
+
+    # The retried delivery still finds the SOP it generated
+    session.expunge_all()
+    claim(session)
+    assert run_pipeline()['sop_generated']
+    assert services.sop_generator.calls == 1
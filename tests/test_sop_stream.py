@@ -0,0 +1,105 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Conversation, claim_conversation, get_conversation, update_conversation_status
+
+
+class FakeGenerator:
+    def __init__(self, chunks=('# SOP\n', 'Step 1')):
+        self.chunks = chunks
+        self.calls = 0
+
+    def generate_sop_stream(self, transcript, customer_info=None, draft=None, deadline=None):
+        self.calls += 1
+        yield from self.chunks
+
+
+@pytest.fixture
+def generator(web_app, monkeypatch):
+    generator = FakeGenerator()
+    monkeypatch.setattr(web_app, 'sop_generator', generator)
+    return generator
+
+
+@pytest.fixture
+def session(web_app):
+    session = web_app.db.get_session()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(web_app):
+    return web_app.app.test_client()
+
+
+def events(response):
+    """(event, data) pairs of an SSE response"""
+    parsed = []
+    for block in response.get_data(as_text=True).strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        parsed.append((lines['event'], json.loads(lines['data'])))
+    return parsed
+
+
+def failed_call(session, call_id='c1'):
+    claim_conversation(session, call_id, 'User: hello', {'name': 'Ann'})
+    update_conversation_status(session, call_id, 'failed')
+    session.expunge_all()
+
+
+def test_unknown_call_is_404(client, generator):
+    assert client.get('/api/sop/missing/stream').status_code == 404
+
+
+def test_call_in_progress_is_409(client, generator, session):
+    claim_conversation(session, 'c1', 'User: hello', {})
+
+    response = client.get('/api/sop/c1/stream')
+
+    assert response.status_code == 409
+    assert response.get_json()['status'] == 'processing'
+    assert generator.calls == 0
+
+
+def test_generated_sop_is_stored_and_the_claim_released(web_app, client, generator, session):
+    failed_call(session)
+
+    response = client.get('/api/sop/c1/stream')
+
+    assert [event for event, _ in events(response)] == ['chunk', 'chunk', 'done']
+    conversation = get_conversation(session, 'c1')
+    assert conversation.status == 'failed'
+    assert web_app.blob_store.get(conversation.checkpoints['generate']['sop_ref']) == b'# SOP\nStep 1'
+
+
+def test_stored_sop_is_replayed(client, generator, session):
+    failed_call(session)
+    client.get('/api/sop/c1/stream').get_data()
+
+    response = client.get('/api/sop/c1/stream')
+
+    assert events(response) == [
+        ('chunk', {'content': '# SOP\nStep 1'}),
+        ('done', {'call_id': 'c1', 'sop_length': 12, 'stored': True})
+    ]
+    assert generator.calls == 1
+
+
+def test_disconnect_releases_a_stale_call_without_failing_it(client, generator, session):
+    claim_conversation(session, 'c1', 'User: hello', {})
+    stale_at = datetime.utcnow() - timedelta(hours=1)
+    session.query(Conversation).update({'updated_at': stale_at}, synchronize_session=False)
+    session.commit()
+    session.expunge_all()
+
+    response = client.get('/api/sop/c1/stream')
+    body = response.response
+    next(body)  # First chunk, then the client goes away
+    response.close()
+
+    conversation = get_conversation(session, 'c1')
+    assert (conversation.status, conversation.updated_at) == ('processing', stale_at)
+    assert conversation.checkpoints is None or 'generate' not in conversation.checkpoints
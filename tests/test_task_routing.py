@@ -0,0 +1,33 @@
+from celery_tasks import QUEUE_SERVICES, celery_app
+
+EXPECTED_QUEUES = {
+    'tasks.sop.generate': 'llm',
+    'tasks.sop.render_doc': 'documents',
+    'tasks.sop.save': 'celery',
+    'tasks.sop.notify_started': 'notifications',
+    'tasks.sop.notify': 'notifications',
+    'tasks.process_transcript': 'celery',
+    'tasks.send_reminder': 'notifications',
+    'tasks.cleanup_old_logs': 'celery',
+    'tasks.dispatch_lindy_outbox': 'notifications',
+    'tasks.drain_spilled_calls': 'celery',
+}
+
+
+def routed_queue(name):
+    return celery_app.amqp.router.route({}, name)['queue'].name
+
+
+def test_every_task_routes_to_its_queue():
+    registered = {name for name in celery_app.tasks if name.startswith('tasks.')}
+
+    # A new task must be given a queue here deliberately
+    assert registered == set(EXPECTED_QUEUES)
+    assert {name: routed_queue(name) for name in registered} == EXPECTED_QUEUES
+
+
+def test_every_queue_is_declared_with_its_services():
+    declared = {queue.name for queue in celery_app.conf.task_queues}
+
+    assert set(EXPECTED_QUEUES.values()) <= declared
+    assert declared == set(QUEUE_SERVICES)
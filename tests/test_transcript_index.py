@@ -0,0 +1,35 @@
+from utils import TranscriptIndex
+
+
+def test_role_labels_start_turns():
+    index = TranscriptIndex('AI: How do you start?\nuser: Open the panel.')
+    assert [index.speaker(i) for i in range(len(index))] == ['AI', 'user']
+    assert [index.role(i) for i in range(len(index))] == ['assistant', 'user']
+
+
+def test_dictated_labels_stay_in_the_turn():
+    transcript = (
+        'AI: What comes next?\n'
+        'User: Then you click: Save.\n'
+        'Important: never skip the backup.\n'
+        'AI: Got it.'
+    )
+    index = TranscriptIndex(transcript)
+    assert [index.speaker(i) for i in range(len(index))] == ['AI', 'User', 'AI']
+    assert index.text(1) == 'Then you click: Save.\nImportant: never skip the backup.'
+
+
+def test_recurring_names_are_speakers():
+    transcript = 'Jane Smith: Hi.\nAI: Hello.\nJane Smith: Open the panel.\nNote: it is grey.'
+    index = TranscriptIndex(transcript)
+    assert [index.speaker(i) for i in range(len(index))] == ['Jane Smith', 'AI', 'Jane Smith']
+    assert index.role(0) is None
+    assert index.text(2) == 'Open the panel.\nNote: it is grey.'
+
+
+def test_name_first_seen_inside_a_turn_is_split_off_when_it_recurs():
+    transcript = 'AI: Who is there?\nBob: Me.\nAlso here.\nAI: Hi.\nBob: Open it.'
+    index = TranscriptIndex(transcript)
+    assert [index.speaker(i) for i in range(len(index))] == ['AI', 'Bob', 'AI', 'Bob']
+    assert index.text(0) == 'Who is there?'
+    assert index.text(1) == 'Me.\nAlso here.'
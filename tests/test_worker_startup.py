@@ -0,0 +1,18 @@
+import celery_tasks
+
+
+class Worker:
+    def __init__(self, pool_cls):
+        self.pool_cls = pool_cls
+
+
+def test_only_non_prefork_workers_warm_at_startup(monkeypatch):
+    warmed = []
+    monkeypatch.setattr(celery_tasks, 'warm_worker', lambda: warmed.append(True))
+
+    celery_tasks.init_worker(sender=Worker('prefork'))
+    assert warmed == []  # Each child warms itself after the fork
+
+    celery_tasks.init_worker(sender=Worker('threads'))
+    celery_tasks.init_worker(sender=Worker('solo'))
+    assert len(warmed) == 2
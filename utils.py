@@ -1,7 +1,10 @@
 import hashlib
 import secrets
+from array import array
+from bisect import bisect_right
 from datetime import datetime
 import re
+import time
 
 
 def generate_secure_token(length=32):
@@ -94,29 +97,410 @@ def extract_customer_info(data):
     return {k: v for k, v in customer_info.items() if v is not None}
 
 
-def parse_transcript(transcript):
+ASSISTANT_SPEAKERS = {'assistant', 'ai', 'bot', 'agent'}
+USER_SPEAKERS = {'user', 'customer', 'caller', 'client'}
+
+# A candidate speaker label at the start of a line: "User:", "Jane Smith:" etc.
+# Digits are excluded so dictated content like "Step 1: ..." isn't a speaker
+SPEAKER_PATTERN = re.compile(r"[ \t]*([A-Za-z][A-Za-z.'-]*(?: [A-Za-z][A-Za-z.'-]*){0,2}):[ \t]*")
+# Labels other than the VAPI roles above must look like a name ("Jane Smith")
+NAME_PATTERN = re.compile(r"[A-Z][A-Za-z.'-]*(?: [A-Z][A-Za-z.'-]*){0,2}")
+NON_BLANK_PATTERN = re.compile(r'\S')
+
+
+class TranscriptIndex:
+    """
+    Speaker-turn index over a transcript
+
+    Built in a single pass, storing each turn as (speaker, start, end)
+    offsets into the original string in arrays, so turns are only sliced
+    out when they are read. A turn starts at a line with a speaker label and
+    runs until the next one; unlabelled leading lines form a turn with no
+    speaker.
+
+    Known role labels (AI, User, Assistant, Customer, ...) always start a
+    turn. Any other label must be a capitalized name used on at least two
+    lines, so dictated lines like "Important: ..." or "Then you click: ..."
+    stay part of the turn they were spoken in. A name's first line is read
+    as part of the current turn until the name recurs, and is then split
+    off into a turn of its own.
+    """
+
+    def __init__(self, transcript):
+        self.transcript = transcript
+        self.speakers = [None]  # Speaker names by id; 0 is "no speaker"
+        self._speaker_ids = {}
+        self._turn_speakers = array('I')
+        self._line_starts = array('Q')  # Start of the turn including its label
+        self._text_starts = array('Q')  # Start of the turn text after the label
+        self._ends = array('Q')
+
+        self._names = set()
+        self._first_name_lines = {}  # Name -> (label start, text start, previous turn end)
+
+        pos = 0
+        length = len(transcript)
+
+        while pos <= length:
+            line_end = transcript.find('\n', pos)
+            if line_end == -1:
+                line_end = length
+
+            match = SPEAKER_PATTERN.match(transcript, pos, line_end)
+            if match and self._is_new_name(match.group(1), match):
+                self._split_first_name_line(match.group(1))
+
+            if match and self._is_speaker(match.group(1)):
+                self._turn_speakers.append(self._speaker_id(match.group(1)))
+                self._line_starts.append(match.start(1))
+                self._text_starts.append(match.end())
+                self._ends.append(line_end)
+            else:
+                text_start = NON_BLANK_PATTERN.search(transcript, pos, line_end)
+                if text_start and self._ends:
+                    self._ends[-1] = line_end
+                elif text_start:
+                    self._turn_speakers.append(0)
+                    self._line_starts.append(text_start.start())
+                    self._text_starts.append(text_start.start())
+                    self._ends.append(line_end)
+
+            pos = line_end + 1
+
+    def _is_new_name(self, label, match):
+        """
+        Track a name label, returning True when it starts its second line
+
+        The first line is remembered so it can be split into its own turn.
+        """
+        if label in self._names or not NAME_PATTERN.fullmatch(label):
+            return False
+        if label not in self._first_name_lines:
+            previous_end = self._ends[-1] if self._ends else None
+            self._first_name_lines[label] = (match.start(1), match.end(), previous_end)
+            return False
+
+        self._names.add(label)
+        return True
+
+    def _split_first_name_line(self, name):
+        """Make a name's first line, read as turn text, start a turn of its own"""
+        label_start, text_start, previous_end = self._first_name_lines.pop(name)
+        i = self.find_turn(label_start)
+
+        if self._line_starts[i] == label_start:
+            # The line opened an unlabelled turn
+            self._turn_speakers[i] = self._speaker_id(name)
+            self._text_starts[i] = text_start
+            return
+
+        self._turn_speakers.insert(i + 1, self._speaker_id(name))
+        self._line_starts.insert(i + 1, label_start)
+        self._text_starts.insert(i + 1, text_start)
+        self._ends.insert(i + 1, self._ends[i])
+        self._ends[i] = previous_end
+
+    def _is_speaker(self, label):
+        """Whether a line label is a speaker rather than dictated content"""
+        lowered = label.lower()
+        if lowered in ASSISTANT_SPEAKERS or lowered in USER_SPEAKERS:
+            return True
+        return label in self._names
+
+    def _speaker_id(self, name):
+        """Get the id of a speaker name, registering it if new"""
+        speaker_id = self._speaker_ids.get(name)
+        if speaker_id is None:
+            speaker_id = len(self.speakers)
+            self.speakers.append(name)
+            self._speaker_ids[name] = speaker_id
+        return speaker_id
+
+    def __len__(self):
+        return len(self._ends)
+
+    def speaker(self, i):
+        """Get the speaker label of turn i (None if unlabelled)"""
+        return self.speakers[self._turn_speakers[i]]
+
+    def role(self, i):
+        """Get 'assistant' or 'user' for turn i, or None for other speakers"""
+        speaker = self.speaker(i)
+        if speaker is None:
+            return None
+        if speaker.lower() in ASSISTANT_SPEAKERS:
+            return 'assistant'
+        if speaker.lower() in USER_SPEAKERS:
+            return 'user'
+        return None
+
+    def span(self, i):
+        """Get (start, end) offsets of turn i including its speaker label"""
+        return self._line_starts[i], self._ends[i]
+
+    def text(self, i):
+        """Get the text of turn i without its speaker label"""
+        return self.transcript[self._text_starts[i]:self._ends[i]].strip()
+
+    def line(self, i):
+        """Get turn i including its speaker label"""
+        return self.transcript[self._line_starts[i]:self._ends[i]].strip()
+
+    def find_turn(self, offset):
+        """Get the index of the turn containing a transcript offset, or -1"""
+        i = bisect_right(self._line_starts, offset) - 1
+        if i >= 0 and offset <= self._ends[i]:
+            return i
+        return -1
+
+    def search(self, pattern, flags=re.IGNORECASE):
+        """Get the indices of turns matching a regex pattern, in order"""
+        turns = []
+        for match in re.finditer(pattern, self.transcript, flags):
+            i = self.find_turn(match.start())
+            if i >= 0 and (not turns or turns[-1] != i):
+                turns.append(i)
+        return turns
+
+    def stats(self):
+        """Get turn and character counts per speaker"""
+        speakers = {}
+        for i in range(len(self)):
+            name = self.speaker(i) or 'unknown'
+            entry = speakers.setdefault(name, {'turns': 0, 'chars': 0})
+            entry['turns'] += 1
+            entry['chars'] += self._ends[i] - self._text_starts[i]
+
+        return {
+            'total_chars': len(self.transcript),
+            'speaker_turns': len(self),
+            'speakers': speakers
+        }
+
+    def chunk_spans(self, max_chars):
+        """
+        Group turns into (start, end) spans of at most max_chars
+
+        Spans only break between turns, except that a single turn longer
+        than max_chars is split on whitespace.
+        """
+        spans = []
+        chunk_start = None
+        chunk_end = None
+
+        for i in range(len(self)):
+            start, end = self.span(i)
+
+            if end - start > max_chars:
+                if chunk_start is not None:
+                    spans.append((chunk_start, chunk_end))
+                    chunk_start = None
+                spans.extend(self._split_span(start, end, max_chars))
+                continue
+
+            if chunk_start is not None and end - chunk_start > max_chars:
+                spans.append((chunk_start, chunk_end))
+                chunk_start = None
+
+            if chunk_start is None:
+                chunk_start = start
+            chunk_end = end
+
+        if chunk_start is not None:
+            spans.append((chunk_start, chunk_end))
+
+        return spans
+
+    def _split_span(self, start, end, max_chars):
+        """Split one span into pieces of at most max_chars, preferring whitespace"""
+        spans = []
+
+        while end - start > max_chars:
+            cut = self.transcript.rfind(' ', start + 1, start + max_chars)
+            if cut == -1:
+                cut = start + max_chars
+            spans.append((start, cut))
+            start = cut + 1
+
+        if start < end:
+            spans.append((start, end))
+        return spans
+
+
+def estimate_tokens(text):
+    """Estimate the token count of English text (about 4 characters per token)"""
+    return (len(text) + 3) // 4
+
+
+def chunk_transcript(transcript, max_tokens, index=None):
+    """
+    Split a transcript into chunks of at most max_tokens (estimated)
+
+    Chunks only break between speaker turns; lines without a speaker label
+    belong to the previous turn. A single turn longer than max_tokens is
+    split on whitespace.
+
+    Args:
+        index (TranscriptIndex): Optional prebuilt index of the transcript
+    """
+    if index is None:
+        index = TranscriptIndex(transcript)
+
+    return [
+        transcript[start:end].strip()
+        for start, end in index.chunk_spans(max_tokens * 4)
+    ]
+
+
+def parse_transcript(transcript, index=None):
     """Parse conversation transcript and extract key information"""
-    lines = transcript.split('\n')
+    if index is None:
+        index = TranscriptIndex(transcript)
+
     parsed = {
-        'total_lines': len(lines),
+        'total_lines': transcript.count('\n') + 1,
         'speaker_turns': 0,
         'assistant_messages': [],
         'user_messages': []
     }
 
-    for line in lines:
-        if line.strip():
-            # Try to detect speaker
-            if line.startswith('Assistant:') or line.startswith('AI:'):
-                parsed['assistant_messages'].append(line)
-                parsed['speaker_turns'] += 1
-            elif line.startswith('User:') or line.startswith('Customer:'):
-                parsed['user_messages'].append(line)
-                parsed['speaker_turns'] += 1
+    for i in range(len(index)):
+        role = index.role(i)
+        if role == 'assistant':
+            parsed['assistant_messages'].append(index.line(i))
+        elif role == 'user':
+            parsed['user_messages'].append(index.line(i))
+
+        if index.speaker(i) is not None:
+            parsed['speaker_turns'] += 1
 
     return parsed
 
 
+# Fillers are only removed where punctuation sets them off (", uh, ", "um.")
+# or as a capitalized sentence opener ("Um, ..."). Matching is case-sensitive
+# so all-caps tokens like "ER" or units like "Ah" mid-sentence are content.
+FILLER_WORDS = r'(?:u+m+|u+h+|e+r+m*|a+h+|h+m+)'
+FILLER_OPENERS = r'(?:Um+|Uh+|Er+m*|Ah+|Hm+)'
+FILLER_PATTERN = re.compile(
+    rf"(?:,[ \t]*)?(?<![\w'-]){FILLER_WORDS}(?:,|\.+)"
+    rf"|,[ \t]*{FILLER_WORDS}(?=\s)"
+    rf"|(?:^|(?<=[.!?][ \t])){FILLER_OPENERS}(?:,|\.+)"
+    rf"|(?:^|(?<=[.!?][ \t]))(?:You know|I mean),"
+    rf"|,[ \t]*(?:you know|I mean),"
+)
+# Stuttered words; digits ("Press 1 1 2") and all-caps tokens are left alone
+REPEATED_WORD_PATTERN = re.compile(r"\b([^\W\d_]+)(?:\s+\1\b)+", re.IGNORECASE)
+ACKNOWLEDGEMENT_PATTERN = re.compile(
+    r'^(?:(?:great|perfect|excellent|wonderful|awesome|okay|ok|got it|thanks|thank you|'
+    r'sounds good|understood|i see|right)[\s!.,]*)+$',
+    re.IGNORECASE
+)
+
+
+def _collapse_repeat(match):
+    """Keep one copy of a stuttered word unless it is an all-caps token"""
+    word = match.group(1)
+    if len(word) > 1 and word.isupper():
+        return match.group(0)
+    return word
+
+
+def compact_transcript(transcript, level=1, index=None):
+    """
+    Compact a transcript to reduce prompt tokens without losing SOP content
+
+    Levels:
+        0 - unchanged
+        1 - normalize spaces and strip filler words, keeping each turn's
+            line breaks (multi-line steps) and every word of content
+        2 - also collapse stuttered repeats, join each turn onto one line
+            and drop repeated turns and assistant acknowledgement-only turns
+        3 - also reduce assistant turns to their questions (the user's
+            answers carry the SOP content; the questions keep them in context)
+
+    Args:
+        index (TranscriptIndex): Optional prebuilt index of the transcript
+
+    Returns:
+        tuple: (compacted transcript, stats dict with tokens_before/tokens_after)
+    """
+    tokens_before = estimate_tokens(transcript)
+    stats = {
+        'level': level,
+        'tokens_before': tokens_before,
+        'tokens_after': tokens_before,
+        'turns_dropped': 0
+    }
+
+    if level <= 0:
+        return transcript, stats
+
+    if index is None:
+        index = TranscriptIndex(transcript)
+
+    output = []
+    previous = None
+
+    for i in range(len(index)):
+        speaker = index.speaker(i)
+        role = index.role(i)
+
+        lines = (FILLER_PATTERN.sub(' ', line) for line in index.text(i).split('\n'))
+        text = '\n'.join(' '.join(line.split()) for line in lines if line.strip())
+
+        if level >= 2:
+            # Repeats can be genuine ("that that"), so only collapsed here
+            text = REPEATED_WORD_PATTERN.sub(_collapse_repeat, ' '.join(text.split()))
+
+        if level >= 2 and role == 'assistant':
+            # Leading acknowledgements ("Great! ...") carry no content
+            sentences = re.split(r'(?<=[.!?])\s+', text)
+            while sentences and ACKNOWLEDGEMENT_PATTERN.match(sentences[0]):
+                sentences.pop(0)
+            if level >= 3:
+                sentences = [s for s in sentences if s.endswith('?')]
+            text = ' '.join(sentences)
+
+        if not text:
+            stats['turns_dropped'] += 1
+            continue
+
+        compacted = f'{speaker}: {text}' if speaker else text
+        if level >= 2 and previous is not None and compacted.lower() == previous.lower():
+            stats['turns_dropped'] += 1
+            continue
+
+        output.append(compacted)
+        previous = compacted
+
+    result = '\n'.join(output)
+    stats['tokens_after'] = estimate_tokens(result)
+    return result, stats
+
+
+def format_conversation_messages(messages):
+    """
+    Format VAPI conversation messages as a speaker-prefixed transcript
+
+    Accepts both OpenAI-style ({'role', 'content'}) and VAPI-style
+    ({'role': 'bot', 'message'}) messages. System messages are skipped.
+    """
+    lines = []
+
+    for message in messages:
+        role = message.get('role')
+        text = (message.get('content') or message.get('message') or '').strip()
+
+        if not text or role not in ('assistant', 'bot', 'user'):
+            continue
+
+        speaker = 'User' if role == 'user' else 'Assistant'
+        lines.append(f'{speaker}: {text}')
+
+    return '\n'.join(lines)
+
+
 class ResponseFormatter:
     """Format API responses consistently"""
 
@@ -159,6 +543,58 @@ class ResponseFormatter:
         }
 
 
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request's time budget is used up"""
+
+
+class Deadline:
+    """
+    Time budget for a request, shared by every call made on its behalf
+
+    Started when a webhook arrives and passed down to the services, so each
+    outbound call gets the remaining budget as its timeout and no new work
+    starts once the caller has given up.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        """Seconds left in the budget (0 once expired)"""
+        return max(self.expires_at - time.monotonic(), 0)
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self):
+        """Raise DeadlineExceeded if the budget is used up"""
+        if self.expired():
+            raise DeadlineExceeded(f'Deadline of {self.seconds}s exceeded')
+
+    def timeout(self, cap=None):
+        """
+        Timeout for the next call: the remaining budget, capped at cap
+
+        Raises:
+            DeadlineExceeded: If the budget is used up
+        """
+        self.check()
+        remaining = self.remaining()
+        return remaining if cap is None else min(cap, remaining)
+
+
+def format_sse(data, event=None):
+    """Format a server-sent event with a JSON payload"""
+    import json
+
+    message = ''
+    if event:
+        message += f'event: {event}\n'
+    message += f'data: {json.dumps(data)}\n\n'
+    return message
+
+
 def verify_webhook_signature(payload, signature, secret):
     """Verify webhook signature"""
     expected_signature = hashlib.sha256(